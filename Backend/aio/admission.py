@@ -0,0 +1,31 @@
+from quart import current_app, g, jsonify, request
+from auth.admission import build_admission, client_key, retry_after
+
+
+# The same budgets as auth.admission, spent from Quart's request hooks. The
+# semaphores never block, so taking a slot is safe on the event loop.
+def init_admission(app):
+    controller = build_admission(app)
+    if controller is None:
+        return None
+
+    @app.before_request
+    async def admit_request():
+        refusal, slot = controller.decide(request.endpoint, request.method,
+                                          lambda: client_key(current_app.config, request.headers, request.remote_addr))
+        if refusal is not None:
+            msg, status, wait = refusal
+            response = jsonify({"msg": msg})
+            response.status_code = status
+            response.headers["Retry-After"] = retry_after(wait)
+            return response
+        if slot is not None:
+            g.admission_slot = slot
+
+    @app.teardown_request
+    async def release_admission_slot(exception):
+        slot = g.pop("admission_slot", None)
+        if slot is not None:
+            slot.release()
+
+    return controller
@@ -0,0 +1,92 @@
+from quart import Quart, Response
+from quart_cors import cors
+from aio.admission import init_admission
+from aio.db import init_async_db, pool_stats
+from aio.metrics import init_metrics
+from aio.books.models import load_index
+from books.search_index import BookSearchIndex
+from books.search_cache import init_search_cache
+from books.snapshot import init_catalog_snapshots
+from auth.passwords import init_password_hasher
+from users.cache import init_user_cache
+from db.metrics import render_gauges
+
+
+def create_async_app(config_class=None):
+    """ASGI counterpart of app.create_app: same config, URLs and JWTs, with
+    the users and books blueprints served from aiomysql on one event loop,
+    behind the same admission budgets and request metrics.
+
+    Only the customer-facing traffic is served here. The reports,
+    replenishment and profiler blueprints, order intake and the stock ledger
+    stay on the Flask app (their background threads and CLI commands are
+    built on it); run it alongside for admin traffic.
+
+        hypercorn asgi:app
+    """
+    app = Quart(__name__)
+    app = cors(app, allow_origin="http://localhost:3000", allow_credentials=True)
+
+    if config_class:
+        app.config.from_object(config_class)
+    else:
+        app.config.from_object("config.Config")
+
+    from aio.users import users_bp
+    from aio.books import books_bp
+
+    init_async_db(app)
+    if app.config.get("METRICS_ENABLED", True):
+        init_metrics(app)
+    init_admission(app)
+    app.register_blueprint(users_bp)
+    app.register_blueprint(books_bp)
+    app.extensions["book_search_index"] = BookSearchIndex(app.config.get("SEARCH_PRICE_BUCKETS", (10, 25, 50, 100)))
+    init_search_cache(app)
+    init_catalog_snapshots(app)
+    init_password_hasher(app)
+    init_user_cache(app)
+
+    if app.config.get("SEARCH_INDEX_ENABLED", True) and app.config.get("SEARCH_INDEX_BUILD_ON_STARTUP"):
+        @app.before_serving
+        async def build_search_index():
+            async with app.app_context():
+                try:
+                    await load_index(app.extensions["book_search_index"])
+                except Exception as e:
+                    app.logger.warning("Book search index not built at startup: %s", e)
+
+    @app.after_serving
+    async def stop_hasher():
+        app.extensions["password_hasher"].shutdown()
+
+    @app.route("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.route("/health/db")
+    async def db_health():
+        return {"pool": pool_stats()}
+
+    @app.route("/health/hasher")
+    async def hasher_health():
+        return app.extensions["password_hasher"].stats()
+
+    @app.route("/health/admission")
+    async def admission_health():
+        admission = app.extensions.get("admission")
+        return admission.stats() if admission is not None else {"enabled": False}
+
+    @app.route("/metrics")
+    async def metrics():
+        lines = []
+        if "metrics" in app.extensions:
+            lines += app.extensions["metrics"].render()
+        if "async_db_pool" in app.extensions:  # opened by before_serving
+            lines += render_gauges("db_pool", pool_stats())
+        lines += render_gauges("password_hasher", app.extensions["password_hasher"].stats())
+        lines += render_gauges("search_cache", app.extensions["book_search_cache"].stats())
+        lines += render_gauges("user_cache", app.extensions["user_cache"].stats())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+    return app
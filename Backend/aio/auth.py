@@ -0,0 +1,45 @@
+from functools import wraps
+
+from quart import current_app, g, jsonify, request
+from auth.tokens import TokenError, decode_access_token, token_from_header
+
+
+async def verify_jwt_in_request():
+    token = token_from_header(request.headers.get("Authorization"))
+    g.jwt_claims = decode_access_token(current_app.config, token)
+    return g.jwt_claims
+
+
+def get_jwt():
+    return g.get("jwt_claims", {})
+
+
+def get_jwt_identity():
+    return get_jwt().get(current_app.config.get("JWT_IDENTITY_CLAIM", "sub"))
+
+
+def jwt_required():
+    # Called like flask_jwt_extended's, so routes read the same in both apps.
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            try:
+                await verify_jwt_in_request()
+            except TokenError as e:
+                return jsonify({"msg": e.msg}), e.status
+            return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def admin_required(fn):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        try:
+            claims = await verify_jwt_in_request()
+        except TokenError as e:
+            return jsonify({"msg": e.msg}), e.status
+        if str(claims.get("role", "")).lower() != "admin":
+            return jsonify({"msg": "Admins only"}), 403
+        return await fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,4 @@
+from quart import Blueprint
+
+books_bp = Blueprint("books", __name__, url_prefix="/api/books")
+from . import routes
@@ -0,0 +1,287 @@
+import asyncio
+import time
+
+import aiomysql
+from quart import current_app
+from aio.db import get_db, connection
+from aio.streaming import iter_rows
+from books.catalog import catalog_version, bump_catalog_version
+from books.search_cache import search_key, copy_result
+from books.search_index import BookSearchIndex
+from books.models import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, _listing_query, _project, encode_cursor,
+                          faceted_search_key)
+
+# Async twins of books.models. Query building, cursors and the in-memory
+# search index are shared with the sync app; only the I/O is awaited.
+
+
+async def attach_authors(cursor, books):
+    if not books:
+        return books
+    isbns = list({book["ISBN_number"] for book in books})
+    placeholders = ", ".join(["%s"] * len(isbns))
+    await cursor.execute(
+        f"SELECT ISBN_number, author_name FROM author WHERE ISBN_number IN ({placeholders}) "
+        "ORDER BY ISBN_number, author_name",
+        isbns
+    )
+    authors = {}
+    for row in await cursor.fetchall():
+        authors.setdefault(row["ISBN_number"], []).append(row["author_name"])
+    for book in books:
+        book["authors"] = authors.get(book["ISBN_number"], [])
+    return books
+
+
+async def get_books_page(limit=DEFAULT_PAGE_SIZE, page_cursor=None, sort="isbn", order="asc", fields=None):
+    query, params = _listing_query(page_cursor, sort, order, fields)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query += " LIMIT %s"
+    params.append(limit + 1)
+
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(query, params)
+        books = list(await cursor.fetchall())
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            next_cursor = encode_cursor(sort, books[-1])
+
+        if fields is None or "authors" in fields:
+            await attach_authors(cursor, books)
+    if fields is not None:
+        books = [_project(book, fields) for book in books]
+    return books, next_cursor
+
+
+async def iter_books(page_cursor=None, sort="isbn", order="asc", fields=None, batch_size=500):
+    with_authors = fields is None or "authors" in fields
+    query, params = _listing_query(page_cursor, sort, order, fields, with_authors=with_authors)
+
+    async with connection() as db:
+        cursor = await db.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+
+        current = None
+        async for row in iter_rows(cursor, batch_size):
+            if current is None or row["ISBN_number"] != current["ISBN_number"]:
+                if current is not None:
+                    yield _project(current, fields)
+                current = row
+                if with_authors:
+                    author = current.pop("author_name")
+                    current["authors"] = [author] if author is not None else []
+            elif with_authors and row["author_name"] is not None:
+                current["authors"].append(row["author_name"])
+        if current is not None:
+            yield _project(current, fields)
+
+
+async def get_books_by_isbn(isbns, db=None):
+    # Streamed responses pass their own connection; see aio.db.connection.
+    if not isbns:
+        return []
+    placeholders = ", ".join(["%s"] * len(isbns))
+    db = db or await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(f"""
+        SELECT B.ISBN_number, B.title, B.publication_year, B.quantity_stock, B.category, B.selling_price, B.book_image, P.name
+        FROM book AS B JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+        WHERE B.ISBN_number IN ({placeholders})
+        """, list(isbns))
+        rows = {row["ISBN_number"]: row for row in await cursor.fetchall()}
+        books = [rows[isbn] for isbn in isbns if isbn in rows]
+        await attach_authors(cursor, books)
+    return books
+
+
+async def load_index(index):
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("""
+        SELECT B.ISBN_number, B.title, B.category, P.name, B.selling_price, B.publication_year, B.quantity_stock
+        FROM book AS B LEFT JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+        """)
+        books = await cursor.fetchall()
+        await cursor.execute("SELECT ISBN_number, author_name FROM author")
+        index.build(books, await cursor.fetchall())
+    return index
+
+
+async def get_search_index():
+    index = current_app.extensions.setdefault(
+        "book_search_index", BookSearchIndex(current_app.config.get("SEARCH_PRICE_BUCKETS", (10, 25, 50, 100))))
+    lock = current_app.extensions.setdefault("book_search_index_lock", asyncio.Lock())
+    max_age = current_app.config.get("SEARCH_INDEX_MAX_AGE")
+
+    def stale():
+        return index.built_at is None or (max_age and time.monotonic() - index.built_at > max_age)
+
+    if stale():
+        async with lock:
+            if stale():  # another request may have rebuilt it while we waited
+                await load_index(index)
+    return index
+
+
+async def refresh_book(isbn):
+    index = current_app.extensions.get("book_search_index")
+    if index is None or index.built_at is None:
+        return
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("""
+        SELECT B.ISBN_number, B.title, B.category, P.name, B.selling_price, B.publication_year, B.quantity_stock
+        FROM book AS B LEFT JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+        WHERE B.ISBN_number = %s
+        """, (isbn,))
+        book = await cursor.fetchone()
+        if book is None:
+            index.remove(isbn)
+            return
+        await cursor.execute("SELECT author_name FROM author WHERE ISBN_number = %s", (isbn,))
+        authors = [row["author_name"] for row in await cursor.fetchall()]
+    index.upsert(book["ISBN_number"], book["title"], book["category"], book["name"], authors,
+                 book["selling_price"], book["publication_year"], book["quantity_stock"])
+
+
+async def refresh_stock(isbns):
+    index = current_app.extensions.get("book_search_index")
+    if index is None or index.built_at is None or not isbns:
+        return
+    isbns = sorted(set(isbns))
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        placeholders = ", ".join(["%s"] * len(isbns))
+        await cursor.execute(f"SELECT ISBN_number, quantity_stock FROM book WHERE ISBN_number IN ({placeholders})",
+                             isbns)
+        stocks = {row["ISBN_number"]: row["quantity_stock"] for row in await cursor.fetchall()}
+    await db.commit()
+    index.set_stock(stocks)
+
+
+async def book_search(isbn, title, category, author, publisher):
+    cache = current_app.extensions["book_search_cache"]
+    key = search_key(isbn, title, category, author, publisher)
+    books = cache.get(key)
+    if books is not None:
+        return copy_result(books)
+
+    version = catalog_version()
+    if not current_app.config.get("SEARCH_INDEX_ENABLED", True):
+        books = await book_search_sql(isbn, title, category, author, publisher)
+    else:
+        isbns = (await get_search_index()).search(isbn, title, category, author, publisher)
+        books = await get_books_by_isbn(isbns)
+    cache.put(key, copy_result(books), version)
+    return books
+
+
+async def faceted_book_search(isbn, title, author, publisher, filters):
+    cache = current_app.extensions["book_search_cache"]
+    key = faceted_search_key(isbn, title, author, publisher, filters)
+    result = cache.get(key)
+    if result is not None:
+        return copy_result(result)
+
+    version = catalog_version()
+    isbns, facets = (await get_search_index()).facet_search(isbn, title, author, publisher, **filters)
+    result = {"books": await get_books_by_isbn(isbns), "total": len(isbns), "facets": facets}
+    cache.put(key, copy_result(result), version)
+    return result
+
+
+async def iter_faceted_book_search(isbn, title, author, publisher, filters, batch_size=500):
+    isbns, _ = (await get_search_index()).facet_search(isbn, title, author, publisher, **filters)
+    async with connection() as db:
+        for start in range(0, len(isbns), batch_size):
+            for book in await get_books_by_isbn(isbns[start:start + batch_size], db):
+                yield book
+
+
+async def iter_book_search(isbn, title, category, author, publisher, batch_size=500):
+    async with connection() as db:
+        if not current_app.config.get("SEARCH_INDEX_ENABLED", True):
+            for book in await book_search_sql(isbn, title, category, author, publisher, db):
+                yield book
+            return
+        isbns = (await get_search_index()).search(isbn, title, category, author, publisher)
+        for start in range(0, len(isbns), batch_size):
+            for book in await get_books_by_isbn(isbns[start:start + batch_size], db):
+                yield book
+
+
+async def book_search_sql(isbn, title, category, author, publisher, db=None):
+    query = """
+    SELECT DISTINCT B.ISBN_number, B.title, B.publication_year, B.quantity_stock, B.category, B.selling_price, B.book_image, P.name
+    FROM book AS B JOIN author AS A ON (B.ISBN_number = A.ISBN_number) JOIN publisher AS P ON (B.publisher_id = P.publisher_id) WHERE 1=1
+    """
+    params = []
+    if isbn:
+        query += " AND B.ISBN_number = %s"
+        params.append(isbn)
+    if title:
+        query += " AND title LIKE %s"
+        params.append(f"%{title}%")
+    if category:
+        query += " AND category = %s"
+        params.append(category)
+    if author:
+        query += " AND author_name LIKE %s"
+        params.append(f"%{author}%")
+    if publisher:
+        query += " AND name LIKE %s"
+        params.append(f"%{publisher}%")
+
+    db = db or await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(query, params)
+        books = list(await cursor.fetchall())
+        await attach_authors(cursor, books)
+    return books
+
+
+BOOK_UPDATE_FIELDS = ("title", "publication_year", "quantity_stock", "category", "selling_price",
+                      "book_image", "publisher_id", "threshold")
+
+
+async def add_new_book(data):
+    isbn = data.get("ISBN_number")
+    db = await get_db()
+    async with db.cursor() as cursor:
+        await cursor.execute("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category, selling_price, book_image, publisher_id, threshold)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (isbn, data.get("title"), data.get("publication_year"), data.get("quantity_stock"),
+              data.get("category"), data.get("selling_price"), data.get("book_image"),
+              data.get("publisher_id"), data.get("threshold")))
+        authors = data.get("authors", [])
+        if authors:
+            await cursor.executemany("INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)",
+                                     [(isbn, author) for author in authors])
+    await db.commit()
+    bump_catalog_version()
+    await refresh_book(isbn)
+
+
+async def update_existing_book(data):
+    isbn = data.get("ISBN_number")
+    updates = {field: data[field] for field in BOOK_UPDATE_FIELDS if data.get(field) is not None}
+    authors = data.get("authors")
+
+    db = await get_db()
+    async with db.cursor() as cursor:
+        if updates:
+            set_clause = ", ".join(f"{field} = %s" for field in updates)
+            await cursor.execute(f"UPDATE book SET {set_clause} WHERE ISBN_number = %s",
+                                 [*updates.values(), isbn])
+        if authors is not None:
+            await cursor.execute("DELETE FROM author WHERE ISBN_number = %s", (isbn,))
+            if authors:
+                await cursor.executemany("INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)",
+                                         [(isbn, author) for author in authors])
+    await db.commit()
+    bump_catalog_version()
+    await refresh_book(isbn)
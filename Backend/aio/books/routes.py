@@ -0,0 +1,144 @@
+from . import books_bp
+from config import *
+from quart import request, jsonify, current_app, stream_with_context, Response
+from aiomysql import IntegrityError
+from aio.books.models import *
+from aio.auth import admin_required
+from aio.streaming import json_array_stream
+from books.catalog import catalog_version
+from books.facets import parse_search_filters
+from books.snapshot import CatalogSnapshot
+
+
+async def get_catalog_snapshot(key, build):
+    # Same store and representation as books.snapshot, with an awaited build.
+    store = current_app.extensions["catalog_snapshots"]
+    snapshot = store.get(key)
+    if snapshot is None:
+        version = catalog_version()
+        body = current_app.json.dumps(await build()).encode("utf-8")
+        snapshot = CatalogSnapshot(body)
+        store.put(key, snapshot, version)
+    return snapshot
+
+
+def snapshot_response(snapshot):
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    for etag in snapshot.etags():
+        if request.if_none_match.contains(etag.strip('"')):
+            headers["ETag"] = etag
+            return Response(b"", status=304, headers=headers)
+
+    encoding = snapshot.negotiate(request.accept_encodings)
+    body, etag = snapshot.variants[encoding]
+    headers["ETag"] = etag
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=200, headers=headers, mimetype="application/json")
+
+
+async def stream_response(rows, first):
+    if first is None:
+        await rows.aclose()  # nothing to stream; give back its connection now
+    async def generate():
+        if first is not None:
+            yield first
+            async for row in rows:
+                yield row
+    return stream_with_context(json_array_stream)(generate()), 200, {"Content-Type": "application/json"}
+
+@books_bp.route("/", methods=["GET"])
+async def get_books():
+    fields = request.args.get("fields")
+    if fields:
+        fields = tuple(f.strip() for f in fields.split(",") if f.strip())
+
+    params = {
+        "limit": request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
+        "page_cursor": request.args.get("cursor"),
+        "sort": request.args.get("sort", "isbn"),
+        "order": request.args.get("order", "asc"),
+        "fields": fields or None,
+    }
+
+    if request.args.get("stream", type=int):
+        params.pop("limit")
+        rows = iter_books(**params, batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+        try:
+            first = await anext(rows, None)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+        return await stream_response(rows, first)
+
+    async def build():
+        books, next_cursor = await get_books_page(**params)
+        return {"books": books, "next_cursor": next_cursor}
+
+    try:
+        snapshot = await get_catalog_snapshot(tuple(sorted(params.items())), build)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+
+    return snapshot_response(snapshot)
+
+@books_bp.route("/search", methods=["GET"])
+async def search_for_books():
+    title = request.args.get("title")
+    isbn = request.args.get("isbn")
+    author = request.args.get("author")
+    publisher = request.args.get("publisher")
+    try:
+        categories, filters = parse_search_filters(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+    batch_size = current_app.config.get("STREAM_BATCH_SIZE", 500)
+
+    # Same parameters and responses as the Flask route.
+    if filters or request.args.get("facets", type=int):
+        if categories:
+            filters["categories"] = categories
+        if request.args.get("stream", type=int):
+            rows = iter_faceted_book_search(isbn, title, author, publisher, filters, batch_size=batch_size)
+            return await stream_response(rows, await anext(rows, None))
+        result = await faceted_book_search(isbn, title, author, publisher, filters)
+        if not request.args.get("facets", type=int):
+            return jsonify(result["books"])
+        return jsonify(result)
+
+    category = categories[0] if categories else None
+    if request.args.get("stream", type=int):
+        rows = iter_book_search(isbn, title, category, author, publisher, batch_size=batch_size)
+        return await stream_response(rows, await anext(rows, None))
+
+    books = await book_search(isbn, title, category, author, publisher)
+    return jsonify(books)
+
+@books_bp.route("/search/cache", methods=["GET"])
+@admin_required
+async def search_cache_stats():
+    return jsonify(current_app.extensions["book_search_cache"].stats())
+
+@books_bp.route("/", methods=["POST"])
+@admin_required
+async def add_book():
+    data = await request.get_json()
+
+    try:
+        await add_new_book(data)
+    except IntegrityError:
+        return jsonify({"message": "Book with this ISBN already exists."}), 400
+
+    return jsonify({"message": "Book added successfully."}), 201
+
+@books_bp.route("/", methods=["PUT"])
+@admin_required
+async def update_book():
+    data = await request.get_json()
+
+    try:
+        await update_existing_book(data)
+    except IntegrityError as e:
+        # Negative stock, or less than the stock ledger has reserved.
+        return jsonify({"message": e.args[-1]}), HTTP_409_CONFLICT
+
+    return jsonify({"message": "Book updated successfully."}), 200
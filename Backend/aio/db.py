@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+from quart import current_app, g
+from db.pool import PoolTimeoutError
+
+
+def init_async_db(app):
+    # aiomysql pools are bound to the running loop, so the pool is opened
+    # when the ASGI server starts serving rather than in the factory.
+    @app.before_serving
+    async def open_pool():
+        size = app.config.get("DB_POOL_SIZE", 5)
+        app.extensions["async_db_pool"] = await aiomysql.create_pool(
+            host=app.config["DB_HOST"],
+            user=app.config["DB_USER"],
+            password=app.config["DB_PASSWORD"],
+            db=app.config["DB_NAME"],
+            minsize=size,
+            maxsize=size + app.config.get("DB_POOL_MAX_OVERFLOW", 10),
+            pool_recycle=app.config.get("DB_POOL_RECYCLE", 3600),
+            autocommit=False,
+        )
+
+    @app.after_serving
+    async def close_pool():
+        pool = app.extensions.pop("async_db_pool", None)
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
+
+    @app.teardown_appcontext
+    async def close_db(exception):
+        conn = g.pop("db", None)
+        if conn is not None:
+            await release(conn)
+
+
+def get_pool():
+    return current_app.extensions["async_db_pool"]
+
+
+async def acquire():
+    try:
+        return await asyncio.wait_for(get_pool().acquire(), current_app.config.get("DB_POOL_TIMEOUT", 30))
+    except asyncio.TimeoutError:
+        raise PoolTimeoutError("Timed out waiting for a database connection")
+
+
+async def release(conn):
+    # Like the sync pool, never hand an open transaction to the next request.
+    try:
+        await conn.rollback()
+    except Exception:
+        conn.close()  # the pool drops closed connections
+    get_pool().release(conn)
+
+
+async def get_db():
+    if "db" not in g:
+        g.db = await acquire()
+    return g.db
+
+
+@asynccontextmanager
+async def connection():
+    # A connection owned by one streamed response; it outlives the request
+    # context, so it can't be the one parked on g.
+    conn = await acquire()
+    try:
+        yield conn
+    finally:
+        await release(conn)
+
+
+def pool_stats():
+    pool = get_pool()
+    return {
+        "minsize": pool.minsize,
+        "maxsize": pool.maxsize,
+        "open": pool.size,
+        "idle": pool.freesize,
+        "in_use": pool.size - pool.freesize,
+    }
+
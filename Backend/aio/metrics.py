@@ -0,0 +1,32 @@
+import time
+
+from quart import g, request
+from db.metrics import Metrics
+
+
+# Request latency for the async app, in the same series as db.metrics.
+# aiomysql cursors aren't instrumented, so there are no statement metrics and
+# no per-request query counts here. Quart responses have no call_on_close, so
+# for streamed bodies (?stream=1) this is the time to the first byte, not
+# the whole response.
+def init_metrics(app):
+    metrics = Metrics(
+        slow_query_ms=app.config.get("SLOW_QUERY_MS", 200),
+        max_statements=app.config.get("METRICS_MAX_STATEMENTS", 500),
+    )
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    async def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    async def record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+            metrics.observe_request(request.method, endpoint, response.status_code,
+                                    time.perf_counter() - started, None)
+        return response
+
+    return metrics
@@ -0,0 +1,27 @@
+from quart import current_app
+
+
+async def iter_rows(cursor, batch_size=500):
+    # Async counterpart of db.streaming.iter_rows for aiomysql SS cursors.
+    try:
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        try:
+            await cursor.close()
+        except Exception:
+            pass
+
+
+async def json_array_stream(items):
+    dumps = current_app.json.dumps
+    yield "["
+    first = True
+    async for item in items:
+        yield dumps(item) if first else "," + dumps(item)
+        first = False
+    yield "]"
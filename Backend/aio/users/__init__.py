@@ -0,0 +1,4 @@
+from quart import Blueprint
+
+users_bp = Blueprint("users", __name__, url_prefix="/api/users")
+from . import routes
@@ -0,0 +1,191 @@
+import aiomysql
+from quart import current_app
+from aio.db import get_db, connection
+from aio.streaming import iter_rows
+from aio.books.models import refresh_stock
+from books.catalog import bump_catalog_version
+from books.ledger import sellable_stock
+from users.models import (OrderError, InsufficientStockError, ORDERS_PAGE_SIZE, MAX_ORDERS_PAGE_SIZE,
+                          merge_cart_lines, encode_order_cursor, decode_order_cursor)
+
+# Async twins of users.models: same SQL, same cache and catalog bookkeeping,
+# awaiting aiomysql instead of blocking on mysql.connector.
+
+
+def get_user_cache():
+    return current_app.extensions["user_cache"]
+
+
+async def create_user(username, password_hash, role="Customer", shipping_address=None,
+                      phone_number=None, email=None, first_name=None, last_name=None):
+    db = await get_db()
+    async with db.cursor() as cursor:
+        await cursor.execute("""
+                INSERT INTO user
+                (username, role, shipping_address, phone_number, email, password_hash, first_name, last_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (username, role, shipping_address, phone_number, email, password_hash, first_name, last_name))
+        await db.commit()
+        get_user_cache().invalidate(username)
+        return cursor.lastrowid
+
+
+async def get_user_by_username(username, include_password=False):
+    cache = get_user_cache()
+    if not include_password or cache.store_password_hash:
+        user = cache.get(username)
+        if user is not None:
+            if not include_password:
+                user.pop("password_hash", None)
+            return user
+
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute("SELECT * FROM user WHERE username=%s", (username,))
+        user = await cursor.fetchone()
+    if user is not None:
+        cache.put(username, user)
+        if not include_password:
+            user.pop("password_hash", None)
+    return user
+
+
+async def update_user_by_username(username, update_data):
+    if not update_data:
+        return False
+
+    set_clause = ", ".join([f"{key}=%s" for key in update_data.keys()])
+    values = list(update_data.values())
+    values.append(username)
+
+    db = await get_db()
+    async with db.cursor() as cursor:
+        await cursor.execute(f"UPDATE user SET {set_clause} WHERE username=%s", values)
+        await db.commit()
+        get_user_cache().invalidate(username, update_data.get("username"))
+        return cursor.rowcount > 0
+
+
+async def create_customer_order(username, credit_card, books):
+    lines = merge_cart_lines(books)
+    isbns = sorted(lines)
+
+    db = await get_db()
+    try:
+        async with db.cursor(aiomysql.DictCursor) as cursor:
+            placeholders = ", ".join(["%s"] * len(isbns))
+            # There is no ledger here, so hot books sell only what no holder reserved.
+            await cursor.execute(f"""
+                SELECT B.ISBN_number, B.selling_price,
+                       {sellable_stock(current_app.config.get("STOCK_LEDGER_ENABLED", False))} AS quantity_stock
+                FROM book AS B
+                WHERE B.ISBN_number IN ({placeholders})
+                ORDER BY B.ISBN_number
+                FOR UPDATE
+            """, isbns)
+            stock = {row["ISBN_number"]: row for row in await cursor.fetchall()}
+
+            missing = {isbn: "Book not found" for isbn in isbns if isbn not in stock}
+            if missing:
+                raise OrderError("Unknown books in cart", missing)
+            short = {
+                isbn: f"Requested {lines[isbn]}, only {stock[isbn]['quantity_stock']} in stock"
+                for isbn in isbns if stock[isbn]["quantity_stock"] < lines[isbn]
+            }
+            if short:
+                raise InsufficientStockError("Insufficient stock", short)
+
+            cost = sum(stock[isbn]["selling_price"] * lines[isbn] for isbn in isbns)
+            await cursor.execute(
+                "INSERT INTO customer_order (credit_card_number, username, cost) VALUES (%s, %s, %s)",
+                (credit_card, username, cost)
+            )
+            order_id = cursor.lastrowid
+            await cursor.executemany(
+                "INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) VALUES (%s, %s, %s, %s)",
+                [(order_id, isbn, lines[isbn], stock[isbn]["selling_price"]) for isbn in isbns]
+            )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    bump_catalog_version()
+    await refresh_stock(isbns)
+    return order_id
+
+
+async def get_customer_orders_page(username, limit=ORDERS_PAGE_SIZE, page_cursor=None, summary=False):
+    limit = max(1, min(int(limit), MAX_ORDERS_PAGE_SIZE))
+    query = """
+        SELECT order_id, order_date, cost
+        FROM customer_order
+        WHERE username = %s
+    """
+    params = [username]
+    if page_cursor:
+        query += " AND (order_date, order_id) < (%s, %s)"
+        params.extend(decode_order_cursor(page_cursor))
+    query += " ORDER BY order_date DESC, order_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    db = await get_db()
+    async with db.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(query, params)
+        orders = list(await cursor.fetchall())
+
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_order_cursor(orders[-1])
+
+        if not summary and orders:
+            order_ids = [order["order_id"] for order in orders]
+            placeholders = ", ".join(["%s"] * len(order_ids))
+            await cursor.execute(f"""
+                SELECT BO.order_id, BO.ISBN_number, B.title, BO.item_quantity AS quantity, BO.unit_price
+                FROM book_order AS BO
+                JOIN book AS B ON BO.ISBN_number = B.ISBN_number
+                WHERE BO.order_id IN ({placeholders})
+                ORDER BY BO.order_id, BO.ISBN_number
+            """, order_ids)
+            items = {}
+            for row in await cursor.fetchall():
+                items.setdefault(row.pop("order_id"), []).append(row)
+            for order in orders:
+                order["items"] = items.get(order["order_id"], [])
+    return orders, next_cursor
+
+
+async def iter_customer_orders(username, batch_size=500):
+    async with connection() as db:
+        cursor = await db.cursor(aiomysql.SSDictCursor)
+        await cursor.execute("""
+            SELECT CO.order_id, CO.order_date, CO.cost, BO.ISBN_number, BO.item_quantity AS quantity,
+            BO.unit_price, B.title
+            FROM customer_order AS CO
+            JOIN book_order AS BO ON CO.order_id = BO.order_id
+            JOIN book AS B ON BO.ISBN_number = B.ISBN_number
+            WHERE CO.username = %s
+            ORDER BY CO.order_date DESC, CO.order_id DESC
+        """, (username,))
+
+        order = None
+        async for row in iter_rows(cursor, batch_size):
+            if order is None or order["order_id"] != row["order_id"]:
+                if order is not None:
+                    yield order
+                order = {
+                    "order_id": row["order_id"],
+                    "order_date": row["order_date"],
+                    "cost": row["cost"],
+                    "items": []
+                }
+            order["items"].append({
+                "ISBN_number": row["ISBN_number"],
+                "title": row["title"],
+                "quantity": row["quantity"],
+                "unit_price": row["unit_price"]
+            })
+        if order is not None:
+            yield order
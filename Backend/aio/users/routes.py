@@ -0,0 +1,143 @@
+from . import users_bp
+from config import *
+from quart import request, jsonify, current_app, stream_with_context
+from aiomysql import IntegrityError
+from aio.users.models import *
+from auth.tokens import encode_access_token
+from aio.auth import jwt_required, get_jwt_identity
+from aio.streaming import json_array_stream
+from auth.passwords import HasherBusyError
+
+
+def get_password_hasher():
+    return current_app.extensions["password_hasher"]
+
+
+@users_bp.errorhandler(HasherBusyError)
+async def hasher_busy(e):
+    response = jsonify({"msg": "Server is busy, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, HTTP_503_UNAVAILABLE
+
+@users_bp.route("/login", methods=["POST"])
+async def login():
+    data = await request.get_json()
+    user = await get_user_by_username(data["username"], include_password=True)
+    password = data.get("password")
+
+    if not user or not await get_password_hasher().check_password_async(password, user["password_hash"]):
+        return jsonify({"msg": "Invalid credentials"}), HTTP_401_UNAUTHORIZED
+
+    token = encode_access_token(current_app.config, user["username"], user["role"])
+    return jsonify({"access_token": token, "role": user["role"]})
+
+@users_bp.route("/register", methods=["POST"])
+async def register():
+    data = await request.get_json()
+    username = data.get("username")
+    password = data.get("password")
+    role = data.get("role", "Customer")
+    shipping_address = data.get("shipping_address")
+    phone_number = data.get("phone_number")
+    email = data.get("email")
+    name = data.get("name", "").strip()
+    parts = name.split()
+    if len(parts) < 2:
+        return jsonify({"error": "Full name must include first and last name"}), 400
+    first_name = parts[0]
+    last_name = " ".join(parts[1:])
+
+    required_fields = [username, password, email, first_name, last_name]
+    if not all(required_fields):
+        return {"msg": "Missing required fields"}, HTTP_400_BAD_REQUEST
+
+    hashed_password = await get_password_hasher().hash_password_async(password)
+
+    try:
+        await create_user(username, hashed_password, role, shipping_address, phone_number, email,
+                          first_name, last_name)
+    except IntegrityError:
+        return {"msg": "Username already exists"}, HTTP_409_CONFLICT
+
+    return jsonify({"message": "success"}), HTTP_201_CREATED
+
+@users_bp.route("/me", methods=["GET"])
+@jwt_required()
+async def me():
+    user = await get_user_by_username(get_jwt_identity())
+    if not user:
+        return {"msg": "User not found"}, HTTP_404_NOT_FOUND
+    return user
+
+@users_bp.route("/me", methods=["PUT"])
+@jwt_required()
+async def update_profile():
+    username = get_jwt_identity()
+    data = await request.get_json()
+    allowed_fields = ("username", "first_name", "last_name", "email", "phone_number", "shipping_address")
+    updates = {field: data[field] for field in allowed_fields if field in data}
+
+    if "old_password" in data and "new_password" in data:
+        hasher = get_password_hasher()
+        user = await get_user_by_username(username, include_password=True)
+        if not user or not await hasher.check_password_async(data["old_password"], user["password_hash"]):
+            return jsonify({"msg": "Incorrect Password"}), HTTP_401_UNAUTHORIZED
+        updates["password_hash"] = await hasher.hash_password_async(data["new_password"])
+
+    if not updates:
+        return jsonify({"msg": "No valid fields provided for update"}), HTTP_400_BAD_REQUEST
+
+    try:
+        success = await update_user_by_username(username, updates)
+    except IntegrityError:
+        if "email" in data and "username" in data:
+            return jsonify({"msg": "Username or Email already taken"}), HTTP_409_CONFLICT
+        elif "username" in data:
+            return jsonify({"msg": "Username already taken"}), HTTP_409_CONFLICT
+        else:
+            return jsonify({"msg": "email already taken"}), HTTP_409_CONFLICT
+
+    if success:
+        return jsonify({"msg": "Profile updated successfully"}), 200
+    return jsonify({"msg": "User not found or no changes made"}), 404
+
+@users_bp.route("/orders", methods=["POST"])
+@jwt_required()
+async def order_books():
+    username = get_jwt_identity()
+    data = await request.get_json()
+
+    books = data.get("books")
+    credit_card = data.get("credit_card_number")
+
+    if not books or not isinstance(books, list) or not credit_card:
+        return jsonify({"msg": "Missing Arguments"}), HTTP_400_BAD_REQUEST
+
+    try:
+        order_id = await create_customer_order(username, credit_card, books)
+    except InsufficientStockError as e:
+        return jsonify({"msg": e.msg, "errors": e.errors}), HTTP_409_CONFLICT
+    except OrderError as e:
+        return jsonify({"msg": e.msg, "errors": e.errors}), HTTP_400_BAD_REQUEST
+    except IntegrityError:
+        return jsonify({"msg": "Invalid Input"}), HTTP_400_BAD_REQUEST
+
+    return jsonify({"msg": "Order placed successfully", "order_id": order_id}), 201
+
+@users_bp.route("/orders", methods=["GET"])
+@jwt_required()
+async def get_orders():
+    username = get_jwt_identity()
+    if request.args.get("stream", type=int):
+        orders = iter_customer_orders(username, batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+        return stream_with_context(json_array_stream)(orders), 200, {"Content-Type": "application/json"}
+    try:
+        orders, next_cursor = await get_customer_orders_page(
+            username,
+            limit=request.args.get("limit", ORDERS_PAGE_SIZE, type=int),
+            page_cursor=request.args.get("cursor"),
+            summary=bool(request.args.get("summary", type=int)),
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+    return jsonify({"orders": orders, "next_cursor": next_cursor})
@@ -1,9 +1,26 @@
 from flask import Flask, render_template, jsonify
-from flask import Flask, g
+from flask import Flask, g, Response
 from flask_cors import CORS
 from db import db_connection
+from db.db_connection import init_db, pool_stats, replica_stats
 from flask_jwt_extended import JWTManager
 from users import users_bp
+from books import books_bp
+from reports import reports_bp
+from replenishment import replenishment_bp
+from replenishment.models import init_replenishment
+from books.search_index import init_search_index
+from books.search_cache import init_search_cache
+from books.snapshot import init_catalog_snapshots
+from auth.passwords import init_password_hasher
+from users.cache import init_user_cache
+from users.intake import init_order_intake
+from books.ledger import init_stock_ledger
+from db.metrics import init_metrics, render_gauges
+from db.migrations import db_cli
+from auth.admission import init_admission
+from profiler import profiler_bp
+from profiler.models import init_profiler
 
 jwt = JWTManager()
 
@@ -21,16 +38,64 @@ def create_app(config_class=None):
         app.config.from_object("config.Config")
 
     jwt.init_app(app)
+    init_db(app)
+    if app.config.get("METRICS_ENABLED", True):
+        init_metrics(app)
+    init_admission(app)
+    init_profiler(app)
     app.register_blueprint(users_bp)
+    app.register_blueprint(books_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(replenishment_bp)
+    app.register_blueprint(profiler_bp)
+    app.cli.add_command(db_cli)
+    init_search_index(app)
+    init_search_cache(app)
+    init_catalog_snapshots(app)
+    init_password_hasher(app)
+    init_user_cache(app)
+    init_order_intake(app)
+    init_stock_ledger(app)
+    init_replenishment(app)
 
     @app.route("/health")
     def health():
         return {"status": "ok"}
 
+    @app.route("/health/db")
+    def db_health():
+        return {"pool": pool_stats(), "replicas": replica_stats()}
+
+    @app.route("/health/hasher")
+    def hasher_health():
+        return app.extensions["password_hasher"].stats()
+
+    @app.route("/health/intake")
+    def intake_health():
+        intake = app.extensions.get("order_intake")
+        return intake.stats() if intake is not None else {"mode": "sync"}
+
+    @app.route("/health/admission")
+    def admission_health():
+        admission = app.extensions.get("admission")
+        return admission.stats() if admission is not None else {"enabled": False}
+
+    @app.route("/metrics")
+    def metrics():
+        lines = []
+        if "metrics" in app.extensions:
+            lines += app.extensions["metrics"].render()
+        lines += render_gauges("db_pool", pool_stats())
+        lines += render_gauges("password_hasher", app.extensions["password_hasher"].stats())
+        lines += render_gauges("search_cache", app.extensions["book_search_cache"].stats())
+        lines += render_gauges("user_cache", app.extensions["user_cache"].stats())
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
     @app.teardown_appcontext
     def close_db(exception):
-        db = g.pop('db', None)
-        if db is not None:
-            db.close()
+        for name in ('db', 'db_read'):
+            db = g.pop(name, None)
+            if db is not None:
+                db.close()  # returns the connection to the pool
 
     return app
\ No newline at end of file
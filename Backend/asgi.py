@@ -0,0 +1,4 @@
+# Entry point for ASGI servers, e.g.: hypercorn asgi:app --workers 4
+from aio.app import create_async_app
+
+app = create_async_app()
@@ -0,0 +1,183 @@
+import math
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from werkzeug.utils import import_string
+from auth.tokens import TokenError, decode_access_token, token_from_header
+from config import HTTP_429_TOO_MANY_REQUESTS, HTTP_503_UNAVAILABLE
+
+# endpoint -> budget. rate is tokens per second per client, burst the bucket
+# size, concurrency the most requests this worker runs at once for the route
+# (None for no cap). Login and register each cost a bcrypt round; checkout
+# takes row locks.
+DEFAULT_RULES = {
+    "users.login": {"rate": 0.2, "burst": 10, "concurrency": 32},
+    "users.register": {"rate": 0.05, "burst": 5, "concurrency": 16},
+    "users.order_books": {"rate": 2, "burst": 20, "concurrency": 64},
+}
+
+
+class MemoryBucketStore:
+    # Token buckets for one worker process. Anything with the same take()
+    # can replace it (see ADMISSION_STORE) to share budgets across workers.
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Spend `cost` tokens; returns 0.0, or the seconds until they'd be there."""
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._sweep(now)
+                tokens = burst
+            else:
+                tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            # Third slot: when the bucket is full again and can be forgotten.
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+    def _sweep(self, now):
+        self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+        if len(self._buckets) >= self.max_keys:
+            # Every key is mid-burst; forgetting them beats unbounded memory.
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class AdmissionController:
+    def __init__(self, rules, store):
+        self.rules = rules
+        self.store = store
+        self._slots = {
+            endpoint: threading.BoundedSemaphore(rule["concurrency"])
+            for endpoint, rule in rules.items() if rule.get("concurrency")
+        }
+        self._counts = {endpoint: [0, 0, 0] for endpoint in rules}  # allowed, limited, busy
+
+    def decide(self, endpoint, method, client_key):
+        """Spend a request's budget; shared by the Flask and Quart hooks.
+
+        Returns (refusal, slot). refusal is None or (msg, status, wait); slot
+        is the concurrency slot to release when the request ends, if any.
+        client_key() is only called for routes with a rule.
+        """
+        rule = self.rules.get(endpoint)
+        if rule is None or method == "OPTIONS":  # CORS preflights are free
+            return None, None
+        counts = self._counts[endpoint]
+        wait = self.store.take((endpoint, client_key()), rule["rate"], rule["burst"])
+        if wait:
+            counts[1] += 1
+            return ("Too many requests, slow down", HTTP_429_TOO_MANY_REQUESTS, wait), None
+        slot = self._slots.get(endpoint)
+        if slot is not None and not slot.acquire(blocking=False):
+            counts[2] += 1
+            return ("Server is busy, please retry shortly", HTTP_503_UNAVAILABLE, 1), None
+        counts[0] += 1
+        return None, slot
+
+    def admit(self):
+        refusal, slot = self.decide(request.endpoint, request.method,
+                                    lambda: client_key(current_app.config, request.headers, request.remote_addr))
+        if refusal is not None:
+            return _refuse(*refusal)
+        if slot is not None:
+            g.admission_slot = slot
+        return None
+
+    def stats(self):
+        return {
+            endpoint: {"allowed": c[0], "limited": c[1], "busy": c[2]}
+            for endpoint, c in self._counts.items()
+        }
+
+
+def client_key(config, headers, remote_addr):
+    # A valid token pins the budget to the user; otherwise the client IP.
+    # A bad token falls back to the IP and the route rejects it as usual.
+    if "Authorization" in headers:
+        try:
+            claims = decode_access_token(config, token_from_header(headers["Authorization"]))
+            return f"user:{claims[config.get('JWT_IDENTITY_CLAIM', 'sub')]}"
+        except TokenError:
+            pass
+    return f"ip:{remote_addr}"
+
+
+def retry_after(wait):
+    return str(max(1, math.ceil(wait)))
+
+
+def _refuse(msg, status, wait):
+    response = jsonify({"msg": msg})
+    response.status_code = status
+    response.headers["Retry-After"] = retry_after(wait)
+    return response
+
+
+def _check_rule(endpoint, rule):
+    # The bucket divides by rate, and a burst below one request admits nothing.
+    rate, burst = rule.get("rate"), rule.get("burst")
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 < rate < math.inf:
+        raise ValueError(f"ADMISSION_RULES[{endpoint!r}]: rate must be a positive number, not {rate!r}")
+    if isinstance(burst, bool) or not isinstance(burst, (int, float)) or not 1 <= burst < math.inf:
+        raise ValueError(f"ADMISSION_RULES[{endpoint!r}]: burst must be at least 1, not {burst!r}")
+    concurrency = rule.get("concurrency")
+    if concurrency is not None and (isinstance(concurrency, bool) or not isinstance(concurrency, int)
+                                    or concurrency < 1):
+        raise ValueError(f"ADMISSION_RULES[{endpoint!r}]: concurrency must be None or at least 1, "
+                         f"not {concurrency!r}")
+
+
+def build_admission(app):
+    """The app's AdmissionController, or None when admission is switched off."""
+    if not app.config.get("ADMISSION_ENABLED", True):
+        return None
+    rules = dict(DEFAULT_RULES)
+    rules.update(app.config.get("ADMISSION_RULES") or {})
+    rules = {endpoint: rule for endpoint, rule in rules.items() if rule}  # None switches a route off
+    for endpoint, rule in rules.items():
+        _check_rule(endpoint, rule)
+    store = app.config.get("ADMISSION_STORE")
+    if store is None:
+        store = MemoryBucketStore(app.config.get("ADMISSION_MAX_KEYS", 100000))
+    else:
+        store = import_string(store)(app) if isinstance(store, str) else store(app)
+    controller = AdmissionController(rules, store)
+    app.extensions["admission"] = controller
+    return controller
+
+
+def init_admission(app):
+    controller = build_admission(app)
+    if controller is None:
+        return None
+
+    @app.before_request
+    def admit_request():
+        return controller.admit()
+
+    @app.teardown_request
+    def release_admission_slot(exception):
+        slot = g.pop("admission_slot", None)
+        if slot is not None:
+            slot.release()
+
+    return controller
+
+
+def get_admission():
+    return current_app.extensions.get("admission")
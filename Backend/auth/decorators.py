@@ -7,7 +7,7 @@ def admin_required(fn):
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
         claims = get_jwt()
-        if claims.get("role") != "admin":
+        if str(claims.get("role", "")).lower() != "admin":
             return jsonify({"msg": "Admins only"}), 403
         return fn(*args, **kwargs)
     return wrapper
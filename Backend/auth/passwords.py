@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import bcrypt
+from flask import current_app
+
+
+class HasherBusyError(Exception):
+    pass
+
+
+class PasswordHasher:
+    # bcrypt releases the GIL while it works, so a small thread pool keeps the
+    # 100-300 ms of key stretching off the request threads without needing a
+    # process pool. Beyond workers + max_queue pending jobs we refuse outright
+    # rather than let a login burst queue up behind itself.
+    def __init__(self, workers=4, max_queue=32, rounds=12, timeout=10):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pending_max = 0
+        self._rejected = 0
+        self._latency = {"hash": [0, 0.0, 0.0], "check": [0, 0.0, 0.0]}  # count, total, max
+
+    def _submit(self, kind, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HasherBusyError("Password hashing queue is full")
+            self._pending += 1
+            self._pending_max = max(self._pending_max, self._pending)
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    stats = self._latency[kind]
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    stats[2] = max(stats[2], elapsed)
+
+        future = self._executor.submit(job)
+        future.add_done_callback(self._done)
+        return future
+
+    def _run(self, kind, fn, *args):
+        future = self._submit(kind, fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HasherBusyError("Password hashing timed out")
+
+    async def _run_async(self, kind, fn, *args):
+        # Same pool and admission limits; the event loop awaits the result
+        # instead of a request thread blocking on it.
+        future = self._submit(kind, fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise HasherBusyError("Password hashing timed out")
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def hash_password(self, password):
+        hashed = self._run("hash", bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+
+    def check_password(self, password, password_hash):
+        return self._run("check", bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+    async def hash_password_async(self, password):
+        hashed = await self._run_async("hash", bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt(self.rounds))
+        return hashed.decode("utf-8")
+
+    async def check_password_async(self, password, password_hash):
+        return await self._run_async("check", bcrypt.checkpw, password.encode("utf-8"),
+                                     password_hash.encode("utf-8"))
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "queue_depth": self._pending,
+                "queue_depth_max": self._pending_max,
+                "rejected": self._rejected,
+            }
+            for kind, (count, total, worst) in self._latency.items():
+                stats[f"{kind}_count"] = count
+                stats[f"{kind}_ms_avg"] = total / count * 1000 if count else 0.0
+                stats[f"{kind}_ms_max"] = worst * 1000
+            return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def init_password_hasher(app):
+    hasher = PasswordHasher(
+        workers=app.config.get("BCRYPT_WORKERS", 4),
+        max_queue=app.config.get("BCRYPT_MAX_QUEUE", 32),
+        rounds=app.config.get("BCRYPT_ROUNDS", 12),
+        timeout=app.config.get("BCRYPT_TIMEOUT", 10),
+    )
+    app.extensions["password_hasher"] = hasher
+    return hasher
+
+
+def get_password_hasher():
+    hasher = current_app.extensions.get("password_hasher")
+    if hasher is None:
+        hasher = init_password_hasher(current_app)
+    return hasher
@@ -1,4 +1,74 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
 from flask_jwt_extended import create_access_token
 
+# encode_access_token and decode_access_token mirror flask_jwt_extended's
+# access tokens (claims, defaults and error messages) without needing a Flask
+# app, so the async app and admission control read the same tokens.
+DEFAULT_ACCESS_EXPIRES = timedelta(minutes=15)
+
+
+class TokenError(Exception):
+    def __init__(self, msg, status):
+        super().__init__(msg)
+        self.msg = msg
+        self.status = status
+
+
+def _expires(config):
+    expires = config.get("JWT_ACCESS_TOKEN_EXPIRES", DEFAULT_ACCESS_EXPIRES)
+    if isinstance(expires, (int, float)) and not isinstance(expires, bool):
+        expires = timedelta(seconds=expires)
+    return expires
+
+
 def generate_access_token(user_id, role):
-    return create_access_token(identity=str(user_id), additional_claims={"role": role})
\ No newline at end of file
+    return create_access_token(identity=str(user_id), additional_claims={"role": role})
+
+
+def encode_access_token(config, user_id, role):
+    now = datetime.now(timezone.utc)
+    claims = {
+        "fresh": False,
+        "iat": now,
+        "jti": str(uuid.uuid4()),
+        "type": "access",
+        config.get("JWT_IDENTITY_CLAIM", "sub"): str(user_id),
+        "nbf": now,
+        "role": role,
+    }
+    expires = _expires(config)
+    if expires:
+        claims["exp"] = now + expires
+    return jwt.encode(claims, config["JWT_SECRET_KEY"], config.get("JWT_ALGORITHM", "HS256"))
+
+
+def token_from_header(value):
+    if not value:
+        raise TokenError("Missing Authorization Header", 401)
+    parts = value.split()
+    if len(parts) != 2 or parts[0] != "Bearer":
+        raise TokenError("Bad Authorization header. Expected 'Authorization: Bearer <JWT>'", 422)
+    return parts[1]
+
+
+def decode_access_token(config, token):
+    try:
+        claims = jwt.decode(
+            token,
+            config["JWT_SECRET_KEY"],
+            algorithms=[config.get("JWT_ALGORITHM", "HS256")],
+            leeway=config.get("JWT_DECODE_LEEWAY", 0),
+            options={"verify_aud": False},
+        )
+    except jwt.ExpiredSignatureError:
+        raise TokenError("Token has expired", 401)
+    except jwt.InvalidTokenError as e:
+        raise TokenError(str(e), 422)
+    if claims.get("type") != "access":
+        raise TokenError("Only non-refresh tokens are allowed", 422)
+    if config.get("JWT_IDENTITY_CLAIM", "sub") not in claims:
+        raise TokenError(f"Missing claim: {config.get('JWT_IDENTITY_CLAIM', 'sub')}", 422)
+    return claims
@@ -0,0 +1,286 @@
+"""Drive the API with concurrent clients and report latency, throughput and SQL cost.
+
+    python -m benchmarks.seed --books 10000 --users 2000 --orders 20000
+    python -m benchmarks.run --concurrency 16 --requests 2000 --output results.json
+    python -m benchmarks.run --url http://127.0.0.1:5000 --scenarios catalog,search
+
+In-process runs (the default) use Flask test clients against BenchConfig and
+also count SQL statements per request; --url runs hit a live server over HTTP
+and report queries_per_request as null. Results are printed as JSON.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.seed import PASSWORD, WORDS, isbn_for, card_for
+
+SCENARIOS = ("login", "catalog", "search", "checkout", "order_history")
+
+
+class QueryCounter:
+    # Counts statements per thread by wrapping PooledConnection.cursor; each
+    # checkout gets a fresh proxy, so patching the class covers every request.
+    # The patch only lasts for the `with counter.install():` block.
+    def __init__(self):
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def install(self):
+        from db.pool import PooledConnection
+        counter = self
+
+        class CountingCursor:
+            def __init__(self, cursor):
+                self._cursor = cursor
+
+            def __getattr__(self, name):
+                return getattr(self._cursor, name)
+
+            def __iter__(self):
+                return iter(self._cursor)
+
+            def execute(self, *args, **kwargs):
+                counter.bump()
+                return self._cursor.execute(*args, **kwargs)
+
+            def executemany(self, *args, **kwargs):
+                counter.bump()
+                return self._cursor.executemany(*args, **kwargs)
+
+        def cursor(conn, *args, **kwargs):
+            return CountingCursor(conn._raw.cursor(*args, **kwargs))
+
+        original = PooledConnection.__dict__.get("cursor")  # normally absent: __getattr__ forwards it
+        PooledConnection.cursor = cursor
+        try:
+            yield self
+        finally:
+            if original is None:
+                del PooledConnection.cursor
+            else:
+                PooledConnection.cursor = original
+
+    def bump(self):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def take(self):
+        count = getattr(self._local, "count", 0)
+        self._local.count = 0
+        return count
+
+
+class InProcessClient:
+    def __init__(self, app, counter):
+        self._local = threading.local()
+        self.app = app
+        self.counter = counter
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.counter.take()
+        rv = client.open(path, method=method, json=body, headers=headers)
+        rv.close()  # drains streamed bodies so their queries are counted
+        return rv.status_code, self.counter.take()
+
+
+class HttpClient:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as rv:
+                rv.read()
+                return rv.status, None
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+
+def make_scenarios(args, tokens):
+    # Each builder takes a per-request Random and returns (method, path, body, token).
+    def user(rng):
+        return rng.randrange(args.users)
+
+    def login(rng):
+        return "POST", "/api/users/login", {"username": f"user{user(rng)}", "password": PASSWORD}, None
+
+    def catalog(rng):
+        sort = rng.choice(("isbn", "price", "year", "title"))
+        return "GET", f"/api/books/?limit=50&sort={sort}", None, None
+
+    def search(rng):
+        field = rng.choice(("title", "title", "author", "publisher", "category"))
+        if field == "category":
+            term = rng.choice(("Science", "Art", "Religion", "History", "Geography"))
+        elif field == "author":
+            term = rng.choice(("Smith", "Khan", "Garcia", "Sato", "Ada", "Jon"))
+        else:
+            term = rng.choice(WORDS)
+        return "GET", f"/api/books/search?{field}={term}", None, None
+
+    def checkout(rng):
+        u = user(rng)
+        books = [{"ISBN_number": isbn_for(rng.randrange(args.books)), "quantity": rng.randint(1, 2)}
+                 for _ in range(rng.randint(1, 3))]
+        return "POST", "/api/users/orders", {"credit_card_number": card_for(u), "books": books}, tokens[u]
+
+    def order_history(rng):
+        return "GET", "/api/users/orders?limit=20", None, tokens[user(rng)]
+
+    return {"login": login, "catalog": catalog, "search": search, "checkout": checkout,
+            "order_history": order_history}
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile; stable for small samples and easy to reason about.
+    if not sorted_values:
+        return None
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_scenario(client, build, requests, concurrency, warmup, seed):
+    def one(i):
+        method, path, body, token = build(random.Random(seed * 1_000_003 + i))
+        started = time.perf_counter()
+        status, queries = client.request(method, path, body, token)
+        return time.perf_counter() - started, status, queries
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(-warmup, 0)))
+        started = time.perf_counter()
+        results = list(pool.map(one, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    statuses = Counter(str(r[1]) for r in results)
+    queries = [r[2] for r in results if r[2] is not None]
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(wall, 4),
+        "rps": round(requests / wall, 2) if wall else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "status": dict(sorted(statuses.items())),
+        "errors": errors,
+        "queries_per_request": round(sum(queries) / len(queries), 3) if queries else None,
+    }
+
+
+def compare(results, baseline):
+    lines = []
+    for name, current in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for label, now, then in (
+            ("p50", current["latency_ms"]["p50"], before["latency_ms"]["p50"]),
+            ("p99", current["latency_ms"]["p99"], before["latency_ms"]["p99"]),
+            ("rps", current["rps"], before["rps"]),
+            ("queries", current["queries_per_request"], before["queries_per_request"]),
+        ):
+            if now is None or not then:
+                continue
+            lines.append(f"{name:14} {label:8} {then:>10} -> {now:<10} ({(now - then) / then * 100:+.1f}%)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--books", type=int, default=10000, help="must match the seeded dataset")
+    parser.add_argument("--users", type=int, default=2000, help="must match the seeded dataset")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="print deltas against a previous JSON report")
+    args = parser.parse_args(argv)
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    from app import create_app
+    from auth.tokens import generate_access_token
+    from config import BenchConfig
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        # Tokens are minted up front so only login scenarios pay for bcrypt.
+        tokens = [generate_access_token(f"user{i}", "Customer") for i in range(args.users)]
+
+    if args.url:
+        client, counting = HttpClient(args.url), contextlib.nullcontext()
+    else:
+        counter = QueryCounter()
+        client, counting = InProcessClient(app, counter), counter.install()
+
+    builders = make_scenarios(args, tokens)
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "target": args.url or "in-process",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "dataset": {"books": args.books, "users": args.users},
+        },
+        "scenarios": {},
+    }
+    with counting:
+        for name in names:
+            results["scenarios"][name] = run_scenario(client, builders[name], args.requests,
+                                                      args.concurrency, args.warmup, args.seed)
+            print(f"{name}: {results['scenarios'][name]['latency_ms']}", file=sys.stderr)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(results, json.load(f)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Seed a synthetic, deterministic dataset for the benchmark suite.
+
+    python -m benchmarks.seed --books 10000 --users 2000 --orders 20000
+
+Wipes and refills the database named by BenchConfig (never the production
+one) through the same get_db() connection the app uses.
+"""
+import argparse
+import datetime
+import random
+from decimal import Decimal
+
+import bcrypt
+from flask import current_app
+from app import create_app
+from config import Config, BenchConfig
+from db.db_connection import get_db
+
+PASSWORD = "benchpass"
+CATEGORIES = ("Science", "Art", "Religion", "History", "Geography")
+WORDS = ("history", "art", "science", "world", "modern", "ancient", "theory", "guide", "introduction",
+         "principles", "life", "light", "time", "space", "war", "peace", "faith", "river", "mountain",
+         "empire", "garden", "code", "number", "atlas", "journey", "silent", "golden", "hidden")
+FIRST_NAMES = ("Ada", "Ben", "Cleo", "Dan", "Eve", "Farid", "Gina", "Hiro", "Ines", "Jon", "Kemi", "Lena")
+LAST_NAMES = ("Smith", "Khan", "Garcia", "Ng", "Okafor", "Muller", "Rossi", "Sato", "Ali", "Brown")
+
+TABLES = ("book_order", "customer_order", "publisher_order", "author", "book", "publisher_telephone",
+          "publisher_address", "publisher", "credit_card", "user",
+          "daily_sales", "daily_customer_sales", "daily_book_sales",
+          "order_intake", "stock_reservation", "stock_pending", "publisher_order_batch")
+
+
+def isbn_for(i):
+    return f"978{i:010d}"
+
+
+def card_for(i):
+    return f"4{i:015d}"
+
+
+def _insert(cursor, query, rows, chunk=1000):
+    for start in range(0, len(rows), chunk):
+        cursor.executemany(query, rows[start:start + chunk])
+
+
+def seed(books=10000, authors_per_book=2, publishers=50, users=2000, orders=20000,
+         lines_per_order=3, seed=42):
+    rng = random.Random(seed)
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute("SET FOREIGN_KEY_CHECKS=0")
+    for table in TABLES:
+        try:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        except Exception:
+            pass  # optional tables (e.g. rollups) may not be installed
+    cursor.execute("SET FOREIGN_KEY_CHECKS=1")
+
+    _insert(cursor, "INSERT INTO publisher (publisher_id, name) VALUES (%s, %s)",
+            [(i, f"{rng.choice(WORDS).title()} {rng.choice(('Press', 'Books', 'Media', 'House'))} {i}")
+             for i in range(1, publishers + 1)])
+
+    prices = {}
+    book_rows = []
+    for i in range(books):
+        isbn = isbn_for(i)
+        prices[isbn] = Decimal(rng.randint(300, 9900)) / 100
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        # Stock is large so checkout benchmarks measure the happy path.
+        book_rows.append((isbn, title, rng.randint(1950, 2025), 1_000_000, rng.choice(CATEGORIES),
+                          10, prices[isbn], rng.randint(1, publishers), f"https://img.example/{isbn}.png"))
+    _insert(cursor, """
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category, threshold,
+                          selling_price, publisher_id, book_image)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, book_rows)
+
+    author_rows = []
+    for i in range(books):
+        names = {f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(authors_per_book)}
+        author_rows.extend((isbn_for(i), name) for name in names)
+    _insert(cursor, "INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)", author_rows)
+
+    # One shared hash (at the configured cost, so login timings stay honest)
+    # keeps seeding fast; every bench user logs in with PASSWORD.
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"),
+                                  bcrypt.gensalt(current_app.config["BCRYPT_ROUNDS"])).decode("utf-8")
+    _insert(cursor, """
+        INSERT INTO user (username, role, shipping_address, phone_number, email, password_hash, first_name, last_name)
+        VALUES (%s, 'Customer', %s, %s, %s, %s, %s, %s)
+    """, [(f"user{i}", f"{i} Bench St", f"555{i:07d}", f"user{i}@bench.example", password_hash,
+           rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)) for i in range(users)])
+    _insert(cursor, "INSERT INTO credit_card (credit_card_number, expiration_date) VALUES (%s, %s)",
+            [(card_for(i), datetime.date(2035, 1, 1)) for i in range(users)])
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    order_rows = []
+    line_rows = []
+    for order_id in range(1, orders + 1):
+        user = rng.randrange(users)
+        lines = {isbn_for(rng.randrange(books)): rng.randint(1, 3)
+                 for _ in range(rng.randint(1, lines_per_order))}
+        cost = sum(prices[isbn] * qty for isbn, qty in lines.items())
+        order_date = now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        order_rows.append((order_id, order_date, cost, card_for(user), f"user{user}"))
+        line_rows.extend((isbn, order_id, qty, prices[isbn]) for isbn, qty in lines.items())
+    _insert(cursor, """
+        INSERT INTO customer_order (order_id, order_date, cost, credit_card_number, username)
+        VALUES (%s, %s, %s, %s, %s)
+    """, order_rows)
+    _insert(cursor, """
+        INSERT INTO book_order (ISBN_number, order_id, item_quantity, unit_price)
+        VALUES (%s, %s, %s, %s)
+    """, line_rows)
+
+    db.commit()
+    return {"books": books, "authors": len(author_rows), "publishers": publishers, "users": users,
+            "orders": orders, "order_lines": len(line_rows)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--authors-per-book", type=int, default=2)
+    parser.add_argument("--publishers", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if BenchConfig.DB_NAME == Config.DB_NAME:
+        parser.error("BenchConfig points at the production database; refusing to wipe it")
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        counts = seed(books=args.books, authors_per_book=args.authors_per_book,
+                      publishers=args.publishers, users=args.users, orders=args.orders, seed=args.seed)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
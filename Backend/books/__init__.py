@@ -1,4 +1,4 @@
 from flask import Blueprint
 
 books_bp = Blueprint("books", __name__, url_prefix="/api/books")
-from . import routes 
+from . import routes, commands
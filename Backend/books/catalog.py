@@ -0,0 +1,18 @@
+import threading
+
+# Process-wide counter bumped on every committed catalog change (book rows,
+# authors, stock). Anything derived from the catalog remembers the version it
+# was computed at and is thrown away once the counter moves on.
+_lock = threading.Lock()
+_version = 0
+
+
+def catalog_version():
+    return _version
+
+
+def bump_catalog_version():
+    global _version
+    with _lock:
+        _version += 1
+        return _version
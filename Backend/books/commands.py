@@ -0,0 +1,49 @@
+import json
+
+import click
+from flask import current_app
+from . import books_bp
+from books.importer import import_books, IMPORT_FORMATS
+from books.ledger import check_ledger, reclaim_stale_holders
+from db.db_connection import get_db
+
+@books_bp.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS),
+              help="Defaults to the file extension (.csv, otherwise NDJSON).")
+@click.option("--chunk-size", type=int, help="Rows per transaction.")
+def import_command(path, fmt, chunk_size):
+    """Bulk upsert books and authors from a CSV or NDJSON file."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, "rb") as stream:
+        report = import_books(
+            stream,
+            fmt,
+            chunk_size=chunk_size or current_app.config.get("IMPORT_CHUNK_SIZE", 1000),
+            max_errors=current_app.config.get("IMPORT_MAX_ERRORS", 1000),
+        )
+    click.echo(json.dumps(report.as_dict(), indent=2, default=str))
+    if report.failed or report.aborted:
+        raise SystemExit(1)
+
+@books_bp.cli.command("ledger-check")
+def ledger_check_command():
+    """Verify stock reservations agree with book stock."""
+    report = check_ledger(get_db())
+    click.echo(json.dumps(report, indent=2, default=str))
+    if not report["ok"]:
+        raise SystemExit(1)
+
+@books_bp.cli.command("ledger-reconcile")
+@click.option("--ttl", type=int, help="Seconds without a heartbeat before a holder counts as stale.")
+def ledger_reconcile_command(ttl):
+    """Flush and release stale holders' reservations, then check the ledger."""
+    db = get_db()
+    if ttl is None:
+        ttl = current_app.config.get("STOCK_LEDGER_HOLDER_TTL", 60)
+    reclaimed = reclaim_stale_holders(db, ttl)
+    report = check_ledger(db)
+    report["reclaimed"] = reclaimed
+    click.echo(json.dumps(report, indent=2, default=str))
+    if not report["ok"]:
+        raise SystemExit(1)
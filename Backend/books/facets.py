@@ -0,0 +1,164 @@
+from array import array
+from bisect import bisect_right
+from decimal import Decimal
+import math
+
+NO_PUBLISHER = -1
+
+
+def to_cents(price):
+    if price is None:
+        return 0
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+SEARCH_RANGE_FILTERS = {"price_min": float, "price_max": float, "year_min": int, "year_max": int}
+
+
+def parse_search_filters(args):
+    # Query-string filters for a faceted search, shared by the Flask and
+    # Quart routes; raises ValueError for a malformed range.
+    filters = {}
+    categories = [c.strip() for value in args.getlist("category") for c in value.split(",") if c.strip()]
+    if len(categories) > 1:
+        filters["categories"] = categories
+    for name, kind in SEARCH_RANGE_FILTERS.items():
+        value = args.get(name)
+        if value in (None, ""):
+            continue
+        try:
+            filters[name] = kind(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+        if not math.isfinite(filters[name]):  # float() takes "nan" and "inf"
+            raise ValueError(f"{name} must be a number")
+    if args.get("in_stock", "").lower() in ("1", "true", "yes"):
+        filters["in_stock"] = True
+    return categories, filters
+
+
+def bucket_labels(buckets):
+    bounds = [0] + list(buckets)
+    labels = [f"{lo:g}-{hi:g}" for lo, hi in zip(bounds, bounds[1:])]
+    labels.append(f"{bounds[-1]:g}+")
+    return labels
+
+
+class CatalogColumns:
+    # Price, year, stock, category and publisher for every indexed book,
+    # one typed array per attribute, so filtering and facet counting is a
+    # scan over machine ints rather than dicts. Category and publisher are
+    # dictionary-encoded. Rows freed by remove() are reused.
+    def __init__(self, price_buckets=(10, 25, 50, 100)):
+        self.price_buckets = tuple(price_buckets)
+        self._bucket_cents = [to_cents(b) for b in self.price_buckets]
+        self.bucket_labels = bucket_labels(self.price_buckets)
+        self._rows = {}
+        self._isbns = []
+        self._free = []
+        self.price = array("q")
+        self.year = array("i")
+        self.stock = array("i")
+        self.bucket = array("b")
+        self.category = array("h")
+        self.publisher = array("i")
+        self._codes = {"category": {}, "publisher": {}}
+        self._names = {"category": [], "publisher": []}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _code(self, kind, name):
+        codes = self._codes[kind]
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(self._names[kind])
+            self._names[kind].append(name)
+        return code
+
+    def clear(self):
+        self.__init__(self.price_buckets)
+
+    def upsert(self, isbn, category, publisher, price, year, stock):
+        row = self._rows.get(isbn)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self._isbns[row] = isbn
+            else:
+                row = len(self._isbns)
+                self._isbns.append(isbn)
+                for column in (self.price, self.year, self.stock, self.bucket, self.category, self.publisher):
+                    column.append(0)
+            self._rows[isbn] = row
+        cents = to_cents(price)
+        self.price[row] = cents
+        self.year[row] = year or 0
+        self.stock[row] = stock or 0
+        self.bucket[row] = bisect_right(self._bucket_cents, cents)
+        self.category[row] = self._code("category", category)
+        self.publisher[row] = NO_PUBLISHER if publisher is None else self._code("publisher", publisher)
+
+    def set_stock(self, isbn, stock):
+        row = self._rows.get(isbn)
+        if row is not None:
+            self.stock[row] = stock or 0
+
+    def remove(self, isbn):
+        row = self._rows.pop(isbn, None)
+        if row is not None:
+            self._isbns[row] = None
+            self._free.append(row)
+
+    def filter(self, keys, categories=None, price_min=None, price_max=None, year_min=None, year_max=None,
+               in_stock=False):
+        """Keep the `keys` that pass every filter, in order, and count facets.
+
+        One pass over the keys. Category and price are counted
+        disjunctively: a book that fails only the category filter still
+        counts towards its category, and likewise for price, so the sidebar
+        can offer the other choices with real numbers. The index never
+        passes books without a publisher (they aren't searchable), so the
+        publisher counts add up to the matches.
+        """
+        wanted = None
+        if categories:
+            # category is an ENUM of plain ASCII names; match it case-insensitively.
+            wanted = {c.casefold() for c in categories}
+            wanted = {code for name, code in self._codes["category"].items() if name.casefold() in wanted}
+        low = None if price_min is None else to_cents(price_min)
+        high = None if price_max is None else to_cents(price_max)
+
+        rows, price, year, stock = self._rows, self.price, self.year, self.stock
+        category, publisher, bucket = self.category, self.publisher, self.bucket
+        category_counts = [0] * len(self._names["category"])
+        publisher_counts = [0] * (len(self._names["publisher"]) + 1)  # last slot: NO_PUBLISHER
+        bucket_counts = [0] * len(self.bucket_labels)
+        matches = []
+        for key in keys:
+            row = rows.get(key)
+            if row is None:
+                continue
+            if in_stock and stock[row] <= 0:
+                continue
+            if (year_min is not None and year[row] < year_min) or (year_max is not None and year[row] > year_max):
+                continue
+            category_ok = wanted is None or category[row] in wanted
+            cents = price[row]
+            price_ok = (low is None or cents >= low) and (high is None or cents <= high)
+            if category_ok and price_ok:
+                matches.append(key)
+                category_counts[category[row]] += 1
+                publisher_counts[publisher[row]] += 1
+                bucket_counts[bucket[row]] += 1
+            elif price_ok:
+                category_counts[category[row]] += 1
+            elif category_ok:
+                bucket_counts[bucket[row]] += 1
+
+        facets = {
+            "category": {name: n for name, n in zip(self._names["category"], category_counts) if n},
+            "publisher": {name: n for name, n in zip(self._names["publisher"], publisher_counts) if n},
+            "price": dict(zip(self.bucket_labels, bucket_counts)),
+        }
+        return matches, facets
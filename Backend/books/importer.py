@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from mysql.connector import Error as MySQLError
+from db.db_connection import get_db
+from books.catalog import bump_catalog_version
+from books.search_index import mark_search_index_stale
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+CATEGORIES = ("Science", "Art", "Religion", "History", "Geography")
+
+BOOK_COLUMNS = ("ISBN_number", "title", "publication_year", "quantity_stock", "category",
+                "selling_price", "book_image", "publisher_id", "threshold")
+
+UPSERT_BOOK = f"""
+    INSERT INTO book ({", ".join(BOOK_COLUMNS)})
+    VALUES ({", ".join(["%s"] * len(BOOK_COLUMNS))})
+    ON DUPLICATE KEY UPDATE {", ".join(f"{c} = VALUES({c})" for c in BOOK_COLUMNS[1:])}
+"""
+
+
+def iter_records(stream, fmt):
+    # Both readers pull one line at a time from the underlying byte stream.
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for record in csv.DictReader(text):
+            yield record
+    elif fmt == "ndjson":
+        for line in text:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"_error": f"Invalid JSON: {e}"}
+            yield record if isinstance(record, dict) else {"_error": "Each line must be a JSON object"}
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'")
+
+
+def _int(record, field, errors, minimum=None):
+    value = record.get(field)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        errors.append(f"{field} must be an integer")
+        return None
+    if minimum is not None and value < minimum:
+        errors.append(f"{field} must be >= {minimum}")
+    return value
+
+
+def validate_record(record):
+    if "_error" in record:
+        return None, [record["_error"]]
+    errors = []
+    isbn = str(record.get("ISBN_number") or "").strip()
+    if not isbn or len(isbn) > 20:
+        errors.append("ISBN_number is required (max 20 characters)")
+    title = str(record.get("title") or "").strip()
+    if not title:
+        errors.append("title is required")
+    book_image = str(record.get("book_image") or "").strip()
+    if not book_image:
+        errors.append("book_image is required")
+    category = record.get("category")
+    if category not in CATEGORIES:
+        errors.append(f"category must be one of {', '.join(CATEGORIES)}")
+    try:
+        selling_price = Decimal(str(record.get("selling_price")))
+        if not selling_price.is_finite() or selling_price < 0:
+            raise InvalidOperation
+    except InvalidOperation:
+        errors.append("selling_price must be a non-negative number")
+        selling_price = None
+    publication_year = _int(record, "publication_year", errors)
+    quantity_stock = _int(record, "quantity_stock", errors, minimum=0)
+    threshold = _int(record, "threshold", errors, minimum=0)
+    publisher_id = _int(record, "publisher_id", errors)
+
+    authors = record.get("authors")
+    if isinstance(authors, str):
+        authors = [a.strip() for a in authors.split(";")]
+    if authors is not None:
+        if not isinstance(authors, list) or not all(isinstance(a, str) for a in authors):
+            errors.append("authors must be a list of names (or ';'-separated in CSV)")
+            authors = None
+        else:
+            authors = list(dict.fromkeys(a for a in authors if a))
+
+    if errors:
+        return None, errors
+    row = (isbn, title, publication_year, quantity_stock, category, selling_price,
+           book_image, publisher_id, threshold)
+    return (row, authors), []
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.aborted = None
+
+    def fail(self, row, isbn, messages):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "ISBN_number": isbn, "errors": messages})
+
+    def as_dict(self):
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "aborted": self.aborted,
+        }
+
+
+def _write_chunk(db, chunk):
+    cursor = db.cursor()
+    cursor.executemany(UPSERT_BOOK, [row for _, (row, _) in chunk])
+    # Authors sent with a row replace the stored list, as update_existing_book does.
+    replaced = {row[0]: authors for _, (row, authors) in chunk if authors is not None}
+    if replaced:
+        placeholders = ", ".join(["%s"] * len(replaced))
+        cursor.execute(f"DELETE FROM author WHERE ISBN_number IN ({placeholders})", list(replaced))
+        pairs = [(isbn, name) for isbn, names in replaced.items() for name in names]
+        if pairs:
+            cursor.executemany("INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)", pairs)
+
+
+def _flush(db, chunk, report):
+    try:
+        _write_chunk(db, chunk)
+        db.commit()
+        report.imported += len(chunk)
+        return
+    except MySQLError:
+        db.rollback()
+
+    # Something in the batch was rejected (unknown publisher, trigger...).
+    # Replay it row by row so the report can name the offending rows.
+    for row, parsed in chunk:
+        try:
+            _write_chunk(db, [(row, parsed)])
+            db.commit()
+            report.imported += 1
+        except MySQLError as e:
+            db.rollback()
+            report.fail(row, parsed[0][0], [e.msg])
+
+
+def import_books(stream, fmt, chunk_size=1000, max_errors=1000):
+    db = get_db()
+    report = ImportReport(max_errors)
+    chunk = []
+    try:
+        for row, record in enumerate(iter_records(stream, fmt), start=1):
+            report.processed += 1
+            parsed, errors = validate_record(record)
+            if errors:
+                report.fail(row, record.get("ISBN_number"), errors)
+                continue
+            chunk.append((row, parsed))
+            if len(chunk) >= chunk_size:
+                _flush(db, chunk, report)
+                chunk = []
+        if chunk:
+            _flush(db, chunk, report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Committed chunks stay committed; report where the input broke.
+        report.aborted = f"Unreadable input after row {report.processed}: {e}"
+    finally:
+        if report.imported:
+            bump_catalog_version()
+            mark_search_index_stale()
+    return report
@@ -0,0 +1,368 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from flask import current_app
+from mysql.connector import Error as MySQLError
+from db.db_connection import get_db
+from books.catalog import bump_catalog_version
+from books.search_index import refresh_stock
+
+logger = logging.getLogger(__name__)
+
+
+def _case(rows, column):
+    # "CASE ISBN_number WHEN %s THEN %s ... END" for a per-row delta in one UPDATE.
+    whens = " ".join(["WHEN %s THEN %s"] * len(rows))
+    params = [value for isbn, qty in rows for value in (isbn, qty)]
+    return f"CASE {column} {whens} END", params
+
+
+# Stock that a checkout not going through a ledger may sell: whatever any
+# holder has reserved is already spoken for. FOR SHARE reads the latest
+# reservations rather than the transaction's snapshot.
+AVAILABLE_STOCK = """B.quantity_stock - (
+    SELECT COALESCE(SUM(R.units), 0) FROM stock_reservation AS R WHERE R.ISBN_number = B.ISBN_number FOR SHARE
+)"""
+
+
+def sellable_stock(ledger_enabled):
+    """The column expression checkouts compare a cart against, for `book AS B`."""
+    return AVAILABLE_STOCK if ledger_enabled else "B.quantity_stock"
+
+
+def _apply_sold(cursor, holder, sold):
+    rows = sorted(sold.items())
+    isbns = [isbn for isbn, _ in rows]
+    placeholders = ", ".join(["%s"] * len(isbns))
+    case, case_params = _case(rows, "ISBN_number")
+    # Book rows are locked before reservations everywhere (claims, checkouts),
+    # but the reservation goes down first here so that
+    # before_book_update_reserved_stock sees the sold units as no longer held.
+    cursor.execute(f"SELECT ISBN_number FROM book WHERE ISBN_number IN ({placeholders}) ORDER BY ISBN_number FOR UPDATE",
+                   isbns)
+    cursor.fetchall()
+    cursor.execute(f"""
+        UPDATE stock_reservation SET units = GREATEST(units - {case}, 0)
+        WHERE holder = %s AND ISBN_number IN ({placeholders})
+    """, case_params + [holder] + isbns)
+    # One statement for every book; the stock triggers still run for each
+    # row it touches.
+    cursor.execute(f"UPDATE book SET quantity_stock = quantity_stock - {case} WHERE ISBN_number IN ({placeholders})",
+                   case_params + isbns)
+
+
+def flush_holder(db, holder):
+    """Fold a holder's pending sales into book.quantity_stock.
+
+    Returns ({isbn: units applied}, {isbn: error}). The pending rows are
+    locked for the whole transaction, so two processes reconciling the same
+    holder can't apply a sale twice.
+    """
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, ISBN_number, quantity FROM stock_pending WHERE holder = %s ORDER BY id FOR UPDATE",
+                       (holder,))
+        pending = cursor.fetchall()
+        if not pending:
+            db.rollback()
+            return {}, {}
+        sold = {}
+        for row in pending:
+            sold[row["ISBN_number"]] = sold.get(row["ISBN_number"], 0) + row["quantity"]
+        last_id = pending[-1]["id"]
+        _apply_sold(cursor, holder, sold)
+        cursor.execute("DELETE FROM stock_pending WHERE holder = %s AND id <= %s", (holder, last_id))
+        db.commit()
+        return sold, {}
+    except MySQLError:
+        db.rollback()
+
+    # A book refused its delta (most likely an admin lowered its stock by
+    # hand). Apply the others one by one and leave that one pending.
+    applied, errors = {}, {}
+    for isbn in sorted(sold):
+        try:
+            cursor.execute("""
+                SELECT id FROM stock_pending WHERE holder = %s AND ISBN_number = %s AND id <= %s FOR UPDATE
+            """, (holder, isbn, last_id))
+            ids = [row["id"] for row in cursor.fetchall()]
+            if not ids:
+                db.rollback()
+                continue
+            _apply_sold(cursor, holder, {isbn: sold[isbn]})
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"DELETE FROM stock_pending WHERE id IN ({placeholders})", ids)
+            db.commit()
+            applied[isbn] = sold[isbn]
+        except MySQLError as e:
+            db.rollback()
+            errors[isbn] = e.msg
+    return applied, errors
+
+
+class StockLedger:
+    # Per-process view of the stock this process has reserved for hot books.
+    # Checkout sells from `remaining` under a per-book lock and only touches
+    # the database to claim another block (one short FOR UPDATE on the book
+    # row per `block` units) or to flush.
+    def __init__(self, holder, skus, block=50, flush_interval=1.0, holder_ttl=60):
+        self.holder = holder
+        self.skus = frozenset(skus)
+        self.block = block
+        self.flush_interval = flush_interval
+        self.holder_ttl = holder_ttl
+        self._locks = {isbn: threading.Lock() for isbn in self.skus}
+        self._remaining = {isbn: 0 for isbn in self.skus}
+        self._stats_lock = threading.Lock()
+        self.claims = 0
+        self.sold = 0
+        self.flushes = 0
+        self.flushed_units = 0
+        self.flush_errors = {}
+        self.reclaimed = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_hot(self, isbn):
+        return isbn in self.skus
+
+    def _claim(self, db, isbn, need):
+        cursor = db.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT quantity_stock FROM book WHERE ISBN_number = %s FOR UPDATE", (isbn,))
+            book = cursor.fetchone()
+            if book is None:
+                db.rollback()
+                return None
+            cursor.execute("SELECT COALESCE(SUM(units), 0) AS reserved FROM stock_reservation WHERE ISBN_number = %s",
+                           (isbn,))
+            claimable = book["quantity_stock"] - int(cursor.fetchone()["reserved"])
+            grab = min(claimable, max(self.block, need))
+            if grab > 0:
+                cursor.execute("""
+                    INSERT INTO stock_reservation (holder, ISBN_number, units) VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE units = units + VALUES(units), heartbeat = CURRENT_TIMESTAMP
+                """, (self.holder, isbn, grab))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        with self._stats_lock:
+            self.claims += 1
+        return max(grab, 0)
+
+    def take(self, db, lines):
+        """Sell `lines` ({isbn: qty}) from this process's reservations.
+
+        Must run before the caller opens its order transaction: claiming a
+        block commits on `db`. Returns {} on success, otherwise
+        {isbn: units available, or None if the book doesn't exist} with
+        nothing taken.
+        """
+        taken, short = {}, {}
+        for isbn in sorted(lines):
+            qty = lines[isbn]
+            with self._locks[isbn]:
+                if self._remaining[isbn] < qty:
+                    grabbed = self._claim(db, isbn, qty - self._remaining[isbn])
+                    if grabbed is None:
+                        short[isbn] = None
+                        continue
+                    self._remaining[isbn] += grabbed
+                if self._remaining[isbn] < qty:
+                    short[isbn] = self._remaining[isbn]
+                    continue
+                self._remaining[isbn] -= qty
+                taken[isbn] = qty
+        if short:
+            self.give_back(taken)
+            return short
+        with self._stats_lock:
+            self.sold += sum(taken.values())
+        return {}
+
+    def give_back(self, lines):
+        # The units are still reserved in the database, so this is local only.
+        for isbn, qty in lines.items():
+            with self._locks[isbn]:
+                self._remaining[isbn] += qty
+
+    def remaining(self):
+        return dict(self._remaining)
+
+    def flush(self, db):
+        applied, errors = flush_holder(db, self.holder)
+        cursor = db.cursor()
+        cursor.execute("UPDATE stock_reservation SET heartbeat = CURRENT_TIMESTAMP WHERE holder = %s", (self.holder,))
+        db.commit()
+        with self._stats_lock:
+            self.flushes += 1
+            self.flushed_units += sum(applied.values())
+            self.flush_errors = errors
+        if applied:
+            bump_catalog_version()
+            refresh_stock(applied, db)
+        return applied, errors
+
+    def reclaim_stale(self, db):
+        reclaimed = reclaim_stale_holders(db, self.holder_ttl, exclude=self.holder)
+        if reclaimed:
+            self.reclaimed = reclaimed
+        return reclaimed
+
+    def release(self, db):
+        # Flush what was sold, then hand every unsold reserved unit back.
+        self.flush(db)
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM stock_reservation WHERE holder = %s", (self.holder,))
+        db.commit()
+        for isbn in self.skus:
+            with self._locks[isbn]:
+                self._remaining[isbn] = 0
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+
+        def run():
+            last_reclaim = 0.0
+            while not self._stop.wait(self.flush_interval):
+                try:
+                    with app.app_context():
+                        db = get_db()
+                        self.flush(db)
+                        if time.monotonic() - last_reclaim > self.holder_ttl / 2:
+                            last_reclaim = time.monotonic()
+                            self.reclaim_stale(db)
+                except Exception:
+                    logger.exception("Stock ledger flush failed")
+
+        self._thread = threading.Thread(target=run, name="stock-ledger", daemon=True)
+        self._thread.start()
+
+    def stop(self, app):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 5)
+            self._thread = None
+        with app.app_context():
+            self.release(get_db())
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "holder": self.holder,
+                "skus": len(self.skus),
+                "block": self.block,
+                "remaining": self.remaining(),
+                "claims": self.claims,
+                "sold": self.sold,
+                "flushes": self.flushes,
+                "flushed_units": self.flushed_units,
+                "flush_errors": self.flush_errors,
+                "reclaimed_holders": self.reclaimed,
+            }
+
+
+def reclaim_stale_holders(db, ttl, exclude=None):
+    """Flush and release holders whose process stopped heart-beating."""
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT holder FROM stock_reservation
+        GROUP BY holder
+        HAVING MAX(heartbeat) < NOW() - INTERVAL %s SECOND
+        UNION
+        SELECT DISTINCT P.holder FROM stock_pending AS P
+        LEFT JOIN stock_reservation AS R ON (R.holder = P.holder)
+        WHERE R.holder IS NULL
+    """, (ttl,))
+    holders = [row["holder"] for row in cursor.fetchall() if row["holder"] != exclude]
+    db.rollback()
+    reclaimed = []
+    for holder in holders:
+        applied, errors = flush_holder(db, holder)
+        if errors:
+            logger.warning("Stale stock holder %s still has pending sales: %s", holder, errors)
+            continue
+        cursor.execute("""
+            DELETE FROM stock_reservation
+            WHERE holder = %s AND heartbeat < NOW() - INTERVAL %s SECOND
+        """, (holder, ttl))
+        db.commit()
+        reclaimed.append(holder)
+        if applied:
+            bump_catalog_version()
+            refresh_stock(applied, db)
+    return reclaimed
+
+
+def check_ledger(db, ledger=None):
+    """Verify the ledger tables agree with book and with this process.
+
+    - no book has more units reserved than it has in stock;
+    - no holder has sold more of a book than it reserved;
+    - this process's in-memory remaining units equal its reservation minus
+      its unflushed sales.
+    """
+    cursor = db.cursor(dictionary=True)
+    problems = []
+    cursor.execute("""
+        SELECT B.ISBN_number, B.quantity_stock, SUM(R.units) AS reserved
+        FROM stock_reservation AS R JOIN book AS B ON (B.ISBN_number = R.ISBN_number)
+        GROUP BY B.ISBN_number, B.quantity_stock
+        HAVING SUM(R.units) > B.quantity_stock
+    """)
+    for row in cursor.fetchall():
+        problems.append({"ISBN_number": row["ISBN_number"], "problem": "overcommitted",
+                         "stock": row["quantity_stock"], "reserved": int(row["reserved"])})
+
+    cursor.execute("""
+        SELECT P.holder, P.ISBN_number, SUM(P.quantity) AS pending, COALESCE(MAX(R.units), 0) AS units
+        FROM stock_pending AS P
+        LEFT JOIN stock_reservation AS R ON (R.holder = P.holder AND R.ISBN_number = P.ISBN_number)
+        GROUP BY P.holder, P.ISBN_number
+    """)
+    pending = {}
+    for row in cursor.fetchall():
+        pending[(row["holder"], row["ISBN_number"])] = int(row["pending"])
+        if int(row["pending"]) > row["units"]:
+            problems.append({"ISBN_number": row["ISBN_number"], "holder": row["holder"], "problem": "oversold",
+                             "pending": int(row["pending"]), "reserved": row["units"]})
+
+    if ledger is not None:
+        cursor.execute("SELECT ISBN_number, units FROM stock_reservation WHERE holder = %s", (ledger.holder,))
+        units = {row["ISBN_number"]: row["units"] for row in cursor.fetchall()}
+        for isbn, remaining in ledger.remaining().items():
+            expected = units.get(isbn, 0) - pending.get((ledger.holder, isbn), 0)
+            if remaining != expected:
+                problems.append({"ISBN_number": isbn, "holder": ledger.holder, "problem": "drift",
+                                 "remaining": remaining, "expected": expected})
+    db.rollback()
+    return {"ok": not problems, "problems": problems}
+
+
+def init_stock_ledger(app):
+    if not app.config.get("STOCK_LEDGER_ENABLED"):
+        return None
+    holder = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    ledger = StockLedger(
+        holder,
+        app.config.get("STOCK_LEDGER_SKUS", ()),
+        block=app.config.get("STOCK_LEDGER_BLOCK", 50),
+        flush_interval=app.config.get("STOCK_LEDGER_FLUSH_INTERVAL", 1.0),
+        holder_ttl=app.config.get("STOCK_LEDGER_HOLDER_TTL", 60),
+    )
+    app.extensions["stock_ledger"] = ledger
+    if app.config.get("STOCK_LEDGER_START_FLUSHER", True):
+        ledger.start(app)
+        atexit.register(ledger.stop, app)
+    return ledger
+
+
+def get_stock_ledger():
+    return current_app.extensions.get("stock_ledger")
@@ -1,25 +1,246 @@
+import base64
+import json
+
+from flask import current_app
 from db.db_connection import get_db
+from db.streaming import iter_rows
+from books.catalog import catalog_version, bump_catalog_version
+from books.search_cache import get_search_cache, search_key, copy_result
+from books.search_index import get_search_index, refresh_book
 
-def get_books_page():
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
+def attach_authors(cursor, books):
+    # One batched lookup for the whole page instead of a query per book.
+    if not books:
+        return books
+    isbns = list({book["ISBN_number"] for book in books})
+    placeholders = ", ".join(["%s"] * len(isbns))
+    cursor.execute(
+        f"SELECT ISBN_number, author_name FROM author WHERE ISBN_number IN ({placeholders}) "
+        "ORDER BY ISBN_number, author_name",
+        isbns
+    )
+    authors = {}
+    for row in cursor.fetchall():
+        authors.setdefault(row["ISBN_number"], []).append(row["author_name"])
+    for book in books:
+        book["authors"] = authors.get(book["ISBN_number"], [])
+    return books
 
-    query = """
-    SELECT DISTINCT B.ISBN_number, B.title, B.publication_year, B.quantity_stock, B.category, B.selling_price, B.book_image, P.name
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Each sort key is backed by an index on (column, ISBN_number) so a page is a
+# single index range read no matter how deep the cursor is.
+SORT_COLUMNS = {
+    "isbn": "B.ISBN_number",
+    "price": "B.selling_price",
+    "year": "B.publication_year",
+    "title": "B.title",
+}
+
+BOOK_FIELDS = {
+    "ISBN_number": "B.ISBN_number",
+    "title": "B.title",
+    "publication_year": "B.publication_year",
+    "quantity_stock": "B.quantity_stock",
+    "category": "B.category",
+    "selling_price": "B.selling_price",
+    "book_image": "B.book_image",
+    "name": "P.name",
+}
+
+def encode_cursor(sort, book):
+    key = SORT_COLUMNS[sort].split(".")[1]
+    value = book[key]
+    if not isinstance(value, (int, str)):
+        value = str(value)  # Decimal prices
+    raw = json.dumps([sort, value, book["ISBN_number"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(page_cursor, sort):
+    try:
+        cursor_sort, value, isbn = json.loads(base64.urlsafe_b64decode(page_cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match the requested sort")
+    return value, isbn
+
+def _listing_query(page_cursor, sort, order, fields, with_authors=False):
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort '{sort}'")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unsupported order '{order}'")
+    if fields is not None:
+        unknown = [f for f in fields if f not in BOOK_FIELDS and f != "authors"]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    sort_column = SORT_COLUMNS[sort]
+    sort_key = sort_column.split(".")[1]
+    wanted = list(BOOK_FIELDS) if fields is None else [f for f in fields if f in BOOK_FIELDS]
+    # The cursor is built from the sort key and ISBN, so always read those.
+    selected = list(dict.fromkeys(wanted + ["ISBN_number", sort_key]))
+    columns = [BOOK_FIELDS[f] for f in selected]
+    if with_authors:
+        columns.append("A.author_name")
+
+    query = f"""
+    SELECT {", ".join(columns)}
     FROM book AS B JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
     """
+    if with_authors:
+        query += " LEFT JOIN author AS A ON (A.ISBN_number = B.ISBN_number)"
+    params = []
+    if page_cursor:
+        value, isbn = decode_cursor(page_cursor, sort)
+        op = ">" if order == "asc" else "<"
+        if sort == "isbn":
+            query += f" WHERE B.ISBN_number {op} %s"
+            params.append(isbn)
+        else:
+            query += f" WHERE ({sort_column}, B.ISBN_number) {op} (%s, %s)"
+            params.extend([value, isbn])
+    direction = "ASC" if order == "asc" else "DESC"
+    if sort == "isbn":
+        query += f" ORDER BY B.ISBN_number {direction}"
+    else:
+        query += f" ORDER BY {sort_column} {direction}, B.ISBN_number {direction}"
+    if with_authors:
+        query += ", A.author_name"
+    return query, params
 
-    cursor.execute(query)
+def get_books_page(limit=DEFAULT_PAGE_SIZE, page_cursor=None, sort="isbn", order="asc", fields=None):
+    query, params = _listing_query(page_cursor, sort, order, fields)
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query += " LIMIT %s"
+    params.append(limit + 1)
 
+    db = get_db(readonly=True)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(query, params)
     books = cursor.fetchall()
-    for book in books:
-        cursor.execute("SELECT author_name FROM author WHERE ISBN_number = %s", (book['ISBN_number'],))
-        authors = cursor.fetchall()
-        book["authors"] = [a["author_name"] for a in authors]
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(sort, books[-1])
+
+    if fields is None or "authors" in fields:
+        attach_authors(cursor, books)
+    if fields is not None:
+        books = [{k: v for k, v in book.items() if k in fields} for book in books]
+    return books, next_cursor
+
+def iter_books(page_cursor=None, sort="isbn", order="asc", fields=None, batch_size=500):
+    # Streams the listing from an unbuffered cursor. Authors come from the
+    # same joined query (rows for one book are adjacent thanks to the ISBN
+    # tiebreaker), because the connection can't run a second statement while
+    # this result is still being read.
+    with_authors = fields is None or "authors" in fields
+    query, params = _listing_query(page_cursor, sort, order, fields, with_authors=with_authors)
+
+    db = get_db(readonly=True)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(query, params)
+
+    current = None
+    for row in iter_rows(cursor, batch_size):
+        if current is None or row["ISBN_number"] != current["ISBN_number"]:
+            if current is not None:
+                yield _project(current, fields)
+            current = row
+            if with_authors:
+                author = current.pop("author_name")
+                current["authors"] = [author] if author is not None else []
+        elif with_authors and row["author_name"] is not None:
+            current["authors"].append(row["author_name"])
+    if current is not None:
+        yield _project(current, fields)
+
+def _project(book, fields):
+    if fields is None:
+        return book
+    return {k: v for k, v in book.items() if k in fields}
+
+def get_books_by_isbn(isbns):
+    if not isbns:
+        return []
+    db = get_db(readonly=True)
+    cursor = db.cursor(dictionary=True)
+    placeholders = ", ".join(["%s"] * len(isbns))
+    cursor.execute(f"""
+    SELECT B.ISBN_number, B.title, B.publication_year, B.quantity_stock, B.category, B.selling_price, B.book_image, P.name
+    FROM book AS B JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+    WHERE B.ISBN_number IN ({placeholders})
+    """, list(isbns))
+    rows = {row["ISBN_number"]: row for row in cursor.fetchall()}
+    books = [rows[isbn] for isbn in isbns if isbn in rows]
+    attach_authors(cursor, books)
     return books
 
 def book_search(isbn, title, category, author, publisher):
-    db = get_db()
+    cache = get_search_cache()
+    key = search_key(isbn, title, category, author, publisher)
+    books = cache.get(key)
+    if books is not None:
+        return copy_result(books)
+
+    # Read the version first so a write racing this search invalidates it.
+    version = catalog_version()
+    if not current_app.config.get("SEARCH_INDEX_ENABLED", True):
+        books = book_search_sql(isbn, title, category, author, publisher)
+    else:
+        # The in-memory index resolves the LIKE filters; MySQL only hydrates hits.
+        isbns = get_search_index().search(isbn, title, category, author, publisher)
+        books = get_books_by_isbn(isbns)
+    cache.put(key, copy_result(books), version)
+    return books
+
+def faceted_search_key(isbn, title, author, publisher, filters):
+    return search_key(isbn, title, None, author, publisher) + (
+        tuple(sorted(c.casefold() for c in filters.get("categories") or ())),
+        filters.get("price_min"), filters.get("price_max"),
+        filters.get("year_min"), filters.get("year_max"), bool(filters.get("in_stock")),
+    )
+
+def faceted_book_search(isbn, title, author, publisher, filters):
+    """Search with attribute filters; returns {"books", "total", "facets"}.
+
+    `filters` holds categories, price_min/price_max, year_min/year_max and
+    in_stock. Always served from the in-memory index, which carries the
+    filterable columns and is refreshed by add_new_book/update_existing_book.
+    """
+    cache = get_search_cache()
+    key = faceted_search_key(isbn, title, author, publisher, filters)
+    result = cache.get(key)
+    if result is not None:
+        return copy_result(result)
+
+    version = catalog_version()
+    # in_stock is decided by the index (kept current by refresh_stock), so
+    # the books, total and facet counts all agree.
+    isbns, facets = get_search_index().facet_search(isbn, title, author, publisher, **filters)
+    result = {"books": get_books_by_isbn(isbns), "total": len(isbns), "facets": facets}
+    cache.put(key, copy_result(result), version)
+    return result
+
+def iter_faceted_book_search(isbn, title, author, publisher, filters, batch_size=500):
+    isbns, _ = get_search_index().facet_search(isbn, title, author, publisher, **filters)
+    for start in range(0, len(isbns), batch_size):
+        yield from get_books_by_isbn(isbns[start:start + batch_size])
+
+def iter_book_search(isbn, title, category, author, publisher, batch_size=500):
+    if not current_app.config.get("SEARCH_INDEX_ENABLED", True):
+        yield from book_search_sql(isbn, title, category, author, publisher)
+        return
+    # Only the matching ISBNs are held; rows are hydrated one batch at a time.
+    isbns = get_search_index().search(isbn, title, category, author, publisher)
+    for start in range(0, len(isbns), batch_size):
+        yield from get_books_by_isbn(isbns[start:start + batch_size])
+
+def book_search_sql(isbn, title, category, author, publisher):
+    db = get_db(readonly=True)
     cursor = db.cursor(dictionary=True)
 
     query = """
@@ -29,7 +250,7 @@ def book_search(isbn, title, category, author, publisher):
     params = []
     
     if isbn:
-        query += " AND ISBN_number = %s"
+        query += " AND B.ISBN_number = %s"
         params.append(isbn)
     if title:
         query += " AND title LIKE %s"
@@ -47,10 +268,7 @@ def book_search(isbn, title, category, author, publisher):
     cursor.execute(query, params)
     books= cursor.fetchall()
 
-    for book in books:
-        cursor.execute("SELECT author_name FROM author WHERE ISBN_number = %s", (book['ISBN_number'],))
-        authors = cursor.fetchall()
-        book["authors"] = [a["author_name"] for a in authors]
+    attach_authors(cursor, books)
     return books
    
 def add_new_book(data):
@@ -79,6 +297,8 @@ def add_new_book(data):
         cursor.execute(insert_author_query, (isbn, author))
 
     db.commit()
+    bump_catalog_version()
+    refresh_book(isbn)
 
 def update_existing_book(data):
     db = get_db()
@@ -132,4 +352,6 @@ def update_existing_book(data):
             insert_author_query = "INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)"
             cursor.execute(insert_author_query, (isbn, author))
     db.commit()
+    bump_catalog_version()
+    refresh_book(isbn)
     
\ No newline at end of file
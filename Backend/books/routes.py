@@ -1,32 +1,113 @@
 from . import books_bp
 from config import *
-from flask import Blueprint, request, jsonify
-from models import *
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
+from books.models import *
+from books.search_cache import get_search_cache
+from books.facets import parse_search_filters
+from books.ledger import get_stock_ledger, check_ledger
+from db.db_connection import get_db
+from books.snapshot import get_catalog_snapshot, snapshot_response
+from db.streaming import json_array_stream
+from books.importer import import_books, IMPORT_FORMATS
 from auth.tokens import generate_access_token
 from auth.decorators import admin_required
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from mysql.connector import IntegrityError
-import bcrypt
+import io
+
+def stream_response(rows, first):
+    def generate():
+        if first is not None:
+            yield first
+            yield from rows
+    return Response(stream_with_context(json_array_stream(generate())), mimetype="application/json")
 
 @books_bp.route("/", methods=["GET"])
 def get_books():
-    
-    books = get_books_page()
+    fields = request.args.get("fields")
+    if fields:
+        fields = tuple(f.strip() for f in fields.split(",") if f.strip())
 
-    return jsonify(books)
+    params = {
+        "limit": request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
+        "page_cursor": request.args.get("cursor"),
+        "sort": request.args.get("sort", "isbn"),
+        "order": request.args.get("order", "asc"),
+        "fields": fields or None,
+    }
+
+    if request.args.get("stream", type=int):
+        params.pop("limit")
+        # Validate before the response starts; errors can't be reported mid-stream.
+        rows = iter_books(**params, batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+        try:
+            first = next(rows, None)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+        return stream_response(rows, first)
+
+    def build():
+        books, next_cursor = get_books_page(**params)
+        return {"books": books, "next_cursor": next_cursor}
+
+    try:
+        snapshot = get_catalog_snapshot(tuple(sorted(params.items())), build)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+
+    return snapshot_response(snapshot)
 
 @books_bp.route("/search", methods=["GET"])
 def search_for_books():
     title = request.args.get("title")
     isbn = request.args.get("isbn")
-    category = request.args.get("category")
     author = request.args.get("author")
     publisher = request.args.get("publisher")
+    try:
+        categories, filters = parse_search_filters(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+
+    # Facets, ranges, in-stock and multi-category go through the columnar
+    # index; a plain search keeps its original list response.
+    if filters or request.args.get("facets", type=int):
+        if categories:
+            filters["categories"] = categories
+        if request.args.get("stream", type=int):
+            books = iter_faceted_book_search(isbn, title, author, publisher, filters,
+                                             batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+            return Response(stream_with_context(json_array_stream(books)), mimetype="application/json")
+        result = faceted_book_search(isbn, title, author, publisher, filters)
+        if not request.args.get("facets", type=int):
+            return jsonify(result["books"])
+        return jsonify(result)
+
+    category = categories[0] if categories else None
+    if request.args.get("stream", type=int):
+        books = iter_book_search(isbn, title, category, author, publisher,
+                                 batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+        return Response(stream_with_context(json_array_stream(books)), mimetype="application/json")
 
     books = book_search(isbn, title, category, author, publisher)
 
     return jsonify(books)
 
+@books_bp.route("/search/cache", methods=["GET"])
+@admin_required
+def search_cache_stats():
+    return jsonify(get_search_cache().stats())
+
+@books_bp.route("/ledger", methods=["GET"])
+@admin_required
+def stock_ledger_stats():
+    ledger = get_stock_ledger()
+    if ledger is None:
+        return jsonify({"enabled": False})
+    stats = ledger.stats()
+    if request.args.get("check"):
+        stats["check"] = check_ledger(get_db(), ledger)
+    return jsonify(stats)
+
 @books_bp.route("/", methods=["POST"])
 @admin_required
 def add_book():
@@ -39,12 +120,33 @@ def add_book():
 
     return jsonify({"message": "Book added successfully."}), 201
 
+@books_bp.route("/import", methods=["POST"])
+@admin_required
+def import_catalog():
+    fmt = request.args.get("format")
+    if not fmt:
+        fmt = "csv" if request.mimetype == "text/csv" else "ndjson"
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"msg": f"format must be one of {', '.join(IMPORT_FORMATS)}"}), HTTP_400_BAD_REQUEST
+
+    report = import_books(
+        io.BufferedReader(request.stream),
+        fmt,
+        chunk_size=current_app.config.get("IMPORT_CHUNK_SIZE", 1000),
+        max_errors=current_app.config.get("IMPORT_MAX_ERRORS", 1000),
+    )
+    return jsonify(report.as_dict()), HTTP_200_OK
+
 @books_bp.route("/", methods=["PUT"])
 @admin_required
 def update_book():
     data = request.get_json()
 
-    update_existing_book(data)
+    try:
+        update_existing_book(data)
+    except IntegrityError as e:
+        # Negative stock, or less than the stock ledger has reserved.
+        return jsonify({"message": e.msg}), HTTP_409_CONFLICT
 
     return jsonify({"message": "Book updated successfully."}), 200
 
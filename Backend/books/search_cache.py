@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from books.catalog import catalog_version
+from books.search_index import normalize
+
+
+def search_key(isbn, title, category, author, publisher):
+    # Same normalization the search itself applies, so "History" and
+    # "history" share one entry. Empty strings are treated as absent.
+    return tuple(normalize(v) if v else None for v in (isbn, title, category, author, publisher))
+
+
+def copy_result(value):
+    # Cached search results are shared by every request that hits them; hand
+    # out fresh rows, author lists and facet counts so a caller that edits
+    # its result can't change what the next one is served.
+    def copy_books(books):
+        return [dict(book, authors=list(book["authors"])) if "authors" in book else dict(book) for book in books]
+
+    if isinstance(value, dict):
+        return dict(value, books=copy_books(value["books"]),
+                    facets={name: dict(counts) for name, counts in value["facets"].items()})
+    return copy_books(value)
+
+
+class SearchCache:
+    def __init__(self, maxsize=512, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        version = catalog_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, entry_version, expires_at = entry
+            if entry_version != version:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "catalog_version": catalog_version(),
+            }
+
+
+def init_search_cache(app):
+    cache = SearchCache(
+        maxsize=app.config.get("SEARCH_CACHE_SIZE", 512),
+        ttl=app.config.get("SEARCH_CACHE_TTL", 60),
+    )
+    app.extensions["book_search_cache"] = cache
+    return cache
+
+
+def get_search_cache():
+    cache = current_app.extensions.get("book_search_cache")
+    if cache is None:
+        cache = init_search_cache(current_app)
+    return cache
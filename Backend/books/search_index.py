@@ -0,0 +1,306 @@
+import re
+import threading
+import time
+import unicodedata
+
+from flask import current_app
+from db.db_connection import get_db
+from books.facets import CatalogColumns
+
+TEXT_FIELDS = ("title", "author", "publisher")
+
+
+def normalize(text):
+    # Mirror the utf8mb4_0900_ai_ci collation MySQL uses for LIKE/=:
+    # case- and accent-insensitive.
+    if text is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LikePattern:
+    # Compiles the user's input exactly the way `col LIKE '%<input>%'` reads
+    # it: '%' and '_' stay wildcards and '\' escapes the next character.
+    def __init__(self, term):
+        regex = []
+        literals = [""]
+        chars = iter(normalize(term))
+        for c in chars:
+            if c == "\\":
+                c = next(chars, "\\")
+                regex.append(re.escape(c))
+                literals[-1] += c
+            elif c == "%":
+                regex.append(".*")
+                literals.append("")
+            elif c == "_":
+                regex.append(".")
+                literals.append("")
+            else:
+                regex.append(re.escape(c))
+                literals[-1] += c
+        self.literal = normalize(term) if len(literals) == 1 else None
+        self.regex = re.compile("".join(regex), re.DOTALL)
+        self.grams = set()
+        for segment in literals:
+            self.grams |= trigrams(segment)
+
+    def match(self, text):
+        return self.regex.search(text) is not None
+
+    def score(self, text):
+        if self.literal is not None:
+            if text == self.literal:
+                return 4.0
+            if text.startswith(self.literal):
+                return 3.0
+            if (" " + text).find(" " + self.literal) != -1:
+                return 2.0
+        return 1.0
+
+
+class BookSearchIndex:
+    def __init__(self, price_buckets=(10, 25, 50, 100)):
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._postings = {field: {} for field in TEXT_FIELDS}
+        self.columns = CatalogColumns(price_buckets)
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _texts(self, doc, field):
+        if field == "author":
+            return doc["authors"]
+        return [doc[field]]
+
+    def _add_postings(self, isbn, doc):
+        for field in TEXT_FIELDS:
+            postings = self._postings[field]
+            for text in self._texts(doc, field):
+                for gram in trigrams(text):
+                    postings.setdefault(gram, set()).add(isbn)
+
+    def _drop_postings(self, isbn, doc):
+        for field in TEXT_FIELDS:
+            postings = self._postings[field]
+            for text in self._texts(doc, field):
+                for gram in trigrams(text):
+                    bucket = postings.get(gram)
+                    if bucket is not None:
+                        bucket.discard(isbn)
+                        if not bucket:
+                            del postings[gram]
+
+    def _make_doc(self, isbn, title, category, publisher, authors):
+        return {
+            "isbn": normalize(isbn),
+            "title": normalize(title),
+            "category": normalize(category),
+            "publisher": normalize(publisher),
+            "authors": [normalize(a) for a in authors],
+            # book_search joins author and publisher, so books missing either
+            # were never returned; keep it that way.
+            "searchable": publisher is not None and bool(authors),
+        }
+
+    def build(self, books, authors):
+        docs = {}
+        by_isbn = {}
+        for row in authors:
+            by_isbn.setdefault(row["ISBN_number"], []).append(row["author_name"])
+        with self._lock:
+            self._docs = docs
+            self._postings = {field: {} for field in TEXT_FIELDS}
+            self.columns.clear()
+            for book in books:
+                isbn = book["ISBN_number"]
+                doc = self._make_doc(isbn, book["title"], book["category"], book["name"],
+                                     by_isbn.get(isbn, []))
+                docs[isbn] = doc
+                self._add_postings(isbn, doc)
+                self.columns.upsert(isbn, book["category"], book["name"], book.get("selling_price"),
+                                    book.get("publication_year"), book.get("quantity_stock"))
+            self.built_at = time.monotonic()
+
+    def upsert(self, isbn, title, category, publisher, authors, price=None, year=None, stock=None):
+        doc = self._make_doc(isbn, title, category, publisher, authors)
+        with self._lock:
+            old = self._docs.get(isbn)
+            if old is not None:
+                self._drop_postings(isbn, old)
+            self._docs[isbn] = doc
+            self._add_postings(isbn, doc)
+            self.columns.upsert(isbn, category, publisher, price, year, stock)
+
+    def set_stock(self, stocks):
+        with self._lock:
+            for isbn, stock in stocks.items():
+                self.columns.set_stock(isbn, stock)
+
+    def remove(self, isbn):
+        with self._lock:
+            old = self._docs.pop(isbn, None)
+            if old is not None:
+                self._drop_postings(isbn, old)
+            self.columns.remove(isbn)
+
+    def _candidates(self, field, pattern):
+        if not pattern.grams:
+            return None  # too short to prune; verify every doc
+        postings = self._postings[field]
+        result = None
+        for gram in sorted(pattern.grams, key=lambda g: len(postings.get(g, ()))):
+            bucket = postings.get(gram)
+            if not bucket:
+                return set()
+            result = set(bucket) if result is None else result & bucket
+            if not result:
+                return result
+        return result
+
+    def search(self, isbn=None, title=None, category=None, author=None, publisher=None):
+        patterns = {}
+        if title:
+            patterns["title"] = LikePattern(title)
+        if author:
+            patterns["author"] = LikePattern(author)
+        if publisher:
+            patterns["publisher"] = LikePattern(publisher)
+        isbn = normalize(isbn) if isbn else None
+        category = normalize(category) if category else None
+
+        with self._lock:
+            candidates = None
+            if isbn:
+                if isbn in self._docs:
+                    candidates = {isbn}
+                else:
+                    candidates = {k for k, d in self._docs.items() if d["isbn"] == isbn}
+            for field, pattern in patterns.items():
+                found = self._candidates(field, pattern)
+                if found is not None:
+                    candidates = found if candidates is None else candidates & found
+            if candidates is None:
+                candidates = self._docs.keys()
+
+            ranked = []
+            for key in candidates:
+                doc = self._docs.get(key)
+                if doc is None or not doc["searchable"]:
+                    continue
+                if isbn and doc["isbn"] != isbn:
+                    continue
+                if category and doc["category"] != category:
+                    continue
+                score = 0.0
+                for field, pattern in patterns.items():
+                    best = max((pattern.score(t) for t in self._texts(doc, field) if pattern.match(t)),
+                               default=None)
+                    if best is None:
+                        break
+                    score += best
+                else:
+                    ranked.append((-score, doc["title"], key))
+
+        ranked.sort()
+        return [key for _, _, key in ranked]
+
+    def facet_search(self, isbn=None, title=None, author=None, publisher=None, categories=None,
+                     price_min=None, price_max=None, year_min=None, year_max=None, in_stock=False):
+        # Text filters narrow and rank through the trigram postings; the
+        # columns then apply the attribute filters and count facets in the
+        # same pass.
+        with self._lock:
+            keys = self.search(isbn, title, None, author, publisher)
+            return self.columns.filter(keys, categories, price_min, price_max, year_min, year_max, in_stock)
+
+
+def load_index(index):
+    db = get_db(readonly=True)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+    SELECT B.ISBN_number, B.title, B.category, P.name, B.selling_price, B.publication_year, B.quantity_stock
+    FROM book AS B LEFT JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+    """)
+    books = cursor.fetchall()
+    cursor.execute("SELECT ISBN_number, author_name FROM author")
+    index.build(books, cursor.fetchall())
+    return index
+
+
+def init_search_index(app):
+    index = BookSearchIndex(app.config.get("SEARCH_PRICE_BUCKETS", (10, 25, 50, 100)))
+    app.extensions["book_search_index"] = index
+    if app.config.get("SEARCH_INDEX_BUILD_ON_STARTUP"):
+        with app.app_context():
+            try:
+                load_index(index)
+            except Exception as e:
+                # Don't keep the app from starting; the first search builds it.
+                app.logger.warning("Book search index not built at startup: %s", e)
+    return index
+
+
+def get_search_index():
+    index = current_app.extensions.get("book_search_index")
+    if index is None:
+        index = init_search_index(current_app)
+    max_age = current_app.config.get("SEARCH_INDEX_MAX_AGE")
+    with index._lock:
+        # Other workers' writes only reach this process through a rebuild.
+        if index.built_at is None or (max_age and time.monotonic() - index.built_at > max_age):
+            load_index(index)
+    return index
+
+
+def mark_search_index_stale():
+    # For bulk changes: cheaper to rebuild once on the next search than to
+    # refresh thousands of books one by one.
+    index = current_app.extensions.get("book_search_index")
+    if index is not None:
+        index.built_at = None
+
+
+def refresh_stock(isbns, db=None):
+    """Re-read quantity_stock for `isbns` into the index after a committed
+    purchase, ledger flush or restock, so in_stock filters and counts see
+    it. Ends the read transaction it opens on `db`."""
+    index = current_app.extensions.get("book_search_index")
+    if index is None or index.built_at is None or not isbns:
+        return
+    isbns = sorted(set(isbns))
+    db = db or get_db()
+    cursor = db.cursor(dictionary=True)
+    placeholders = ", ".join(["%s"] * len(isbns))
+    cursor.execute(f"SELECT ISBN_number, quantity_stock FROM book WHERE ISBN_number IN ({placeholders})", isbns)
+    stocks = {row["ISBN_number"]: row["quantity_stock"] for row in cursor.fetchall()}
+    db.commit()
+    index.set_stock(stocks)
+
+
+def refresh_book(isbn):
+    index = current_app.extensions.get("book_search_index")
+    if index is None or index.built_at is None:
+        return
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("""
+    SELECT B.ISBN_number, B.title, B.category, P.name, B.selling_price, B.publication_year, B.quantity_stock
+    FROM book AS B LEFT JOIN publisher AS P ON (B.publisher_id = P.publisher_id)
+    WHERE B.ISBN_number = %s
+    """, (isbn,))
+    book = cursor.fetchone()
+    if book is None:
+        index.remove(isbn)
+        return
+    cursor.execute("SELECT author_name FROM author WHERE ISBN_number = %s", (isbn,))
+    authors = [row["author_name"] for row in cursor.fetchall()]
+    index.upsert(book["ISBN_number"], book["title"], book["category"], book["name"], authors,
+                 book["selling_price"], book["publication_year"], book["quantity_stock"])
@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+
+from flask import current_app, request, Response
+from books.catalog import catalog_version
+from books.search_cache import SearchCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class CatalogSnapshot:
+    # One pre-serialized listing page. Every encoding is produced once, when
+    # the page is built, and carries its own strong validator.
+    def __init__(self, body):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {None: (body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=9), f'"{digest}-br"')
+
+    def etags(self):
+        return [etag for _, etag in self.variants.values()]
+
+    def negotiate(self, accept_encodings):
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return None
+
+
+def init_catalog_snapshots(app):
+    store = SearchCache(
+        maxsize=app.config.get("CATALOG_SNAPSHOT_SIZE", 64),
+        ttl=app.config.get("CATALOG_SNAPSHOT_TTL", 300),
+    )
+    app.extensions["catalog_snapshots"] = store
+    return store
+
+
+def get_snapshot_store():
+    store = current_app.extensions.get("catalog_snapshots")
+    if store is None:
+        store = init_catalog_snapshots(current_app)
+    return store
+
+
+def get_catalog_snapshot(key, build):
+    store = get_snapshot_store()
+    snapshot = store.get(key)
+    if snapshot is None:
+        version = catalog_version()
+        body = current_app.json.dumps(build()).encode("utf-8")
+        snapshot = CatalogSnapshot(body)
+        store.put(key, snapshot, version)
+    return snapshot
+
+
+def snapshot_response(snapshot):
+    headers = {"Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    # Any representation's validator proves the client already has this page.
+    for etag in snapshot.etags():
+        if request.if_none_match.contains(etag.strip('"')):
+            headers["ETag"] = etag
+            return Response(status=304, headers=headers)
+
+    encoding = snapshot.negotiate(request.accept_encodings)
+    body, etag = snapshot.variants[encoding]
+    headers["ETag"] = etag
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status=200, headers=headers, mimetype="application/json")
@@ -6,15 +6,99 @@ class Config:
     DB_USER = "root"
     DB_PASSWORD = ""
     DB_NAME = "user_test"  # Production DB
+    DB_PORT = 3306
+
+    DB_BACKEND = "mysql"            # or "sqlite": embedded database, schema from Database/database.sql
+    DB_SQLITE_PATH = ":memory:"     # file for DB_BACKEND = "sqlite"; apps in one process share a path's database
+
+    # Read replicas for get_db(readonly=True), e.g. [{"host": "localhost", "port": 3307}];
+    # user/password/database default to the primary's.
+    DB_REPLICAS = []
+    DB_REPLICA_MAX_LAG = 5          # seconds behind the primary before a replica is skipped
+    DB_REPLICA_CHECK_INTERVAL = 5   # seconds between a replica's health/lag checks
+    DB_STICKY_SECONDS = 5           # a client's reads stay on the primary this long after it writes
+
+    DB_POOL_SIZE = 5            # connections kept open per worker
+    DB_POOL_MAX_OVERFLOW = 10   # extra connections allowed under burst
+    DB_POOL_TIMEOUT = 30        # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 3600      # reopen connections older than this (seconds)
+    DB_POOL_PRE_PING = True     # ping idle connections before handing them out
+
+    SEARCH_INDEX_ENABLED = True           # serve /api/books/search from the in-memory index
+    SEARCH_INDEX_BUILD_ON_STARTUP = True
+    SEARCH_INDEX_MAX_AGE = 300            # seconds before a full rebuild picks up other workers' writes
+    SEARCH_PRICE_BUCKETS = [10, 25, 50, 100]  # price facet bucket edges; the last bucket is open-ended
+    SEARCH_CACHE_SIZE = 512               # distinct search parameter combinations kept
+    SEARCH_CACHE_TTL = 60                 # seconds; also bounds staleness across workers
+    CATALOG_SNAPSHOT_SIZE = 64            # pre-serialized GET /api/books/ pages kept
+    CATALOG_SNAPSHOT_TTL = 300
+    STREAM_BATCH_SIZE = 500               # rows per fetchmany() when ?stream=1
+    IMPORT_CHUNK_SIZE = 1000              # rows per executemany/transaction in bulk imports
+    IMPORT_MAX_ERRORS = 1000              # per-row errors kept in an import report
+
+    BCRYPT_ROUNDS = 12          # work factor for new hashes
+    BCRYPT_WORKERS = 4          # threads doing bcrypt work off the request path
+    BCRYPT_MAX_QUEUE = 32       # pending jobs beyond the workers before we answer 503
+    BCRYPT_TIMEOUT = 10         # seconds a request waits for its hash
+
+    USER_CACHE_SIZE = 1024          # user rows cached per worker, keyed by JWT identity
+    USER_CACHE_TTL = 30             # seconds; bounds staleness from other workers' writes
+    USER_CACHE_PASSWORD_HASH = False  # keep password_hash out of the shared entries
+
+    ORDER_INTAKE_MODE = "sync"      # "journal": POST /api/users/orders answers 202 with a ticket
+    ORDER_JOURNAL_PATH = None       # SQLite journal file; defaults to <instance>/order_journal.sqlite3
+    ORDER_INTAKE_BATCH_SIZE = 100   # journaled orders written per MySQL transaction
+    ORDER_INTAKE_LINGER = 0.005     # seconds to wait for more orders before writing a batch
+    ORDER_INTAKE_LEASE = 60         # seconds before a crashed worker's claimed batch is retried
+    ORDER_INTAKE_MAX_ATTEMPTS = 5   # claims before a ticket that keeps failing is rejected
+    ORDER_JOURNAL_RETENTION = 86400 # seconds finished tickets stay pollable
+
+    STOCK_LEDGER_ENABLED = False    # sell STOCK_LEDGER_SKUS from per-process reservations (Database/stock_ledger.sql)
+    STOCK_LEDGER_SKUS = []          # ISBNs hot enough that checkouts queue on their book row
+    STOCK_LEDGER_BLOCK = 50         # units claimed from book stock at a time
+    STOCK_LEDGER_FLUSH_INTERVAL = 1.0  # seconds between batched stock updates
+    STOCK_LEDGER_HOLDER_TTL = 60    # seconds without a heartbeat before a process's reservations are reclaimed
+
+    REPLENISHMENT_INTERVAL = None   # seconds between background restock runs; None leaves it to the CLI/cron
+    REPLENISHMENT_WINDOW_DAYS = 28  # sales history used for velocity
+    REPLENISHMENT_COVER_DAYS = 30   # days of demand an order should cover above threshold
+    REPLENISHMENT_MIN_ORDER = 50    # smallest order placed for a book
+    REPLENISHMENT_MAX_ORDER = 1000  # largest order placed for a book
+
+    ADMISSION_ENABLED = True        # token buckets + concurrency caps on login, register and checkout
+    ADMISSION_RULES = {}            # endpoint -> {"rate", "burst", "concurrency"} overriding auth.admission.DEFAULT_RULES; None disables one
+    ADMISSION_STORE = None          # "module:factory" taking the app, for budgets shared across workers
+    ADMISSION_MAX_KEYS = 100000     # client buckets kept per worker by the in-memory store
+
+    PROFILER_ENABLED = True         # admins can arm per-endpoint profiling under /api/admin/profiler; idle cost is one dict check
+    PROFILER_KEEP_SESSIONS = 20     # finished profiling sessions kept for download
+    PROFILER_SAMPLE_INTERVAL = 0.002  # seconds between stack samples while a profiled request runs
+
+    METRICS_ENABLED = True          # time every statement and request, serve /metrics
+    SLOW_QUERY_MS = 200             # log statements slower than this (params redacted); None disables
+    METRICS_MAX_STATEMENTS = 500    # distinct normalized statements tracked before folding into "other"
 
 class TestConfig(Config):
     DB_NAME = "ordering_system_test" # Test DB
+    DB_BACKEND = "sqlite"  # in-memory; tests/conftest.py rolls every test back
+    SEARCH_INDEX_BUILD_ON_STARTUP = False  # tests seed their books after the app is built
+    BCRYPT_ROUNDS = 4  # keep the suite fast
+    ADMISSION_ENABLED = False  # the suite logs in far more often than a person would
+
+class BenchConfig(Config):
+    DB_NAME = "ordering_system_bench"  # Benchmark DB, wiped by benchmarks.seed
+    DB_POOL_SIZE = 32
+    DB_POOL_MAX_OVERFLOW = 32
+    ADMISSION_ENABLED = False  # the load generator is one client
 
 HTTP_200_OK = 200
 HTTP_201_CREATED = 201
+HTTP_202_ACCEPTED = 202
 HTTP_400_BAD_REQUEST = 400
 HTTP_401_UNAUTHORIZED = 401
 HTTP_403_ADMIN_REQ = 403
 HTTP_404_NOT_FOUND = 404
 HTTP_409_CONFLICT = 409
-HTTP_422_INVALID_TOKEN = 422
\ No newline at end of file
+HTTP_422_INVALID_TOKEN = 422
+HTTP_429_TOO_MANY_REQUESTS = 429
+HTTP_503_UNAVAILABLE = 503
\ No newline at end of file
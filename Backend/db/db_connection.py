@@ -1,19 +1,130 @@
-from flask import g, current_app
-import mysql.connector
+import math
+import time
 
-def get_db():
+from flask import g, current_app, request, has_request_context
+from db.pool import ConnectionPool
+from db.metrics import InstrumentedConnection
+from db.replicas import build_replica_router
+from db.sqlite import sqlite_backend
+
+STICKY_COOKIE = "db_primary_until"  # reads stay on the primary until this epoch time
+
+def init_db(app):
+    # The storage backend is anything with connect()/stats()/dispose(): the
+    # MySQL connection pool, or the embedded SQLite database.
+    backend = app.config.get('DB_BACKEND', 'mysql')
+    if backend == 'sqlite':
+        db = sqlite_backend(app.config.get('DB_SQLITE_PATH', ':memory:'),
+                            timeout=app.config.get('DB_POOL_TIMEOUT', 30))
+        app.extensions['db_backend'] = db
+        return db
+    if backend != 'mysql':
+        raise ValueError(f"DB_BACKEND must be 'mysql' or 'sqlite', not {backend!r}")
+
+    pool_options = dict(
+        size=app.config.get('DB_POOL_SIZE', 5),
+        max_overflow=app.config.get('DB_POOL_MAX_OVERFLOW', 10),
+        timeout=app.config.get('DB_POOL_TIMEOUT', 30),
+        recycle=app.config.get('DB_POOL_RECYCLE', 3600),
+        pre_ping=app.config.get('DB_POOL_PRE_PING', True),
+    )
+    pool = ConnectionPool(
+        {
+            "host": app.config['DB_HOST'],
+            "port": app.config.get('DB_PORT', 3306),
+            "user": app.config['DB_USER'],
+            "password": app.config['DB_PASSWORD'],
+            "database": app.config['DB_NAME'],
+        },
+        **pool_options,
+    )
+    app.extensions['db_pool'] = pool
+    app.extensions['db_backend'] = pool
+
+    router = build_replica_router(app, pool_options)
+    if router is not None:
+        app.extensions['db_router'] = router
+
+        @app.after_request
+        def remember_write(response):
+            # Read-your-writes across requests (and workers): this client's
+            # reads skip the replicas until they have had time to catch up.
+            if g.get('db_wrote'):
+                response.set_cookie(STICKY_COOKIE, f"{time.time() + router.sticky_seconds:.3f}",
+                                    max_age=math.ceil(router.sticky_seconds), httponly=True, samesite="Lax")
+            return response
+    return pool
+
+def get_backend():
+    backend = current_app.extensions.get('db_backend')
+    if backend is None:
+        backend = init_db(current_app)
+    return backend
+
+class WriteTrackingConnection:
+    # Primary connection handed out while replicas are configured; a commit
+    # pins the rest of the session's reads to the primary.
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        self._conn.commit()
+        g.db_wrote = True
+
+    def close(self):
+        self._conn.close()
+
+def _instrument(conn):
+    metrics = current_app.extensions.get('metrics')
+    # A profiled request times its SQL even with metrics off.
+    if metrics is not None or 'profiling' in g:
+        return InstrumentedConnection(conn, metrics)
+    return conn
+
+def reads_pinned():
+    if g.get('db_wrote'):
+        return True
+    if not has_request_context():
+        return False
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def get_db(readonly=False):
+    """The request's connection.
+
+    readonly=True marks a read that a replica may serve; it falls back to
+    the primary when no replica is configured or healthy, or when this
+    session wrote recently.
+    """
+    router = current_app.extensions.get('db_router')
+    if readonly and router is not None and not reads_pinned():
+        if 'db_read' not in g:
+            conn = router.connect()
+            g.db_read = _instrument(conn) if conn is not None else None
+        if g.db_read is not None:
+            return g.db_read
     if 'db' not in g:
-        g.db = mysql.connector.connect(
-            host=current_app.config['DB_HOST'],
-            user=current_app.config['DB_USER'],
-            password=current_app.config['DB_PASSWORD'],
-            database=current_app.config['DB_NAME']
-        )
+        conn = get_backend().connect()
+        if router is not None:
+            conn = WriteTrackingConnection(conn)
+        g.db = _instrument(conn)
     return g.db
 
+def replica_stats():
+    router = current_app.extensions.get('db_router')
+    return router.stats() if router is not None else None
+
+def pool_stats():
+    return get_backend().stats()
+
 # def create_user(email, password):
 #     conn = get_connection()
 #     cursor = conn.cursor()
 #     cursor.execute("INSERT INTO users (email, password) VALUES (%s, %s)", (email, password))
 #     conn.commit()
-#     conn.close()
\ No newline at end of file
+#     conn.close()
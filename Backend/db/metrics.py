@@ -0,0 +1,261 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from flask import current_app, g, request
+
+logger = logging.getLogger("db.slow_query")
+
+# Seconds. Prometheus-style upper bounds; +Inf is implied.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?(?:, \?)*\))(?:\s*,\s*\(\?(?:, \?)*\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Collapse a statement to its shape: literals and placeholders become ?
+    and IN/VALUES lists of any length collapse to one entry, so variable
+    length queries share a histogram and no values reach the labels."""
+    if isinstance(query, (bytes, bytearray)):
+        query = query.decode("utf-8", "replace")
+    query = _STRING.sub("?", query)
+    query = _PLACEHOLDER.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _SPACE.sub(" ", query).strip()
+    query = _VALUES_LIST.sub(r"\1, ...", query)
+    return _IN_LIST.sub("(...)", query)
+
+
+def redact_params(params, many=False):
+    # Only the shape of the bound values is ever logged, never the values.
+    if params is None:
+        return None
+    if many:
+        return f"<{len(params)} rows>"
+    if isinstance(params, dict):
+        return {key: f"<{type(value).__name__}>" for key, value in params.items()}
+    return [f"<{type(value).__name__}>" for value in params]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return ",".join(f'{key}="{_label(value)}"' for key, value in pairs)
+
+
+class Metrics:
+    # Process-wide registry. Statement shapes are capped so a bug that
+    # inlines values into SQL can't grow the label set without bound.
+    def __init__(self, slow_query_ms=200, max_statements=500, buckets=DEFAULT_BUCKETS):
+        self.slow_query_ms = slow_query_ms
+        self.max_statements = max_statements
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._statement_errors = {}
+        self._requests = {}
+        self._request_queries = {}
+        self.slow_queries = 0
+
+    def observe_query(self, query, elapsed, params=None, many=False, failed=False):
+        shape = normalize_sql(query)
+        with self._lock:
+            histogram = self._statements.get(shape)
+            if histogram is None:
+                if len(self._statements) >= self.max_statements:
+                    shape = "other"
+                    histogram = self._statements.get(shape)
+                if histogram is None:
+                    histogram = self._statements[shape] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            if failed:
+                self._statement_errors[shape] = self._statement_errors.get(shape, 0) + 1
+            slow = self.slow_query_ms is not None and elapsed * 1000 >= self.slow_query_ms
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            logger.warning("Slow query (%.1f ms): %s params=%s",
+                           elapsed * 1000, shape, redact_params(params, many))
+
+    def observe_request(self, method, endpoint, status, elapsed, queries):
+        key = (method, endpoint, str(status))
+        with self._lock:
+            histogram = self._requests.get(key)
+            if histogram is None:
+                histogram = self._requests[key] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            if queries is None:  # not counted (the async app)
+                return
+            histogram = self._request_queries.get(key[:2])
+            if histogram is None:
+                histogram = self._request_queries[key[:2]] = Histogram(QUERY_COUNT_BUCKETS)
+            histogram.observe(queries)
+
+    def _render_histogram(self, lines, name, help_text, series):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in series:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels(labels + [("le", bound)])}}} {cumulative}')
+            lines.append(f'{name}_bucket{{{_labels(labels + [("le", "+Inf")])}}} {histogram.count}')
+            lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+
+    def render(self):
+        lines = []
+        with self._lock:
+            self._render_histogram(
+                lines, "http_request_duration_seconds", "Request latency by endpoint.",
+                [([("method", m), ("endpoint", e), ("status", s)], h)
+                 for (m, e, s), h in sorted(self._requests.items())])
+            self._render_histogram(
+                lines, "http_request_sql_queries", "SQL statements executed per request.",
+                [([("method", m), ("endpoint", e)], h) for (m, e), h in sorted(self._request_queries.items())])
+            self._render_histogram(
+                lines, "sql_statement_duration_seconds", "Statement latency by normalized SQL.",
+                [([("statement", s)], h) for s, h in sorted(self._statements.items())])
+            lines.append("# HELP sql_statement_errors_total Statements that raised, by normalized SQL.")
+            lines.append("# TYPE sql_statement_errors_total counter")
+            for shape, count in sorted(self._statement_errors.items()):
+                lines.append(f'sql_statement_errors_total{{{_labels([("statement", shape)])}}} {count}')
+            lines.append("# HELP sql_slow_queries_total Statements slower than SLOW_QUERY_MS.")
+            lines.append("# TYPE sql_slow_queries_total counter")
+            lines.append(f"sql_slow_queries_total {self.slow_queries}")
+        return lines
+
+
+def render_gauges(prefix, stats):
+    # Flattens one of the existing stats() dicts into gauges; non-numeric
+    # entries are skipped.
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {prefix}_{key} gauge")
+        lines.append(f"{prefix}_{key} {value}")
+    return lines
+
+
+def _count_query(elapsed):
+    # Per-request totals live on g so they die with the app context.
+    g.sql_queries = g.get("sql_queries", 0) + 1
+    g.sql_time = g.get("sql_time", 0.0) + elapsed
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, fn, query, params, many, *args, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            if params is None and not args and not kwargs:
+                result = fn(query)
+            else:
+                result = fn(query, params, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if self._metrics is not None:
+                self._metrics.observe_query(query, elapsed, params, many, failed)
+            _count_query(elapsed)
+
+    def execute(self, query, params=None, *args, **kwargs):
+        return self._timed(self._cursor.execute, query, params, False, *args, **kwargs)
+
+    def executemany(self, query, seq_params):
+        return self._timed(self._cursor.executemany, query, seq_params, True)
+
+
+class InstrumentedConnection:
+    # Wraps the pooled connection from get_db; only cursor() changes. With
+    # metrics None it only keeps the per-request totals, for the profiler.
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._metrics)
+
+    def close(self):
+        self._conn.close()
+
+
+def init_metrics(app):
+    metrics = Metrics(
+        slow_query_ms=app.config.get("SLOW_QUERY_MS", 200),
+        max_statements=app.config.get("METRICS_MAX_STATEMENTS", 500),
+    )
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            # Unmatched URLs share one label instead of one series per path.
+            endpoint = request.url_rule.rule if request.url_rule else "<unmatched>"
+            method, request_g = request.method, g._get_current_object()
+
+            # Observed when the server closes the response, so a streamed
+            # body's time and queries count too. request_g keeps the totals
+            # after the context is gone.
+            def observe():
+                metrics.observe_request(method, endpoint, response.status_code,
+                                        time.perf_counter() - started, request_g.get("sql_queries", 0))
+            response.call_on_close(observe)
+        return response
+
+    return metrics
+
+
+def get_metrics():
+    return current_app.extensions.get("metrics")
@@ -0,0 +1,106 @@
+import os
+import re
+
+import click
+from flask.cli import AppGroup
+
+# Versioned schema changes applied on top of the Database/*.sql scripts.
+# Each file is NNNN_name.sql; the versions already applied are recorded in
+# schema_migrations, so `flask --app app db migrate` only runs new ones.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "Database", "migrations")
+
+SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version)
+    )
+"""
+
+
+def split_statements(sql):
+    """Statements in a script written for the mysql client, honoring the
+    DELIMITER switches around procedure and trigger bodies."""
+    delimiter = ";"
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        match = re.match(r"\s*DELIMITER\s+(\S+)\s*$", line, re.I)
+        if match:
+            delimiter = match.group(1)
+            continue
+        current.append(line)
+        if line.rstrip().endswith(delimiter):
+            statement = "\n".join(current).rstrip()[:-len(delimiter)].strip()
+            current = []
+            if re.sub(r"--[^\n]*", "", statement).strip():
+                statements.append(statement)
+    tail = "\n".join(current).strip()
+    if re.sub(r"--[^\n]*", "", tail).strip():
+        statements.append(tail)
+    return statements
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.match(r"(\d+)_(\w+)\.sql$", filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def applied_versions(db):
+    cursor = db.cursor()
+    cursor.execute(SCHEMA_MIGRATIONS)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db, target=None, translate=None, directory=MIGRATIONS_DIR):
+    """Apply pending migrations in version order, up to `target` if given;
+    returns the versions applied. `translate` rewrites each statement for
+    another dialect, or returns None to skip it."""
+    done = applied_versions(db)
+    db.commit()
+    cursor = db.cursor()
+    ran = []
+    for version, name, path in discover(directory):
+        if version in done or (target is not None and version > target):
+            continue
+        with open(path, encoding="utf-8") as f:
+            statements = split_statements(f.read())
+        # MySQL commits each DDL statement by itself; a migration that fails
+        # halfway is left unrecorded so it can be fixed and rerun.
+        for statement in statements:
+            if translate is not None:
+                statement = translate(statement)
+                if statement is None:
+                    continue
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        db.commit()
+        ran.append(version)
+    return ran
+
+
+db_cli = AppGroup("db", help="Schema migrations.")
+
+
+@db_cli.command("migrate")
+@click.option("--to", "target", type=int, help="Stop after this version.")
+def migrate_command(target):
+    """Apply the pending Database/migrations scripts."""
+    from db.db_connection import get_db
+    ran = migrate(get_db(), target)
+    click.echo(f"Applied {', '.join(map(str, ran))}." if ran else "Schema is up to date.")
+
+
+@db_cli.command("status")
+def status_command():
+    """List migrations and whether each is applied."""
+    from db.db_connection import get_db
+    done = applied_versions(get_db())
+    for version, name, _ in discover():
+        click.echo(f"{version:04d} {name}: {'applied' if version in done else 'pending'}")
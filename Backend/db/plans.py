@@ -0,0 +1,34 @@
+import re
+
+# "SCAN t" reads every row of t; "SCAN t USING [COVERING] INDEX i" reads
+# every entry of an index, which is only cheap when a LIMIT stops it early
+# (the keyset listings). SEARCH steps are index lookups or ranges.
+SQLITE_SCAN = re.compile(r"SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?$")
+LIMIT = re.compile(r"\bLIMIT\b", re.I)
+
+
+def explain(db, query, params=(), dialect="mysql"):
+    """The optimizer's plan for one statement, one line per step."""
+    cursor = db.cursor(dictionary=True)
+    if dialect == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        return [row["detail"] for row in cursor.fetchall()]
+    cursor.execute("EXPLAIN " + query, params)
+    return [f"{row['table']}: {row['type']} key={row['key']} rows={row['rows']} {row.get('Extra') or ''}".strip()
+            for row in cursor.fetchall()]
+
+
+def full_scans(query, plan, dialect="mysql"):
+    """Tables that `plan` (from explain()) reads from start to end."""
+    limited = bool(LIMIT.search(query))
+    tables = []
+    for step in plan:
+        if dialect == "sqlite":
+            match = SQLITE_SCAN.match(step)
+            if match and not (match.group(2) and limited):
+                tables.append(match.group(1))
+        else:
+            table, access = step.split(":")[0], step.split()[1]
+            if access == "ALL" or (access == "index" and not limited):
+                tables.append(table)
+    return tables
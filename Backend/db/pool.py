@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class _Record:
+    __slots__ = ("raw", "created_at")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+
+
+class PooledConnection:
+    # Thin proxy handed out by get_db; close() gives the connection back to
+    # the pool instead of tearing down the socket.
+    def __init__(self, pool, record):
+        self._pool = pool
+        self._record = record
+        self._raw = record.raw
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pool._release(self._record)
+
+
+class ConnectionPool:
+    def __init__(self, connect_args, size=5, max_overflow=10, timeout=30.0,
+                 recycle=3600, pre_ping=True, connect=None):
+        self.connect_args = dict(connect_args)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._connect = connect or mysql.connector.connect
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._open = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _is_stale(self, record):
+        return self.recycle is not None and self.recycle >= 0 and \
+            time.monotonic() - record.created_at > self.recycle
+
+    def _is_alive(self, record):
+        try:
+            record.raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, record):
+        try:
+            record.raw.close()
+        except Exception:
+            pass
+
+    def connect(self):
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                while True:
+                    if self._idle:
+                        record = self._idle.popleft()
+                        self._in_use += 1
+                        break
+                    if self._open < self.size + self.max_overflow:
+                        record = None
+                        self._open += 1
+                        self._in_use += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Connection pool exhausted (size {self.size}, overflow "
+                            f"{self.max_overflow}); timed out after {self.timeout}s"
+                        )
+                    if not waited:
+                        waited = True
+                        self._waits += 1
+                    self._cond.wait(remaining)
+
+            if record is not None:
+                if self._is_stale(record):
+                    self._recycled += 1
+                elif self.pre_ping and not self._is_alive(record):
+                    self._invalidated += 1
+                else:
+                    break
+                self._discard(record)
+
+            try:
+                record = _Record(self._connect(**self.connect_args))
+                break
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        elapsed = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return PooledConnection(self, record)
+
+    def _release(self, record):
+        reusable = True
+        try:
+            # Never hand the next request a half-finished transaction.
+            if record.raw.in_transaction:
+                record.raw.rollback()
+        except Exception:
+            reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable and len(self._idle) < self.size and not self._is_stale(record):
+                self._idle.append(record)
+                record = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if record is not None:
+            self._discard(record)
+
+    def dispose(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for record in idle:
+            self._discard(record)
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "overflow": max(self._open - self.size, 0),
+                "checkouts": checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+                "checkout_ms_avg": (self._checkout_time_total / checkouts * 1000) if checkouts else 0.0,
+                "checkout_ms_max": self._checkout_time_max * 1000,
+            }
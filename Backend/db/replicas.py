@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+
+from db.pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# SHOW REPLICA STATUS needs MySQL 8.0.22+; older servers only know the
+# SLAVE spelling and column names.
+LAG_QUERIES = (
+    ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+    ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+)
+
+
+def replica_lag(conn):
+    """Seconds behind the primary; 0 if the server isn't replicating at all
+    (e.g. two independent local instances), None if replication is broken."""
+    cursor = conn.cursor(dictionary=True)
+    for query, column in LAG_QUERIES:
+        try:
+            cursor.execute(query)
+        except Exception:
+            continue
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        return rows[0].get(column)
+    return None
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.reads = 0
+        self.failures = 0
+        self._checking = threading.Lock()
+
+
+class ReplicaRouter:
+    # Chooses where get_db(readonly=True) reads from: a healthy replica in
+    # round robin, or None to send the read to the primary. A replica's
+    # health (reachable, lag under max_lag) is re-checked at most every
+    # check_interval seconds by whichever request notices it is due.
+    def __init__(self, replicas, max_lag=5, check_interval=5, sticky_seconds=5):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self._next = 0
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+
+    def check(self, replica):
+        conn = None
+        try:
+            conn = replica.pool.connect()
+            lag = replica_lag(conn)
+            replica.lag = lag
+            if lag is None:
+                replica.healthy, replica.error = False, "replication stopped"
+            elif self.max_lag is not None and lag > self.max_lag:
+                replica.healthy, replica.error = False, f"lagging {lag}s"
+            else:
+                replica.healthy, replica.error = True, None
+        except Exception as e:
+            replica.healthy, replica.error = False, str(e)
+        finally:
+            if conn is not None:
+                conn.close()
+            replica.checked_at = time.monotonic()
+        if not replica.healthy:
+            logger.warning("Replica %s taken out of rotation: %s", replica.name, replica.error)
+        return replica.healthy
+
+    def _due(self, replica):
+        return replica.checked_at is None or time.monotonic() - replica.checked_at >= self.check_interval
+
+    def _refresh(self, replica):
+        if self._due(replica) and replica._checking.acquire(blocking=False):
+            try:
+                if self._due(replica):
+                    self.check(replica)
+            finally:
+                replica._checking.release()
+
+    def connect(self):
+        """A connection to a healthy replica, or None to read from the primary."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(len(self.replicas), 1)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            self._refresh(replica)
+            if not replica.healthy:
+                continue
+            try:
+                conn = replica.pool.connect()
+            except Exception as e:
+                replica.healthy, replica.error = False, str(e)
+                replica.failures += 1
+                replica.checked_at = time.monotonic()
+                logger.warning("Replica %s unreachable, reading from the primary: %s", replica.name, e)
+                continue
+            replica.reads += 1
+            return conn
+        self.primary_reads += 1
+        return None
+
+    def stats(self):
+        return {
+            "primary_reads": self.primary_reads,
+            "max_lag": self.max_lag,
+            "sticky_seconds": self.sticky_seconds,
+            "replicas": [
+                {
+                    "name": r.name,
+                    "healthy": r.healthy,
+                    "lag": r.lag,
+                    "error": r.error,
+                    "reads": r.reads,
+                    "failures": r.failures,
+                    "pool": r.pool.stats(),
+                }
+                for r in self.replicas
+            ],
+        }
+
+
+def build_replica_router(app, pool_options):
+    replicas = []
+    for i, spec in enumerate(app.config.get("DB_REPLICAS") or ()):
+        connect_args = {
+            "host": spec.get("host", app.config["DB_HOST"]),
+            "port": spec.get("port", app.config.get("DB_PORT", 3306)),
+            "user": spec.get("user", app.config["DB_USER"]),
+            "password": spec.get("password", app.config["DB_PASSWORD"]),
+            "database": spec.get("database", app.config["DB_NAME"]),
+        }
+        name = spec.get("name") or f"{connect_args['host']}:{connect_args['port']}"
+        replicas.append(Replica(name, ConnectionPool(connect_args, **pool_options)))
+    if not replicas:
+        return None
+    return ReplicaRouter(
+        replicas,
+        max_lag=app.config.get("DB_REPLICA_MAX_LAG", 5),
+        check_interval=app.config.get("DB_REPLICA_CHECK_INTERVAL", 5),
+        sticky_seconds=app.config.get("DB_STICKY_SECONDS", 5),
+    )
@@ -0,0 +1,424 @@
+import datetime
+import itertools
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+
+from mysql.connector import errors as mysql_errors
+from db.migrations import migrate, split_statements
+
+# Embedded storage backend (DB_BACKEND = "sqlite"). It speaks just enough of
+# the mysql.connector API (cursor(dictionary=True), %s parameters, lastrowid,
+# commit/rollback, its exception classes) for the users and books models to
+# run unchanged, on a schema translated from Database/database.sql and
+# Database/migrations at startup.
+#
+# The tables of the optional feature scripts (FEATURE_TABLES) are ported by
+# hand, and GET_LOCK/RELEASE_LOCK are emulated (NamedLocks). MySQL-only
+# features stay MySQL-only: the rollup tables and the stored report
+# procedures.
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "Database", "database.sql")
+
+# What order_intake.sql, stock_ledger.sql and replenishment.sql add. MySQL
+# session variables (@stock_holder) live in session_variable: the
+# connection is shared, but every transaction sets and clears them before
+# it ends.
+FEATURE_TABLES = """
+CREATE TABLE order_intake (
+    ticket CHAR(32) NOT NULL,
+    order_id INT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticket),
+    FOREIGN KEY (order_id) REFERENCES customer_order(order_id) ON DELETE CASCADE
+);
+
+CREATE TABLE stock_reservation (
+    holder VARCHAR(64) NOT NULL,
+    ISBN_number VARCHAR(20) NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    heartbeat TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (holder, ISBN_number),
+    FOREIGN KEY (ISBN_number) REFERENCES book(ISBN_number) ON DELETE CASCADE ON UPDATE CASCADE
+);
+CREATE INDEX idx_stock_reservation_isbn ON stock_reservation (ISBN_number, units);
+
+CREATE TABLE stock_pending (
+    id INTEGER NOT NULL,
+    holder VARCHAR(64) NOT NULL,
+    ISBN_number VARCHAR(20) NOT NULL,
+    quantity INT NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX idx_stock_pending_holder ON stock_pending (holder, id);
+
+CREATE TABLE publisher_order_batch (
+    batch_id INTEGER NOT NULL,
+    publisher_id INT,
+    status TEXT CHECK (status IN ('Pending', 'Confirmed')) NOT NULL DEFAULT 'Pending',
+    total_cost DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    confirmed_at TIMESTAMP NULL,
+    PRIMARY KEY (batch_id),
+    FOREIGN KEY (publisher_id) REFERENCES publisher(publisher_id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+CREATE INDEX idx_publisher_order_batch_status ON publisher_order_batch (status, publisher_id);
+
+ALTER TABLE publisher_order ADD COLUMN batch_id INT NULL
+    REFERENCES publisher_order_batch(batch_id) ON DELETE CASCADE;
+CREATE INDEX idx_publisher_order_batch ON publisher_order (batch_id, status, ISBN_number, quantity);
+CREATE INDEX idx_publisher_order_pending ON publisher_order (status, ISBN_number, quantity);
+
+CREATE TABLE session_variable (
+    name TEXT NOT NULL PRIMARY KEY,
+    value
+);
+"""
+
+# The triggers the MySQL schema ends up with once triggers.sql,
+# replenishment.sql and stock_ledger.sql are applied, in SQLite's dialect.
+# after_book_update_restock was dropped by replenishment.sql.
+TRIGGERS = """
+CREATE TRIGGER before_book_update_negative_stock
+BEFORE UPDATE OF quantity_stock ON book
+FOR EACH ROW WHEN NEW.quantity_stock < 0
+BEGIN
+    SELECT RAISE(ABORT, 'Integrity Error: Stock quantity cannot be negative.');
+END;
+
+CREATE TRIGGER before_book_insert_negative_stock
+BEFORE INSERT ON book
+FOR EACH ROW WHEN NEW.quantity_stock < 0
+BEGIN
+    SELECT RAISE(ABORT, 'Integrity Error: Initial stock quantity cannot be negative.');
+END;
+
+CREATE TRIGGER after_publisher_order_confirm
+AFTER UPDATE OF status ON publisher_order
+FOR EACH ROW WHEN OLD.status != 'Confirmed' AND NEW.status = 'Confirmed' AND NEW.batch_id IS NULL
+BEGIN
+    UPDATE book
+    SET quantity_stock = quantity_stock + NEW.quantity
+    WHERE ISBN_number = NEW.ISBN_number;
+END;
+
+CREATE TRIGGER before_book_update_reserved_stock
+BEFORE UPDATE OF quantity_stock ON book
+FOR EACH ROW WHEN NEW.quantity_stock BETWEEN 0 AND OLD.quantity_stock - 1 AND NEW.quantity_stock <
+    (SELECT COALESCE(SUM(units), 0) FROM stock_reservation WHERE ISBN_number = NEW.ISBN_number)
+BEGIN
+    SELECT RAISE(ABORT, 'Integrity Error: Stock quantity cannot drop below the units reserved by the stock ledger.');
+END;
+
+CREATE TRIGGER after_customer_purchase
+AFTER INSERT ON book_order
+FOR EACH ROW WHEN (SELECT value FROM session_variable WHERE name = 'stock_holder') IS NULL
+BEGIN
+    UPDATE book
+    SET quantity_stock = quantity_stock - NEW.item_quantity
+    WHERE ISBN_number = NEW.ISBN_number;
+END;
+
+CREATE TRIGGER after_customer_purchase_held
+AFTER INSERT ON book_order
+FOR EACH ROW WHEN (SELECT value FROM session_variable WHERE name = 'stock_holder') IS NOT NULL
+BEGIN
+    INSERT INTO stock_pending (holder, ISBN_number, quantity)
+    VALUES ((SELECT value FROM session_variable WHERE name = 'stock_holder'), NEW.ISBN_number, NEW.item_quantity);
+END;
+"""
+
+# Values come back as the types mysql.connector returns for these columns.
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime.datetime, lambda v: v.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda v: v.isoformat())
+sqlite3.register_converter("DECIMAL", lambda b: Decimal(b.decode()))
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()))
+
+
+def translate_ddl(statement):
+    """One MySQL schema statement in SQLite's dialect, or None to skip it."""
+    statement = re.sub(r"--[^\n]*", "", statement).strip()
+    # Triggers are ported by hand (TRIGGERS); procedures only serve the
+    # MySQL reports.
+    if not statement or re.match(r"(CREATE DATABASE|USE)\b|(CREATE|DROP)\s+(PROCEDURE|TRIGGER|EVENT)\b",
+                                 statement, re.I):
+        return None
+    # An INT AUTO_INCREMENT primary key becomes the rowid alias, which
+    # SQLite fills in the same way.
+    statement = re.sub(r"\b(?:BIG)?INT\b([^,\n]*?)\s*AUTO_INCREMENT", r"INTEGER\1", statement, flags=re.I)
+    return re.sub(r"(\w+)\s+ENUM\(([^)]*)\)", r"\1 TEXT CHECK (\1 IN (\2))", statement, flags=re.I)
+
+
+def translate_schema(ddl):
+    """The CREATE TABLE/INDEX statements of a MySQL script in SQLite's dialect."""
+    statements = filter(None, map(translate_ddl, split_statements(ddl)))
+    return "\n\n".join(statement + ";" for statement in statements)
+
+
+# sqlite3 errors are re-raised as the mysql.connector ones callers already
+# catch (IntegrityError for a taken username, e.msg in import reports...).
+ERRORS = (
+    (sqlite3.IntegrityError, mysql_errors.IntegrityError),
+    (sqlite3.DataError, mysql_errors.DataError),
+    (sqlite3.OperationalError, mysql_errors.OperationalError),
+    (sqlite3.ProgrammingError, mysql_errors.ProgrammingError),
+    (sqlite3.NotSupportedError, mysql_errors.NotSupportedError),
+)
+
+
+def mysql_error(e):
+    for sqlite_class, mysql_class in ERRORS:
+        if isinstance(e, sqlite_class):
+            return mysql_class(msg=str(e))
+    return mysql_errors.DatabaseError(msg=str(e))
+
+
+@lru_cache(maxsize=1024)
+def translate(query):
+    """One statement as the models write it for MySQL, rewritten for SQLite."""
+    query = query.replace("%s", "?").replace("%%", "%")
+    # Transactions are serialized (see SQLiteBackend), so row locks are moot.
+    query = re.sub(r"\s+FOR\s+(UPDATE|SHARE)\b", "", query, flags=re.I)
+    query = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", "ON CONFLICT DO UPDATE SET", query, flags=re.I)
+    query = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", query)
+    query = re.sub(r"^\s*SET\s+@(\w+)\s*=\s*(.+?)\s*$",
+                   r"INSERT OR REPLACE INTO session_variable (name, value) VALUES ('\1', \2)", query, flags=re.S)
+    query = re.sub(r"\bGREATEST\(", "MAX(", query)
+    query = re.sub(r"\bNOW\(\)\s*-\s*INTERVAL\s+(\?|\d+)\s+(SECOND|MINUTE|HOUR|DAY)\b",
+                   lambda m: f"datetime('now', '-' || {m.group(1)} || ' {m.group(2).lower()}s')", query, flags=re.I)
+    return query
+
+
+class NamedLocks:
+    # MySQL's GET_LOCK/RELEASE_LOCK on the shared connection, with the
+    # calling thread standing in for the session. A lock held elsewhere is
+    # reported as taken at once: waiting inside a serialized transaction
+    # could only deadlock with the holder's RELEASE_LOCK.
+    def __init__(self):
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, timeout):
+        me = threading.get_ident()
+        with self._lock:
+            if self._owners.setdefault(name, me) != me:
+                return 0
+            return 1
+
+    def release(self, name):
+        with self._lock:
+            owner = self._owners.get(name)
+            if owner is None:
+                return None
+            if owner != threading.get_ident():
+                return 0
+            del self._owners[name]
+            return 1
+
+
+class SQLiteCursor:
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn._backend._raw.cursor()
+        self._dictionary = dictionary
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((d[0] for d in self._cursor.description), row))
+
+    def execute(self, query, params=None):
+        self._conn._begin()
+        try:
+            self._cursor.execute(translate(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def executemany(self, query, seq_params):
+        self._conn._begin()
+        try:
+            self._cursor.executemany(translate(query), [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise mysql_error(e) from e
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    # What get_db hands out. Its transaction is a savepoint on the shared
+    # connection, taken with the first statement and held (along with the
+    # backend's lock) until commit, rollback or close.
+    def __init__(self, backend):
+        self._backend = backend
+        self._savepoint = None
+
+    @property
+    def in_transaction(self):
+        return self._savepoint is not None
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self, dictionary)
+
+    def _begin(self):
+        if self._savepoint is None:
+            self._backend._acquire()
+            self._backend._in_use += 1
+            self._savepoint = f"txn_{next(self._backend._savepoints)}"
+            self._backend._raw.execute(f"SAVEPOINT {self._savepoint}")
+
+    def _end(self, rollback):
+        savepoint, self._savepoint = self._savepoint, None
+        if savepoint is None:
+            return
+        try:
+            if rollback:
+                self._backend._raw.execute(f"ROLLBACK TO {savepoint}")
+            self._backend._raw.execute(f"RELEASE {savepoint}")
+        finally:
+            self._backend._in_use -= 1
+            self._backend._release()
+
+    def commit(self):
+        self._end(rollback=False)
+
+    def rollback(self):
+        self._end(rollback=True)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        self.rollback()
+
+
+class SQLiteBackend:
+    # One connection per database, shared by every request thread. Each
+    # transaction, reads included, holds the backend lock from its first
+    # statement to commit/rollback, so transactions never overlap: there is
+    # no row locking to exercise, and concurrency bugs the MySQL locks are
+    # meant to prevent (a missing FOR UPDATE, lock ordering) can't show up
+    # in a SQLite-backed test. Race tests need their MySQL variant.
+    #
+    # The lock is not reentrant: a thread that opens a second transaction
+    # while its first is still open gets an error instead of a nested
+    # savepoint the outer commit would silently release.
+    def __init__(self, path=":memory:", timeout=30.0, schema_path=SCHEMA_PATH):
+        self.path = path
+        self.timeout = timeout
+        self._raw = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
+        self._raw.execute("PRAGMA foreign_keys = ON")
+        self.named_locks = NamedLocks()
+        self._raw.create_function("GET_LOCK", 2, self.named_locks.get)
+        self._raw.create_function("RELEASE_LOCK", 1, self.named_locks.release)
+        self._lock = threading.Lock()
+        self._owner = None
+        self._savepoints = itertools.count(1)
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._in_use = 0
+        exists = self._raw.execute("SELECT 1 FROM sqlite_master WHERE name = 'book'").fetchone()
+        if not exists:
+            with open(schema_path, encoding="utf-8") as f:
+                self._raw.executescript(translate_schema(f.read()) + FEATURE_TABLES + TRIGGERS)
+        conn = self.connect()
+        try:
+            migrate(conn, translate=translate_ddl)
+        finally:
+            conn.close()
+
+    def _acquire(self):
+        if self._owner == threading.get_ident():
+            raise mysql_errors.OperationalError(
+                msg="this thread already has a transaction open on another SQLite connection")
+        if not self._lock.acquire(blocking=False):
+            self._waits += 1
+            if not self._lock.acquire(timeout=self.timeout):
+                self._timeouts += 1
+                raise mysql_errors.OperationalError(msg=f"database is locked (waited {self.timeout}s)")
+        self._owner = threading.get_ident()
+
+    def _release(self):
+        self._owner = None
+        self._lock.release()
+
+    def connect(self):
+        self._checkouts += 1
+        return SQLiteConnection(self)
+
+    def dispose(self):
+        pass
+
+    @contextmanager
+    def rollback_after(self):
+        """Run the block inside one outer transaction and undo all of it on
+        exit, commits included. The test suite wraps every test in this."""
+        self._acquire()
+        try:
+            self._raw.execute("BEGIN")
+        finally:
+            self._release()
+        try:
+            yield self
+        finally:
+            self._acquire()
+            try:
+                self._raw.execute("ROLLBACK")
+            finally:
+                self._release()
+
+    def stats(self):
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "checkouts": self._checkouts,
+            "in_use": self._in_use,
+            "waits": self._waits,
+            "timeouts": self._timeouts,
+        }
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def sqlite_backend(path=":memory:", **options):
+    """The process-wide backend for `path`; apps created with the same path
+    share one database, ":memory:" included."""
+    with _backends_lock:
+        backend = _backends.get(path)
+        if backend is None:
+            backend = _backends[path] = SQLiteBackend(path, **options)
+        return backend
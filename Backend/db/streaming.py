@@ -0,0 +1,34 @@
+from flask import current_app
+
+
+def iter_rows(cursor, batch_size=500):
+    # Pull an unbuffered result set in fetchmany() batches so only one batch
+    # is ever held in memory.
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            # Abandoned mid-stream (client went away); the pool discards the
+            # connection if it can't be cleaned up on return.
+            pass
+
+
+def json_array_stream(items):
+    # Emit a JSON array element by element, using the app's JSON provider so
+    # Decimal and datetime values serialize exactly like jsonify().
+    dumps = current_app.json.dumps
+    yield "["
+    first = True
+    for item in items:
+        if first:
+            first = False
+            yield dumps(item)
+        else:
+            yield "," + dumps(item)
+    yield "]"
@@ -0,0 +1,4 @@
+from flask import Blueprint
+
+profiler_bp = Blueprint("profiler", __name__, url_prefix="/api/admin/profiler")
+from . import routes
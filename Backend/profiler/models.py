@@ -0,0 +1,254 @@
+import cProfile
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import current_app, g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+
+MODES = ("both", "cprofile", "sampler")
+
+
+class ProfileSession:
+    # What an admin asked for on one endpoint: the next `requests` hits, or
+    # each hit with probability `sample` until `requests` were profiled.
+    def __init__(self, endpoint, requests=10, sample=None, mode="both"):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.limit = requests
+        self.sample = sample
+        self.mode = mode
+        self.created_at = time.time()
+        self.started = 0
+        self.finished = 0
+        self.totals = {"total": 0.0, "python": 0.0, "sql": 0.0, "serialization": 0.0, "sql_queries": 0}
+        self.slowest = []  # (total, status) of the slowest few requests
+        self.stats = None
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.started < self.limit
+
+    def claim(self):
+        # Called on every request to the endpoint while armed.
+        if self.sample is not None and random.random() >= self.sample:
+            return False
+        with self._lock:
+            if self.started >= self.limit:
+                return False
+            self.started += 1
+            return True
+
+    def record(self, profile, timings, status):
+        with self._lock:
+            self.finished += 1
+            for key, value in timings.items():
+                self.totals[key] += value
+            self.slowest = sorted(self.slowest + [(round(timings["total"] * 1000, 3), status)], reverse=True)[:5]
+            if profile is not None:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def add_stack(self, stack):
+        with self._lock:
+            self.stacks[stack] += 1
+
+    def pstats_bytes(self):
+        # The marshal format `Stats.dump_stats` writes, so the download opens
+        # with pstats, snakeviz, gprof2dot and friends.
+        with self._lock:
+            if self.stats is None:
+                return None
+            return marshal.dumps(self.stats.stats)
+
+    def collapsed(self):
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=20):
+        with self._lock:
+            if self.stats is None:
+                return []
+            entries = list(self.stats.stats.items())
+        rows = []
+        for (filename, line, name), (cc, nc, tt, ct, _) in entries:
+            rows.append({"function": f"{name} ({filename}:{line})", "calls": nc,
+                         "own_ms": round(tt * 1000, 3), "cumulative_ms": round(ct * 1000, 3)})
+        rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+        return rows[:limit]
+
+    def summary(self):
+        with self._lock:
+            n = self.finished
+            averages = {f"{k}_ms": round(v / n * 1000, 3) for k, v in self.totals.items() if k != "sql_queries"} \
+                if n else {}
+            return {
+                "id": self.id,
+                "endpoint": self.endpoint,
+                "mode": self.mode,
+                "requests": self.limit,
+                "sample": self.sample,
+                "active": self.active,
+                "profiled": n,
+                "created_at": self.created_at,
+                "average": averages,
+                "sql_queries": self.totals["sql_queries"],
+                "slowest_ms": [ms for ms, _ in self.slowest],
+                "stacks": sum(self.stacks.values()),
+            }
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_name}"
+
+
+class StackSampler:
+    # Samples the stacks of the threads currently serving a profiled
+    # request. The thread only runs while at least one is registered.
+    def __init__(self, interval=0.002, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._targets = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, thread_id, session):
+        with self._cond:
+            self._targets[thread_id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, thread_id):
+        with self._cond:
+            self._targets.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._targets:
+                    self._cond.wait()
+                targets = dict(self._targets)
+            frames = sys._current_frames()
+            for thread_id, session in targets.items():
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if labels:
+                    session.add_stack(";".join(reversed(labels)))
+            time.sleep(self.interval)
+
+
+class Profiler:
+    def __init__(self, keep=20, sample_interval=0.002):
+        self.keep = keep
+        self.sessions = {}
+        self.armed = {}  # endpoint -> session; empty means every hook returns at once
+        self.sampler = StackSampler(sample_interval)
+        self._lock = threading.Lock()
+
+    def arm(self, session):
+        with self._lock:
+            self.armed[session.endpoint] = session
+            self.sessions[session.id] = session
+            finished = [s for s in self.sessions.values() if not s.active and s is not session]
+            for old in finished[:max(len(self.sessions) - self.keep, 0)]:
+                del self.sessions[old.id]
+
+    def disarm(self, session):
+        with self._lock:
+            if self.armed.get(session.endpoint) is session:
+                del self.armed[session.endpoint]
+
+    def remove(self, session_id):
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.disarm(session)
+        return session
+
+    def start(self):
+        session = self.armed.get(request.endpoint)
+        if session is None or not session.claim():
+            return
+        if not session.active:
+            self.disarm(session)
+        profile = None
+        if session.mode in ("both", "cprofile"):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None  # another profiler owns this interpreter right now
+        if session.mode in ("both", "sampler"):
+            self.sampler.add(threading.get_ident(), session)
+        g.profiling = (session, profile, time.perf_counter(), g.get("sql_time", 0.0), g.get("sql_queries", 0))
+        g.serialize_time = 0.0
+
+    def finish(self, response):
+        session, profile, started, sql_before, queries_before = g.pop("profiling")
+        if profile is not None:
+            profile.disable()
+        self.sampler.remove(threading.get_ident())
+        total = time.perf_counter() - started
+        sql = g.get("sql_time", 0.0) - sql_before
+        serialization = g.pop("serialize_time", 0.0)
+        session.record(profile, {
+            "total": total,
+            "sql": sql,
+            "serialization": serialization,
+            "python": max(total - sql - serialization, 0.0),
+            "sql_queries": g.get("sql_queries", 0) - queries_before,
+        }, response.status_code)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    # Adds the time spent encoding JSON to the profiled request's
+    # serialization bucket; one dict lookup otherwise.
+    def dumps(self, obj, **kwargs):
+        if not has_app_context() or "serialize_time" not in g:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            g.serialize_time += time.perf_counter() - started
+
+
+def init_profiler(app):
+    if not app.config.get("PROFILER_ENABLED", True):
+        return None
+    profiler = Profiler(keep=app.config.get("PROFILER_KEEP_SESSIONS", 20),
+                        sample_interval=app.config.get("PROFILER_SAMPLE_INTERVAL", 0.002))
+    app.extensions["profiler"] = profiler
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_profile():
+        if profiler.armed:
+            profiler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        if "profiling" in g:
+            profiler.finish(response)
+        return response
+
+    return profiler
+
+
+def get_profiler():
+    return current_app.extensions.get("profiler")
@@ -0,0 +1,82 @@
+from . import profiler_bp
+from config import *
+from flask import request, jsonify, current_app, Response
+from profiler.models import *
+from auth.decorators import admin_required
+
+def _session_or_404(session_id):
+    profiler = get_profiler()
+    session = profiler.sessions.get(session_id) if profiler is not None else None
+    if session is None:
+        return None, (jsonify({"msg": "Profiling session not found"}), HTTP_404_NOT_FOUND)
+    return session, None
+
+@profiler_bp.route("", methods=["GET"])
+@admin_required
+def list_sessions():
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({"enabled": False, "sessions": []})
+    return jsonify({"enabled": True, "sessions": [s.summary() for s in profiler.sessions.values()]})
+
+@profiler_bp.route("", methods=["POST"])
+@admin_required
+def arm():
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({"msg": "Profiler is disabled"}), HTTP_404_NOT_FOUND
+    data = request.get_json(silent=True) or {}
+    endpoint = data.get("endpoint")
+    if endpoint not in current_app.view_functions or endpoint == "static":
+        return jsonify({"msg": "endpoint must name a route, e.g. books.get_books"}), HTTP_400_BAD_REQUEST
+    requests = data.get("requests", 10)
+    if not isinstance(requests, int) or isinstance(requests, bool) or not 1 <= requests <= 10000:
+        return jsonify({"msg": "requests must be an integer between 1 and 10000"}), HTTP_400_BAD_REQUEST
+    sample = data.get("sample")
+    if sample is not None and (not isinstance(sample, (int, float)) or isinstance(sample, bool)
+                               or not 0 < sample <= 100):
+        return jsonify({"msg": "sample must be a percentage above 0 and at most 100"}), HTTP_400_BAD_REQUEST
+    mode = data.get("mode", "both")
+    if mode not in MODES:
+        return jsonify({"msg": f"mode must be one of {', '.join(MODES)}"}), HTTP_400_BAD_REQUEST
+    session = ProfileSession(endpoint, requests, None if sample is None else sample / 100, mode)
+    profiler.arm(session)
+    return jsonify(session.summary()), HTTP_201_CREATED
+
+@profiler_bp.route("/<session_id>", methods=["GET"])
+@admin_required
+def get_session(session_id):
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+    limit = request.args.get("top", 20, type=int)
+    return jsonify({**session.summary(), "top_functions": session.top_functions(limit)})
+
+@profiler_bp.route("/<session_id>", methods=["DELETE"])
+@admin_required
+def delete_session(session_id):
+    profiler = get_profiler()
+    if profiler is None or profiler.remove(session_id) is None:
+        return jsonify({"msg": "Profiling session not found"}), HTTP_404_NOT_FOUND
+    return jsonify({"msg": "Profiling session removed"})
+
+@profiler_bp.route("/<session_id>/pstats", methods=["GET"])
+@admin_required
+def download_pstats(session_id):
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+    data = session.pstats_bytes()
+    if data is None:
+        return jsonify({"msg": "No cProfile data recorded yet"}), HTTP_404_NOT_FOUND
+    return Response(data, mimetype="application/octet-stream", headers={
+        "Content-Disposition": f'attachment; filename="{session.endpoint}-{session.id}.prof"'})
+
+@profiler_bp.route("/<session_id>/collapsed", methods=["GET"])
+@admin_required
+def download_collapsed(session_id):
+    session, error = _session_or_404(session_id)
+    if error:
+        return error
+    return Response(session.collapsed(), mimetype="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="{session.endpoint}-{session.id}.folded"'})
@@ -0,0 +1,4 @@
+from flask import Blueprint
+
+replenishment_bp = Blueprint("replenishment", __name__, url_prefix="/api/replenishment")
+from . import routes, commands
@@ -0,0 +1,21 @@
+import json
+
+import click
+from . import replenishment_bp
+from replenishment.models import run_replenishment, confirm_batches
+
+@replenishment_bp.cli.command("run")
+@click.option("--dry-run", is_flag=True, help="Print the plan without placing any orders.")
+def run_command(dry_run):
+    """Place restock orders for below-threshold books, one batch per publisher."""
+    result = run_replenishment(dry_run=dry_run)
+    if result is None:
+        click.echo("A replenishment run is already in progress.")
+        raise SystemExit(1)
+    click.echo(json.dumps(result, indent=2, default=str))
+
+@replenishment_bp.cli.command("confirm")
+@click.argument("batch_ids", nargs=-1, type=int)
+def confirm_command(batch_ids):
+    """Confirm the given pending batches (all of them if none are given)."""
+    click.echo(json.dumps(confirm_batches(list(batch_ids) or None), indent=2, default=str))
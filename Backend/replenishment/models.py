@@ -0,0 +1,259 @@
+import datetime
+import logging
+import math
+import threading
+
+from flask import current_app
+from db.db_connection import get_db
+from books.catalog import bump_catalog_version
+from books.search_index import refresh_stock
+
+logger = logging.getLogger(__name__)
+
+RUN_LOCK = "replenishment_run"  # MySQL named lock: one planner at a time across processes
+
+def order_quantity(stock, threshold, sold, on_order, window_days, cover_days, minimum, maximum):
+    """Units to order so stock covers `cover_days` of recent demand above threshold.
+
+    Returns 0 when what is already on order is enough.
+    """
+    velocity = sold / window_days
+    target = threshold + math.ceil(velocity * cover_days)
+    needed = target - stock - on_order
+    if needed <= 0:
+        return 0
+    return min(max(needed, minimum), maximum)
+
+def scan_below_threshold(cursor, since):
+    # One statement: every below-threshold book with its sales since `since`
+    # and what is already on order for it.
+    cursor.execute("""
+        SELECT B.ISBN_number, B.publisher_id, B.quantity_stock, B.threshold, B.selling_price,
+               COALESCE(S.sold, 0) AS sold, COALESCE(P.on_order, 0) AS on_order
+        FROM book AS B
+        LEFT JOIN (
+            SELECT BO.ISBN_number, SUM(BO.item_quantity) AS sold
+            FROM customer_order AS CO JOIN book_order AS BO ON (BO.order_id = CO.order_id)
+            WHERE CO.order_date >= %s
+            GROUP BY BO.ISBN_number
+        ) AS S ON (S.ISBN_number = B.ISBN_number)
+        LEFT JOIN (
+            SELECT ISBN_number, SUM(quantity) AS on_order
+            FROM publisher_order
+            WHERE status = 'Pending'
+            GROUP BY ISBN_number
+        ) AS P ON (P.ISBN_number = B.ISBN_number)
+        WHERE B.quantity_stock < B.threshold
+        ORDER BY B.publisher_id, B.ISBN_number
+    """, (since,))
+    return cursor.fetchall()
+
+def plan_replenishment(rows, window_days, cover_days, minimum, maximum):
+    """Group the scanned books into {publisher_id: [order lines]}.
+
+    Books without a publisher are left out: there is nobody to order them from.
+    """
+    plan = {}
+    for row in rows:
+        if row["publisher_id"] is None:
+            continue
+        quantity = order_quantity(row["quantity_stock"], row["threshold"], int(row["sold"]), int(row["on_order"]),
+                                  window_days, cover_days, minimum, maximum)
+        if quantity <= 0:
+            continue
+        plan.setdefault(row["publisher_id"], []).append({
+            "ISBN_number": row["ISBN_number"],
+            "quantity": quantity,
+            "cost": row["selling_price"] * quantity,
+            "stock": row["quantity_stock"],
+            "sold": int(row["sold"]),
+        })
+    return plan
+
+def _settings():
+    config = current_app.config
+    return (config.get("REPLENISHMENT_WINDOW_DAYS", 28), config.get("REPLENISHMENT_COVER_DAYS", 30),
+            config.get("REPLENISHMENT_MIN_ORDER", 50), config.get("REPLENISHMENT_MAX_ORDER", 1000))
+
+def run_replenishment(dry_run=False, now=None):
+    """Scan, size and file restock orders into one pending batch per publisher.
+
+    Orders join a publisher's existing pending batch if there is one.
+    Returns None if another process is already running it.
+    """
+    window_days, cover_days, minimum, maximum = _settings()
+    since = (now or datetime.datetime.now()) - datetime.timedelta(days=window_days)
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("SELECT GET_LOCK(%s, 0) AS locked", (RUN_LOCK,))
+    if not cursor.fetchone()["locked"]:
+        db.rollback()
+        return None
+    try:
+        plan = plan_replenishment(scan_below_threshold(cursor, since), window_days, cover_days, minimum, maximum)
+        if dry_run or not plan:
+            db.rollback()
+            return {"batches": [], "plan": plan}
+
+        # Locked until commit: a confirm that got in between this read and the
+        # inserts below would leave the new orders Pending in a Confirmed
+        # batch, where confirm_batches never looks again.
+        cursor.execute("SELECT batch_id, publisher_id FROM publisher_order_batch WHERE status = 'Pending' FOR UPDATE")
+        open_batches = {row["publisher_id"]: row["batch_id"] for row in cursor.fetchall()}
+        batches = []
+        for publisher_id, lines in plan.items():
+            cost = sum(line["cost"] for line in lines)
+            batch_id = open_batches.get(publisher_id)
+            if batch_id is None:
+                cursor.execute("INSERT INTO publisher_order_batch (publisher_id, total_cost) VALUES (%s, %s)",
+                               (publisher_id, cost))
+                batch_id = cursor.lastrowid
+            else:
+                cursor.execute("UPDATE publisher_order_batch SET total_cost = total_cost + %s WHERE batch_id = %s",
+                               (cost, batch_id))
+            cursor.executemany(
+                "INSERT INTO publisher_order (cost, status, quantity, ISBN_number, batch_id) VALUES (%s, 'Pending', %s, %s, %s)",
+                [(line["cost"], line["quantity"], line["ISBN_number"], batch_id) for line in lines]
+            )
+            batches.append({"batch_id": batch_id, "publisher_id": publisher_id, "orders": len(lines), "cost": cost})
+        db.commit()
+        return {"batches": batches, "plan": plan}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (RUN_LOCK,))
+        cursor.fetchall()
+        db.rollback()  # don't leave the request holding a transaction open
+
+def get_batches(status="Pending"):
+    cursor = get_db().cursor(dictionary=True)
+    cursor.execute("""
+        SELECT PB.batch_id, PB.publisher_id, P.name AS publisher_name, PB.status, PB.total_cost,
+               PB.created_at, PB.confirmed_at, PO.order_id, PO.ISBN_number, PO.quantity, PO.cost
+        FROM publisher_order_batch AS PB
+        LEFT JOIN publisher AS P ON (P.publisher_id = PB.publisher_id)
+        JOIN publisher_order AS PO ON (PO.batch_id = PB.batch_id)
+        WHERE PB.status = %s
+        ORDER BY PB.batch_id, PO.order_id
+    """, (status,))
+    batches = {}
+    for row in cursor.fetchall():
+        batch = batches.get(row["batch_id"])
+        if batch is None:
+            batch = batches[row["batch_id"]] = {
+                key: row[key] for key in ("batch_id", "publisher_id", "publisher_name", "status", "total_cost",
+                                          "created_at", "confirmed_at")
+            }
+            batch["orders"] = []
+        batch["orders"].append({key: row[key] for key in ("order_id", "ISBN_number", "quantity", "cost")})
+    return list(batches.values())
+
+def confirm_batches(batch_ids=None):
+    """Confirm pending batches (all of them if batch_ids is None).
+
+    Every book's increment is applied by one UPDATE; the per-row confirm
+    trigger skips batched orders.
+    """
+    db = get_db()
+    cursor = db.cursor(dictionary=True)
+    try:
+        if batch_ids is None:
+            cursor.execute("SELECT batch_id FROM publisher_order_batch WHERE status = 'Pending' FOR UPDATE")
+        else:
+            if not batch_ids:
+                return {"confirmed": [], "books": 0, "units": 0}
+            placeholders = ", ".join(["%s"] * len(batch_ids))
+            cursor.execute(f"""
+                SELECT batch_id FROM publisher_order_batch
+                WHERE batch_id IN ({placeholders}) AND status = 'Pending'
+                FOR UPDATE
+            """, list(batch_ids))
+        confirmed = sorted(row["batch_id"] for row in cursor.fetchall())
+        if not confirmed:
+            db.rollback()
+            return {"confirmed": [], "books": 0, "units": 0}
+
+        placeholders = ", ".join(["%s"] * len(confirmed))
+        cursor.execute(f"""
+            SELECT ISBN_number, SUM(quantity) AS units
+            FROM publisher_order
+            WHERE batch_id IN ({placeholders}) AND status = 'Pending'
+            GROUP BY ISBN_number
+        """, confirmed)
+        units = {row["ISBN_number"]: int(row["units"]) for row in cursor.fetchall()}
+        cursor.execute(f"""
+            UPDATE book
+            SET quantity_stock = quantity_stock + (
+                SELECT SUM(PO.quantity)
+                FROM publisher_order AS PO
+                WHERE PO.batch_id IN ({placeholders}) AND PO.status = 'Pending' AND PO.ISBN_number = book.ISBN_number
+            )
+            WHERE ISBN_number IN (
+                SELECT ISBN_number FROM publisher_order
+                WHERE batch_id IN ({placeholders}) AND status = 'Pending'
+            )
+        """, confirmed + confirmed)
+        cursor.execute(f"""
+            UPDATE publisher_order SET status = 'Confirmed'
+            WHERE batch_id IN ({placeholders}) AND status = 'Pending'
+        """, confirmed)
+        cursor.execute(f"""
+            UPDATE publisher_order_batch SET status = 'Confirmed', confirmed_at = CURRENT_TIMESTAMP
+            WHERE batch_id IN ({placeholders})
+        """, confirmed)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    bump_catalog_version()
+    refresh_stock(units)
+    return {"confirmed": confirmed, "books": len(units), "units": sum(units.values())}
+
+class Replenisher:
+    # Runs run_replenishment every `interval` seconds in the background.
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.runs = 0
+        self.last_run = None
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="replenishment", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    result = run_replenishment()
+                if result is not None:
+                    self.runs += 1
+                    self.last_run = datetime.datetime.now().isoformat()
+                    self.last_result = result["batches"]
+            except Exception:
+                logger.exception("Replenishment run failed")
+
+    def stats(self):
+        return {"interval": self.interval, "runs": self.runs, "last_run": self.last_run,
+                "last_batches": self.last_result}
+
+def init_replenishment(app):
+    interval = app.config.get("REPLENISHMENT_INTERVAL")
+    if not interval:
+        return None
+    replenisher = Replenisher(app, interval)
+    app.extensions["replenisher"] = replenisher
+    replenisher.start()
+    return replenisher
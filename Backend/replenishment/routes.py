@@ -0,0 +1,38 @@
+from . import replenishment_bp
+from config import *
+from flask import request, jsonify, current_app
+from replenishment.models import *
+from auth.decorators import admin_required
+
+@replenishment_bp.route("/batches", methods=["GET"])
+@admin_required
+def list_batches():
+    status = request.args.get("status", "Pending")
+    if status not in ("Pending", "Confirmed"):
+        return jsonify({"msg": "status must be Pending or Confirmed"}), HTTP_400_BAD_REQUEST
+    return jsonify(get_batches(status))
+
+@replenishment_bp.route("/run", methods=["POST"])
+@admin_required
+def run():
+    dry_run = request.args.get("dry_run", "").lower() in ("1", "true", "yes")
+    result = run_replenishment(dry_run=dry_run)
+    if result is None:
+        return jsonify({"msg": "A replenishment run is already in progress"}), HTTP_409_CONFLICT
+    return jsonify(result)
+
+@replenishment_bp.route("/batches/confirm", methods=["POST"])
+@admin_required
+def confirm():
+    data = request.get_json(silent=True) or {}
+    batch_ids = data.get("batch_ids")
+    if batch_ids is not None and (not isinstance(batch_ids, list) or
+                                  not all(isinstance(i, int) and not isinstance(i, bool) for i in batch_ids)):
+        return jsonify({"msg": "batch_ids must be a list of integers"}), HTTP_400_BAD_REQUEST
+    return jsonify(confirm_batches(batch_ids))
+
+@replenishment_bp.route("/status", methods=["GET"])
+@admin_required
+def status():
+    replenisher = current_app.extensions.get("replenisher")
+    return jsonify(replenisher.stats() if replenisher is not None else {"interval": None})
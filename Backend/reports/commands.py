@@ -0,0 +1,28 @@
+import datetime
+
+import click
+from . import reports_bp
+from reports.models import rebuild_rollups, check_rollups
+
+def _since(value):
+    return datetime.date.fromisoformat(value) if value else None
+
+@reports_bp.cli.command("rebuild")
+@click.option("--since", help="Only rebuild days on or after YYYY-MM-DD.")
+def rebuild_command(since):
+    """Recompute the daily sales rollups from customer_order/book_order."""
+    rebuild_rollups(_since(since))
+    click.echo("Rollups rebuilt.")
+
+@reports_bp.cli.command("check")
+@click.option("--since", help="Only check days on or after YYYY-MM-DD.")
+def check_command(since):
+    """Compare the rollups against the raw order tables."""
+    result = check_rollups(_since(since))
+    if result["ok"]:
+        click.echo("Rollups match the raw order tables.")
+        return
+    for table, problems in result["mismatches"].items():
+        for problem in problems:
+            click.echo(f"{table} {problem['key']}: expected {problem['expected']}, found {problem['actual']}")
+    raise SystemExit(1)
@@ -0,0 +1,132 @@
+import calendar
+import datetime
+
+from db.db_connection import get_db
+
+EPOCH = datetime.date(1970, 1, 1)  # earliest possible TIMESTAMP order_date
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def _months_before(day, months):
+    month = day.month - months
+    year = day.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    # Clamp to the end of shorter months, like MySQL's INTERVAL n MONTH.
+    return datetime.date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def sales_previous_month(today=None):
+    today = today or datetime.date.today()
+    end = _month_start(today)
+    start = _month_start(end - datetime.timedelta(days=1))
+    cursor = get_db(readonly=True).cursor(dictionary=True)
+    cursor.execute("""
+        SELECT SUM(total_sales) AS Total_Sales
+        FROM daily_sales
+        WHERE sales_date >= %s AND sales_date < %s
+    """, (start, end))
+    return cursor.fetchone()
+
+def sales_by_date(target_date):
+    cursor = get_db(readonly=True).cursor(dictionary=True)
+    cursor.execute("SELECT total_sales AS Total_Sales FROM daily_sales WHERE sales_date = %s", (target_date,))
+    return cursor.fetchone() or {"Total_Sales": None}
+
+def top_customers(limit=5, today=None):
+    since = _months_before(today or datetime.date.today(), 3)
+    cursor = get_db(readonly=True).cursor(dictionary=True)
+    cursor.execute("""
+        SELECT U.first_name, U.last_name, SUM(D.total_amount) AS total_purchase_amount
+        FROM daily_customer_sales AS D JOIN user AS U ON (D.username = U.username)
+        WHERE D.sales_date >= %s
+        GROUP BY D.username, U.first_name, U.last_name
+        ORDER BY total_purchase_amount DESC
+        LIMIT %s
+    """, (since, limit))
+    return cursor.fetchall()
+
+def top_selling_books(limit=10, today=None):
+    since = _months_before(today or datetime.date.today(), 3)
+    cursor = get_db(readonly=True).cursor(dictionary=True)
+    cursor.execute("""
+        SELECT B.title, SUM(D.copies_sold) AS total_number_of_copies_sold
+        FROM daily_book_sales AS D JOIN book AS B ON (D.ISBN_number = B.ISBN_number)
+        WHERE D.sales_date >= %s
+        GROUP BY B.title
+        ORDER BY total_number_of_copies_sold DESC
+        LIMIT %s
+    """, (since, limit))
+    return cursor.fetchall()
+
+# Aggregates over the raw order tables, shared by rebuild and check. Each
+# takes an optional lower bound on order_date (inclusive, a DATE).
+RAW_DAILY_SALES = """
+    SELECT DATE(order_date) AS sales_date, COUNT(*) AS orders_count, COALESCE(SUM(cost), 0) AS total_sales
+    FROM customer_order
+    WHERE order_date >= %s
+    GROUP BY DATE(order_date)
+"""
+
+RAW_DAILY_CUSTOMER_SALES = """
+    SELECT DATE(order_date) AS sales_date, username, COUNT(*) AS orders_count, COALESCE(SUM(cost), 0) AS total_amount
+    FROM customer_order
+    WHERE order_date >= %s AND username IS NOT NULL
+    GROUP BY DATE(order_date), username
+"""
+
+RAW_DAILY_BOOK_SALES = """
+    SELECT DATE(CO.order_date) AS sales_date, BO.ISBN_number, SUM(BO.item_quantity) AS copies_sold,
+           SUM(BO.item_quantity * BO.unit_price) AS revenue
+    FROM customer_order AS CO JOIN book_order AS BO ON (CO.order_id = BO.order_id)
+    WHERE CO.order_date >= %s
+    GROUP BY DATE(CO.order_date), BO.ISBN_number
+"""
+
+ROLLUP_SOURCES = {
+    "daily_sales": (RAW_DAILY_SALES, ("sales_date",), ("orders_count", "total_sales")),
+    "daily_customer_sales": (RAW_DAILY_CUSTOMER_SALES, ("sales_date", "username"), ("orders_count", "total_amount")),
+    "daily_book_sales": (RAW_DAILY_BOOK_SALES, ("sales_date", "ISBN_number"), ("copies_sold", "revenue")),
+}
+
+def rebuild_rollups(since=None):
+    since = since or EPOCH
+    db = get_db()
+    cursor = db.cursor()
+    try:
+        for table, (source, keys, values) in ROLLUP_SOURCES.items():
+            columns = ", ".join(keys + values)
+            cursor.execute(f"DELETE FROM {table} WHERE sales_date >= %s", (since,))
+            cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM ({source}) AS raw", (since,))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def check_rollups(since=None):
+    since = since or EPOCH
+    cursor = get_db().cursor(dictionary=True)
+    mismatches = {}
+    for table, (source, keys, values) in ROLLUP_SOURCES.items():
+        cursor.execute(source, (since,))
+        raw = {tuple(row[k] for k in keys): tuple(row[v] for v in values) for row in cursor.fetchall()}
+        cursor.execute(
+            f"SELECT {', '.join(keys + values)} FROM {table} WHERE sales_date >= %s",
+            (since,)
+        )
+        rolled = {tuple(row[k] for k in keys): tuple(row[v] for v in values) for row in cursor.fetchall()}
+        # Days whose orders were all moved away leave zero rows behind; those are consistent.
+        rolled = {k: v for k, v in rolled.items() if any(v) or k in raw}
+
+        problems = []
+        for key in sorted(set(raw) | set(rolled), key=str):
+            expected = raw.get(key)
+            actual = rolled.get(key)
+            if expected != actual:
+                problems.append({
+                    "key": dict(zip(keys, (str(k) for k in key))),
+                    "expected": dict(zip(values, (str(v) for v in expected))) if expected else None,
+                    "actual": dict(zip(values, (str(v) for v in actual))) if actual else None,
+                })
+        if problems:
+            mismatches[table] = problems
+    return {"ok": not mismatches, "mismatches": mismatches}
@@ -0,0 +1,35 @@
+from . import reports_bp
+from config import *
+from flask import request, jsonify
+from reports.models import *
+from auth.decorators import admin_required
+import datetime
+
+@reports_bp.route("/sales/previous-month", methods=["GET"])
+@admin_required
+def get_sales_previous_month():
+    return jsonify(sales_previous_month())
+
+@reports_bp.route("/sales", methods=["GET"])
+@admin_required
+def get_sales_by_date():
+    try:
+        target_date = datetime.date.fromisoformat(request.args.get("date", ""))
+    except ValueError:
+        return jsonify({"msg": "date must be YYYY-MM-DD"}), HTTP_400_BAD_REQUEST
+    return jsonify(sales_by_date(target_date))
+
+@reports_bp.route("/top-customers", methods=["GET"])
+@admin_required
+def get_top_customers():
+    return jsonify(top_customers())
+
+@reports_bp.route("/top-books", methods=["GET"])
+@admin_required
+def get_top_selling_books():
+    return jsonify(top_selling_books())
+
+@reports_bp.route("/rollups/check", methods=["GET"])
+@admin_required
+def get_rollup_check():
+    return jsonify(check_rollups())
@@ -0,0 +1,11 @@
+import pytest
+from config import TestConfig
+from db.sqlite import sqlite_backend
+
+
+@pytest.fixture(autouse=True)
+def rollback_db():
+    # Every app built from TestConfig shares this process's in-memory
+    # database; whatever a test commits is rolled back when it ends.
+    with sqlite_backend(TestConfig.DB_SQLITE_PATH).rollback_after():
+        yield
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+from app import create_app
+from config import *
+from auth.admission import MemoryBucketStore
+from auth.tokens import generate_access_token
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    clock = Clock()
+    store = MemoryBucketStore(clock=clock)
+    assert [store.take("k", rate=2, burst=3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", rate=2, burst=3) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert store.take("k", rate=2, burst=3) == 0.0
+    assert store.take("other", rate=2, burst=3) == 0.0
+
+
+def test_idle_buckets_are_swept_when_full():
+    clock = Clock()
+    store = MemoryBucketStore(max_keys=2, clock=clock)
+    store.take("a", rate=1, burst=1)
+    store.take("b", rate=1, burst=1)
+    clock.now += 5  # both refilled, so nothing is lost by forgetting them
+    store.take("c", rate=1, burst=1)
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("rule", [
+    {"rate": 0, "burst": 5},
+    {"rate": -1, "burst": 5},
+    {"rate": float("nan"), "burst": 5},
+    {"rate": "1", "burst": 5},
+    {"rate": 1, "burst": 0},
+    {"rate": 1, "burst": 5, "concurrency": 0},
+])
+def test_unusable_rules_are_refused_at_startup(rule):
+    class AdmissionConfig(TestConfig):
+        ADMISSION_ENABLED = True
+        ADMISSION_RULES = {"users.login": rule}
+    with pytest.raises(ValueError, match="users.login"):
+        create_app(AdmissionConfig)
+
+
+@pytest.fixture
+def app():
+    class AdmissionConfig(TestConfig):
+        ADMISSION_ENABLED = True
+        ADMISSION_RULES = {
+            "probe": {"rate": 0.01, "burst": 2, "concurrency": None},
+            "slow": {"rate": 1000, "burst": 1000, "concurrency": 1},
+        }
+    app = create_app(AdmissionConfig)
+    app.config["TESTING"] = True
+    gate = app.slow_gate = threading.Event()
+
+    @app.route("/_probe", endpoint="probe")
+    def probe():
+        return {"ok": True}
+
+    @app.route("/_slow", endpoint="slow")
+    def slow():
+        gate.wait(5)
+        return {"ok": True}
+
+    return app
+
+
+def test_over_budget_answers_429_with_retry_after(app):
+    client = app.test_client()
+    assert client.get("/_probe").status_code == 200
+    assert client.get("/_probe").status_code == 200
+    rv = client.get("/_probe")
+    assert rv.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert int(rv.headers["Retry-After"]) >= 1
+    # Another address has its own bucket.
+    assert client.get("/_probe", environ_base={"REMOTE_ADDR": "10.0.0.9"}).status_code == 200
+    assert app.extensions["admission"].stats()["probe"] == {"allowed": 3, "limited": 1, "busy": 0}
+
+
+def test_budget_follows_the_jwt_identity(app):
+    with app.app_context():
+        alice = {"Authorization": f"Bearer {generate_access_token('alice', 'Customer')}"}
+        bob = {"Authorization": f"Bearer {generate_access_token('bob', 'Customer')}"}
+    client = app.test_client()
+    for _ in range(2):
+        assert client.get("/_probe", headers=alice).status_code == 200
+    assert client.get("/_probe", headers=alice).status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert client.get("/_probe", headers=bob).status_code == 200
+
+
+def test_concurrency_cap_rejects_with_503(app):
+    results = []
+    first = threading.Thread(target=lambda: results.append(app.test_client().get("/_slow").status_code))
+    first.start()
+    deadline = time.monotonic() + 5
+    while app.extensions["admission"].stats()["slow"]["allowed"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    rv = app.test_client().get("/_slow")
+    app.slow_gate.set()
+    first.join()
+    assert rv.status_code == HTTP_503_UNAVAILABLE
+    assert rv.headers["Retry-After"] == "1"
+    assert results == [200]
+    assert app.test_client().get("/_slow").status_code == 200  # the slot was handed back
+
+
+def test_allowed_path_costs_microseconds(app):
+    controller = app.extensions["admission"]
+    controller.rules["probe"] = {"rate": 1e9, "burst": 1e9}
+    with app.test_request_context("/_probe"):
+        n = 5000
+        started = time.perf_counter()
+        for _ in range(n):
+            assert controller.admit() is None
+        per_call = (time.perf_counter() - started) / n
+    assert per_call < 50e-6
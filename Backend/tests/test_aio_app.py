@@ -0,0 +1,108 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("aiomysql")
+
+from config import TestConfig, BenchConfig
+from aio.app import create_async_app
+from auth.tokens import encode_access_token
+from config import *
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture
+def app():
+    app = create_async_app(TestConfig)
+    app.config['TESTING'] = True
+    return app
+
+
+def test_health(app):
+    async def check():
+        rv = await app.test_client().get("/health")
+        assert rv.status_code == 200
+        assert await rv.get_json() == {"status": "ok"}
+    run(check())
+
+
+def test_books_blueprint_validates_before_touching_the_db(app):
+    async def check():
+        client = app.test_client()
+        for query in ("price_max=inf", "price_min=nan", "year_min=soon"):
+            rv = await client.get(f"/api/books/search?{query}")
+            assert rv.status_code == HTTP_400_BAD_REQUEST
+        assert (await client.get("/api/books/search/cache")).status_code == HTTP_401_UNAUTHORIZED
+    run(check())
+
+
+def test_users_blueprint_validates_before_touching_the_db(app):
+    async def check():
+        client = app.test_client()
+        assert (await client.get("/api/users/me")).status_code == HTTP_401_UNAUTHORIZED
+        rv = await client.post("/api/users/register", json={"username": "x", "name": "Mononym"})
+        assert rv.status_code == HTTP_400_BAD_REQUEST
+    run(check())
+
+
+def test_admission_budgets_and_metrics_match_the_flask_app():
+    class AdmissionConfig(TestConfig):
+        ADMISSION_ENABLED = True
+        ADMISSION_RULES = {"probe": {"rate": 0.01, "burst": 2, "concurrency": None}}
+    app = create_async_app(AdmissionConfig)
+
+    @app.route("/_probe", endpoint="probe")
+    async def probe():
+        return {"ok": True}
+
+    async def check():
+        client = app.test_client()
+        assert [(await client.get("/_probe")).status_code for _ in range(2)] == [200, 200]
+        rv = await client.get("/_probe")
+        assert rv.status_code == HTTP_429_TOO_MANY_REQUESTS
+        assert int(rv.headers["Retry-After"]) >= 1
+        # A token moves the client to its own budget.
+        token = encode_access_token(app.config, "alice", "Customer")
+        rv = await client.get("/_probe", headers={"Authorization": f"Bearer {token}"})
+        assert rv.status_code == 200
+        assert app.extensions["admission"].stats()["probe"] == {"allowed": 3, "limited": 1, "busy": 0}
+
+        body = await (await client.get("/metrics")).get_data(as_text=True)
+        assert 'http_request_duration_seconds_count{method="GET",endpoint="/_probe",status="429"} 1' in body
+        assert "http_request_sql_queries_count" not in body  # aiomysql isn't instrumented
+    run(check())
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_AIO_MYSQL"),
+                    reason="set TEST_AIO_MYSQL=1 after `python -m benchmarks.seed` on the bench DB")
+def test_blueprints_against_mysql():
+    app = create_async_app(BenchConfig)
+    app.config['TESTING'] = True
+
+    async def check():
+        async with app.test_app() as test_app:  # runs before_serving, which opens the pool
+            client = test_app.test_client()
+            rv = await client.get("/api/books/?limit=2")
+            assert rv.status_code == 200
+            assert len((await rv.get_json())["books"]) == 2
+
+            rv = await client.get("/api/books/search?facets=1&in_stock=1&price_max=50")
+            body = await rv.get_json()
+            assert set(body) == {"books", "total", "facets"}
+            assert body["total"] == len(body["books"])
+
+            rv = await client.get("/api/books/search?stream=1&price_max=50")
+            assert rv.status_code == 200
+            assert isinstance(await rv.get_json(), list)
+            rv = await client.get("/api/books/search?stream=1&title=no such title at all")
+            assert await rv.get_json() == []
+
+            token = encode_access_token(app.config, "nobody", "Customer")
+            rv = await client.get("/api/users/orders?summary=1", headers={"Authorization": f"Bearer {token}"})
+            assert await rv.get_json() == {"orders": [], "next_cursor": None}
+    run(check())
@@ -0,0 +1,50 @@
+import pytest
+from flask_jwt_extended import decode_token
+from app import create_app
+from config import TestConfig
+from auth.tokens import generate_access_token, encode_access_token, TokenError, decode_access_token, token_from_header
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    app.config['TESTING'] = True
+    return app
+
+
+def test_sync_tokens_are_accepted_by_the_async_app(app):
+    with app.app_context():
+        token = generate_access_token("alice", "Admin")
+    claims = decode_access_token(app.config, token)
+    assert claims["sub"] == "alice"
+    assert claims["role"] == "Admin"
+
+
+def test_async_tokens_are_accepted_by_the_sync_app(app):
+    token = encode_access_token(app.config, "bob", "Customer")
+    with app.app_context():
+        claims = decode_token(token)
+    assert claims["sub"] == "bob"
+    assert claims["role"] == "Customer"
+    assert claims["type"] == "access"
+
+
+def test_token_errors_match_flask_jwt_extended(app):
+    with pytest.raises(TokenError) as exc:
+        token_from_header(None)
+    assert (exc.value.msg, exc.value.status) == ("Missing Authorization Header", 401)
+    with pytest.raises(TokenError) as exc:
+        token_from_header("Token abc")
+    assert exc.value.status == 422
+
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = -10
+    expired = encode_access_token(app.config, "bob", "Customer")
+    with pytest.raises(TokenError) as exc:
+        decode_access_token(app.config, expired)
+    assert (exc.value.msg, exc.value.status) == ("Token has expired", 401)
+
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = 60
+    token = encode_access_token(app.config, "bob", "Customer")
+    with pytest.raises(TokenError) as exc:
+        decode_access_token(dict(app.config, JWT_SECRET_KEY="other"), token_from_header("Bearer " + token))
+    assert (exc.value.msg, exc.value.status) == ("Signature verification failed", 422)
@@ -0,0 +1,86 @@
+import glob
+import os
+import re
+
+import pytest
+from benchmarks.run import QueryCounter, InProcessClient, percentile, compare, run_scenario
+from benchmarks.seed import TABLES
+from db.pool import PooledConnection
+from app import create_app
+from config import TestConfig
+
+DATABASE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "Database")
+
+
+class RawCursor:
+    def execute(self, query, params=None):
+        pass
+
+    def executemany(self, query, seq_params):
+        pass
+
+
+class RawConnection:
+    def cursor(self, *args, **kwargs):
+        return RawCursor()
+
+
+class Record:
+    raw = RawConnection()
+
+
+def test_seed_wipes_every_data_table():
+    created = set()
+    for path in glob.glob(os.path.join(DATABASE_DIR, "*.sql")):
+        with open(path) as f:
+            created.update(re.findall(r"CREATE TABLE (\w+)", f.read()))
+    assert created - set(TABLES) == set()
+
+
+def test_query_counter_counts_per_thread_while_installed():
+    counter = QueryCounter()
+    with counter.install():
+        cursor = PooledConnection(None, Record()).cursor()
+        cursor.execute("SELECT 1")
+        cursor.executemany("INSERT INTO t VALUES (%s)", [(1,), (2,)])
+        assert counter.take() == 2
+        assert counter.take() == 0
+    assert "cursor" not in PooledConnection.__dict__
+    PooledConnection(None, Record()).cursor().execute("SELECT 1")
+    assert counter.take() == 0
+
+
+def test_query_counter_unpatches_when_the_run_fails():
+    with pytest.raises(RuntimeError):
+        with QueryCounter().install():
+            raise RuntimeError("scenario blew up")
+    assert "cursor" not in PooledConnection.__dict__
+
+
+def test_in_process_run_reports_latency_and_statuses():
+    app = create_app(TestConfig)
+    client = InProcessClient(app, QueryCounter())
+    build = lambda rng: ("GET", rng.choice(("/health", "/nowhere")), None, None)
+    result = run_scenario(client, build, requests=20, concurrency=4, warmup=2, seed=1)
+    assert result["requests"] == 20
+    assert sum(result["status"].values()) == 20 and set(result["status"]) <= {"200", "404"}
+    assert result["errors"] == result["status"].get("404", 0)
+    assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"] <= result["latency_ms"]["max"]
+    assert result["queries_per_request"] == 0
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 99), percentile(values, 100)) == (50, 99, 100)
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_compare_skips_missing_baselines():
+    def report(p50, rps, queries):
+        return {"scenarios": {"catalog": {"latency_ms": {"p50": p50, "p99": p50 * 2}, "rps": rps,
+                                          "queries_per_request": queries}}}
+    lines = compare(report(5.0, 200, None), report(10.0, 100, 2.0)).splitlines()
+    assert [line.split()[1] for line in lines] == ["p50", "p99", "rps"]
+    assert lines[0].endswith("(-50.0%)")
+    assert compare(report(5.0, 200, 1.0), {"scenarios": {}}) == ""
@@ -0,0 +1,294 @@
+import pytest
+from app import create_app
+from config import TestConfig
+from db.db_connection import get_db
+import books.models as book_models
+import books.search_index as search_index
+from books.catalog import bump_catalog_version
+from auth.tokens import generate_access_token
+
+
+class CountingCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.db.queries.append((query, params))
+        if "FROM author WHERE ISBN_number IN" in query:
+            wanted = set(params)
+            self.rows = [dict(a) for a in self.db.authors if a["ISBN_number"] in wanted]
+        elif "FROM author" in query:
+            self.rows = [dict(a) for a in self.db.authors]
+        elif "WHERE B.ISBN_number IN" in query:
+            wanted = set(params)
+            self.rows = [dict(b) for b in self.db.books if b["ISBN_number"] in wanted]
+        elif "LEFT JOIN author" in query:
+            self.rows = [dict(b, author_name=a["author_name"]) for b in self.db.books
+                         for a in self.db.authors if a["ISBN_number"] == b["ISBN_number"]]
+        else:
+            self.rows = [dict(b) for b in self.db.books]
+            if "LIMIT %s" in query:
+                self.rows = self.rows[:params[-1]]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        self.db.batches += 1
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class CountingDB:
+    def __init__(self, n_books, authors_per_book=2):
+        self.queries = []
+        self.batches = 0
+        self.books = [
+            {"ISBN_number": f"978{i:07d}", "title": f"Book {i}", "publication_year": 2000,
+             "quantity_stock": 10, "category": "Science", "selling_price": 10,
+             "book_image": "img.png", "name": "Pub"}
+            for i in range(n_books)
+        ]
+        self.authors = [
+            {"ISBN_number": b["ISBN_number"], "author_name": f"Author {j}"}
+            for b in self.books for j in range(authors_per_book)
+        ]
+
+    def cursor(self, dictionary=False):
+        return CountingCursor(self)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield app
+
+
+@pytest.mark.parametrize("n_books", [1, 10, 500])
+def test_get_books_page_query_count_is_constant(app, monkeypatch, n_books):
+    db = CountingDB(n_books)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+
+    books, _ = book_models.get_books_page(limit=book_models.MAX_PAGE_SIZE)
+
+    assert len(books) == min(n_books, book_models.MAX_PAGE_SIZE)
+    assert len(db.queries) == 2
+    assert all(b["authors"] == ["Author 0", "Author 1"] for b in books)
+
+
+@pytest.mark.parametrize("n_books", [1, 10, 500])
+def test_book_search_query_count_is_constant(app, monkeypatch, n_books):
+    db = CountingDB(n_books)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    app.config["SEARCH_INDEX_ENABLED"] = False
+
+    books = book_models.book_search(None, "Book", None, "Author", None)
+
+    assert len(books) == n_books
+    assert len(db.queries) == 2
+
+
+@pytest.mark.parametrize("n_books", [1, 10, 500])
+def test_indexed_book_search_only_hydrates_hits(app, monkeypatch, n_books):
+    db = CountingDB(n_books)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    monkeypatch.setattr(search_index, "get_db", lambda readonly=False: db)
+    search_index.get_search_index()
+    db.queries.clear()
+
+    books = book_models.book_search(None, "book 0", None, "author", None)
+
+    assert books and all("book 0" in b["title"].lower() for b in books)
+    assert len(db.queries) == 2
+    assert all("LIKE" not in q for q, _ in db.queries)
+
+    db.queries.clear()
+    assert book_models.book_search(None, "no such title", None, None, None) == []
+    assert db.queries == []
+
+
+def test_search_callers_cannot_edit_the_cached_result(app, monkeypatch):
+    db = CountingDB(3)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    monkeypatch.setattr(search_index, "get_db", lambda readonly=False: db)
+
+    for _ in range(2):  # the miss that fills the cache, then a hit
+        books = book_models.book_search(None, "book", None, None, None)
+        books[0]["title"] = "Edited"
+        books[0]["authors"].append("Intruder")
+        books.pop()
+        result = book_models.faceted_book_search(None, "book", None, None, {"in_stock": True})
+        result["books"].clear()
+        result["facets"]["category"]["Science"] = 0
+
+    books = book_models.book_search(None, "book", None, None, None)
+    assert len(books) == 3 and books[0]["title"] == "Book 0"
+    assert books[0]["authors"] == ["Author 0", "Author 1"]
+    result = book_models.faceted_book_search(None, "book", None, None, {"in_stock": True})
+    assert len(result["books"]) == result["total"] == 3
+    assert result["facets"]["category"] == {"Science": 3}
+
+
+def test_faceted_search_returns_books_and_counts_in_one_response(app, monkeypatch):
+    db = CountingDB(20)
+    for i, book in enumerate(db.books):
+        book["selling_price"] = 5 + i  # 5..24
+        book["quantity_stock"] = i % 2
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    monkeypatch.setattr(search_index, "get_db", lambda readonly=False: db)
+    client = app.test_client()
+
+    rv = client.get("/api/books/search?facets=1&price_min=10&price_max=19.5&in_stock=1&category=Science,Art")
+    body = rv.get_json()
+    assert rv.status_code == 200
+    assert sorted(b["selling_price"] for b in body["books"]) == [10, 12, 14, 16, 18]
+    assert body["total"] == 5
+    assert body["facets"]["category"] == {"Science": 5}
+    assert body["facets"]["price"] == {"0-10": 2, "10-25": 8, "25-50": 0, "50-100": 0, "100+": 0}
+
+    rv = client.get("/api/books/search?year_min=2001")
+    assert rv.get_json() == []
+    assert client.get("/api/books/search?price_min=cheap").status_code == 400
+    assert client.get("/api/books/search?price_max=inf").status_code == 400
+    assert client.get("/api/books/search?price_min=nan").status_code == 400
+
+
+def test_empty_result_skips_author_lookup(app, monkeypatch):
+    db = CountingDB(0)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+
+    assert book_models.get_books_page() == ([], None)
+    assert len(db.queries) == 1
+
+
+def test_get_books_page_returns_cursor_for_next_page(app, monkeypatch):
+    db = CountingDB(5)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+
+    books, next_cursor = book_models.get_books_page(limit=3, sort="price")
+
+    assert len(books) == 3
+    assert book_models.decode_cursor(next_cursor, "price") == (10, books[-1]["ISBN_number"])
+
+    book_models.get_books_page(limit=3, page_cursor=next_cursor, sort="price")
+    query, params = db.queries[-2]
+    assert "(B.selling_price, B.ISBN_number) > (%s, %s)" in query
+    assert "OFFSET" not in query
+    assert params == [10, books[-1]["ISBN_number"], 4]
+
+
+def test_get_books_page_projects_fields(app, monkeypatch):
+    db = CountingDB(3)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+
+    books, _ = book_models.get_books_page(fields=["title", "selling_price", "book_image"])
+
+    assert books[0] == {"title": "Book 0", "selling_price": 10, "book_image": "img.png"}
+    assert len(db.queries) == 1
+
+
+def test_get_books_page_rejects_bad_arguments(app, monkeypatch):
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: CountingDB(1))
+    with pytest.raises(ValueError):
+        book_models.get_books_page(sort="rating")
+    with pytest.raises(ValueError):
+        book_models.get_books_page(fields=["password"])
+    with pytest.raises(ValueError):
+        book_models.get_books_page(page_cursor="not-a-cursor")
+
+
+def test_catalog_listing_is_served_from_snapshot_with_etag(app, monkeypatch):
+    db = CountingDB(3)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    client = app.test_client()
+
+    rv = client.get("/api/books/?limit=2", headers={"Accept-Encoding": "gzip"})
+    assert rv.status_code == 200
+    assert rv.headers["Content-Encoding"] == "gzip"
+    etag = rv.headers["ETag"]
+    assert len(db.queries) == 2
+
+    rv = client.get("/api/books/?limit=2", headers={"If-None-Match": etag})
+    assert rv.status_code == 304
+    assert rv.data == b""
+
+    rv = client.get("/api/books/?limit=2")
+    assert rv.status_code == 200
+    assert "Content-Encoding" not in rv.headers
+    assert len(rv.get_json()["books"]) == 2
+    assert len(db.queries) == 2  # no rebuild while the catalog is unchanged
+
+    bump_catalog_version()
+    rv = client.get("/api/books/?limit=2", headers={"If-None-Match": rv.headers["ETag"]})
+    assert rv.status_code == 304  # rebuilt, but the content is identical
+    assert len(db.queries) == 4
+
+
+def test_streamed_listing_groups_authors_from_batched_cursor(app, monkeypatch):
+    db = CountingDB(25)
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: db)
+    app.config["STREAM_BATCH_SIZE"] = 7
+
+    rv = app.test_client().get("/api/books/?stream=1&fields=title,authors")
+
+    assert rv.status_code == 200
+    books = rv.get_json()
+    assert len(books) == 25
+    assert books[0] == {"title": "Book 0", "authors": ["Author 0", "Author 1"]}
+    assert len(db.queries) == 1
+    assert db.batches == 50 // 7 + 2
+
+
+def test_streamed_listing_rejects_bad_arguments_before_streaming(app, monkeypatch):
+    monkeypatch.setattr(book_models, "get_db", lambda readonly=False: CountingDB(1))
+    rv = app.test_client().get("/api/books/?stream=1&sort=rating")
+    assert rv.status_code == 400
+
+
+def test_bulk_import_validates_chunks_and_reports_rows(app):
+    app.config["IMPORT_CHUNK_SIZE"] = 2
+    header = "ISBN_number,title,publication_year,quantity_stock,category,selling_price,book_image,publisher_id,threshold,authors\n"
+    rows = [
+        "111,Good One,2001,5,Science,9.99,a.png,1,2,Ann;Bob\n",
+        "222,Bad Category,2001,5,Cooking,9.99,a.png,1,2,\n",
+        "333,Good Two,2002,5,Art,1.50,b.png,1,2,Cy\n",
+        "444,Unknown Publisher,2002,5,Art,1.50,b.png,999,2,\n",
+    ]
+    with app.app_context():
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("INSERT INTO publisher (publisher_id, name) VALUES (1, 'Pub')")
+        # 111 already exists: the import updates it and replaces its authors.
+        cursor.execute("""
+            INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                              threshold, selling_price, publisher_id, book_image)
+            VALUES ('111', 'Old Title', 1990, 1, 'Art', 0, 1.00, 1, 'old.png')
+        """)
+        cursor.execute("INSERT INTO author (ISBN_number, author_name) VALUES ('111', 'Old Author')")
+        db.commit()
+        token = generate_access_token("admin", "Admin")
+
+    rv = app.test_client().post(
+        "/api/books/import", data=header + "".join(rows), content_type="text/csv",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert rv.status_code == 200
+    report = rv.get_json()
+    assert report["processed"] == 4
+    assert report["imported"] == 2
+    assert [e["row"] for e in report["errors"]] == [2, 4]
+    assert "category" in report["errors"][0]["errors"][0]
+    assert "foreign key" in report["errors"][1]["errors"][0].lower()
+
+    with app.app_context():
+        cursor = get_db().cursor()
+        cursor.execute("SELECT ISBN_number, title, quantity_stock FROM book ORDER BY ISBN_number")
+        assert cursor.fetchall() == [("111", "Good One", 5), ("333", "Good Two", 5)]
+        cursor.execute("SELECT ISBN_number, author_name FROM author ORDER BY ISBN_number, author_name")
+        assert cursor.fetchall() == [("111", "Ann"), ("111", "Bob"), ("333", "Cy")]
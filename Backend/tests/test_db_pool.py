@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+from db.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect(**_):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool({}, connect=connect, **kwargs), opened
+
+
+def test_connections_are_reused():
+    pool, opened = make_pool(size=2, max_overflow=0)
+    for _ in range(5):
+        pool.connect().close()
+    assert len(opened) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 5
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+
+
+def test_overflow_connections_are_closed_on_return():
+    pool, opened = make_pool(size=1, max_overflow=1)
+    a = pool.connect()
+    b = pool.connect()
+    assert pool.stats()["overflow"] == 1
+    a.close()
+    b.close()
+    assert pool.stats()["open"] == 1
+    assert sum(c.closed for c in opened) == 1
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(size=1, max_overflow=0, timeout=0.05)
+    pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_released_connection():
+    pool, opened = make_pool(size=1, max_overflow=0, timeout=2)
+    held = pool.connect()
+    got = []
+
+    t = threading.Thread(target=lambda: got.append(pool.connect()))
+    t.start()
+    time.sleep(0.05)
+    held.close()
+    t.join()
+
+    assert got and got[0]._raw is opened[0]
+    assert pool.stats()["waits"] == 1
+
+
+def test_dead_connection_is_replaced_on_checkout():
+    pool, opened = make_pool(size=1, max_overflow=0)
+    pool.connect().close()
+    opened[0].alive = False
+    conn = pool.connect()
+    assert conn._raw is opened[1]
+    assert pool.stats()["invalidated"] == 1
+
+
+def test_old_connection_is_recycled():
+    pool, opened = make_pool(size=1, max_overflow=0, recycle=0)
+    pool.connect().close()
+    pool.connect()
+    assert len(opened) == 2
+    assert opened[0].closed
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool, opened = make_pool(size=1, max_overflow=0)
+    conn = pool.connect()
+    opened[0].in_transaction = True
+    conn.close()
+    conn.close()  # double close must not return it twice
+    assert opened[0].rollbacks == 1
+    assert pool.stats()["idle"] == 1
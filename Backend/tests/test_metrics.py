@@ -0,0 +1,134 @@
+import logging
+import time
+
+import pytest
+from flask import g, Response, stream_with_context
+from app import create_app
+from config import TestConfig
+from db.metrics import Metrics, InstrumentedConnection, normalize_sql, redact_params
+
+
+class FakeCursor:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+        if self.fail:
+            raise RuntimeError("boom")
+
+    def executemany(self, query, rows):
+        self.executed.append((query, rows))
+
+    def fetchall(self):
+        return []
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.closed = False
+
+    def cursor(self, **kwargs):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    app.config['TESTING'] = True
+    return app
+
+
+def test_normalize_sql_strips_values_and_collapses_lists():
+    assert normalize_sql("SELECT *  FROM book\n WHERE ISBN_number IN (%s, %s, %s) AND price > 10") == \
+        "SELECT * FROM book WHERE ISBN_number IN (...) AND price > ?"
+    assert normalize_sql("SELECT * FROM user WHERE username = 'alice'") == \
+        "SELECT * FROM user WHERE username = ?"
+    assert normalize_sql("INSERT INTO author VALUES (%s, %s), (%s, %s), (%s, %s)") == \
+        "INSERT INTO author VALUES (...), ..."
+    assert normalize_sql("SELECT * FROM t1 WHERE x = %s") == "SELECT * FROM t1 WHERE x = ?"
+
+
+def test_redact_params_keeps_only_types():
+    assert redact_params(("secret", 3)) == ["<str>", "<int>"]
+    assert redact_params({"password": "hunter2"}) == {"password": "<str>"}
+    assert redact_params([(1,), (2,)], many=True) == "<2 rows>"
+
+
+def test_instrumented_cursor_counts_and_times_per_request(app):
+    metrics = Metrics()
+    cursor = FakeCursor()
+    conn = InstrumentedConnection(FakeConnection(cursor), metrics)
+    with app.test_request_context():
+        c = conn.cursor(dictionary=True)
+        c.execute("SELECT * FROM book WHERE ISBN_number = %s", ("1",))
+        c.execute("SELECT * FROM book WHERE ISBN_number = %s", ("2",))
+        c.executemany("INSERT INTO author VALUES (%s, %s)", [("1", "a"), ("2", "b")])
+        c.execute("SELECT 1")
+        assert g.sql_queries == 4
+        assert cursor.executed[-1] == ("SELECT 1", None)
+        conn.close()
+    text = "\n".join(metrics.render())
+    assert 'sql_statement_duration_seconds_count{statement="SELECT * FROM book WHERE ISBN_number = ?"} 2' in text
+    assert "'1'" not in text
+
+
+def test_failed_and_slow_queries_are_recorded_without_values(app, caplog):
+    metrics = Metrics(slow_query_ms=0)
+    conn = InstrumentedConnection(FakeConnection(FakeCursor(fail=True)), metrics)
+    with app.app_context(), caplog.at_level(logging.WARNING, logger="db.slow_query"):
+        with pytest.raises(RuntimeError):
+            conn.cursor().execute("SELECT * FROM user WHERE password_hash = %s", ("hunter2",))
+    assert "hunter2" not in caplog.text
+    assert "<str>" in caplog.text
+    text = "\n".join(metrics.render())
+    assert 'sql_statement_errors_total{statement="SELECT * FROM user WHERE password_hash = ?"} 1' in text
+    assert "sql_slow_queries_total 1" in text
+
+
+def test_statement_labels_are_capped():
+    metrics = Metrics(max_statements=2)
+    for table in ("a", "b", "c", "d"):
+        metrics.observe_query(f"SELECT * FROM {table}", 0.001)
+    assert 'statement="other"' in "\n".join(metrics.render())
+
+
+def test_metrics_route_exposes_endpoint_latency(app):
+    client = app.test_client()
+    client.get("/health").close()  # requests are observed when the server closes them
+    client.get("/no-such-page").close()
+    rv = client.get("/metrics")
+    assert rv.status_code == 200
+    text = rv.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="/health",status="200"} 1' in text
+    assert 'endpoint="<unmatched>",status="404"' in text
+    assert "db_pool_in_use" in text
+    assert "password_hasher_queue_depth" in text
+
+
+def test_streamed_bodies_are_timed_until_the_last_chunk(app):
+    @app.route("/_stream")
+    def stream():
+        def chunks():
+            for _ in range(3):
+                time.sleep(0.02)
+                g.sql_queries = g.get("sql_queries", 0) + 1  # what InstrumentedCursor does
+                yield "x"
+        return Response(stream_with_context(chunks()))
+
+    metrics = app.extensions["metrics"]
+    rv = app.test_client().get("/_stream")
+    assert ("GET", "/_stream", "200") not in metrics._requests  # headers sent, body still running
+    assert rv.get_data() == b"xxx"
+    rv.close()
+    histogram = metrics._requests[("GET", "/_stream", "200")]
+    assert histogram.count == 1 and histogram.sum >= 0.06
+    assert metrics._request_queries[("GET", "/_stream")].sum == 3
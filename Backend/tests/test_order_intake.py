@@ -0,0 +1,194 @@
+import pytest
+from app import create_app
+from config import TestConfig
+from db.db_connection import get_db
+from users.intake import OrderJournal, IntakeWorker, apply_batch, apply_entries
+from auth.tokens import generate_access_token
+from config import *
+
+A = "9780000000001"
+B = "9780000000002"
+CARD = "4111111111111111"
+
+
+def seed():
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO publisher (publisher_id, name) VALUES (1, 'Pub')")
+    cursor.execute("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                          threshold, selling_price, publisher_id, book_image)
+        VALUES (%s, 'Scarce', 2020, 3, 'Science', 0, 10.00, 1, 'a.png'),
+               (%s, 'Plenty', 2020, 10, 'Art', 0, 2.50, 1, 'b.png')
+    """, (A, B))
+    cursor.execute("INSERT INTO credit_card VALUES (%s, '2030-01-01')", (CARD,))
+    cursor.execute("""
+        INSERT INTO user (username, role, email, password_hash, first_name, last_name)
+        VALUES ('buyer', 'Customer', 'buyer@example.com', 'x', 'Buy', 'Er')
+    """)
+    db.commit()
+
+
+def query(sql, params=()):
+    cursor = get_db().cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    get_db().commit()
+    return rows
+
+
+def stock(isbn):
+    return query("SELECT quantity_stock FROM book WHERE ISBN_number = %s", (isbn,))[0][0]
+
+
+class CountingConnection:
+    # The real connection, counting commits and row-lock statements.
+    def __init__(self, conn):
+        self._conn = conn
+        self.commits = 0
+        self.locks = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        self.commits += 1
+        self._conn.commit()
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        execute = cursor.execute
+
+        def counted(query, params=None):
+            self.locks += "FOR UPDATE" in query
+            return execute(query, params)
+        cursor.execute = counted
+        return cursor
+
+
+@pytest.fixture
+def db():
+    app = create_app(TestConfig)
+    with app.app_context():
+        seed()
+        yield get_db()
+
+
+def entry(ticket, lines, card=CARD):
+    return {"ticket": ticket, "username": "buyer", "credit_card_number": card, "lines": lines}
+
+
+def test_journal_survives_reopen_and_leases_claims(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    journal = OrderJournal(path, lease=60)
+    first = journal.append("buyer", "4111", {"A": 1})
+    second = journal.append("buyer", "4111", {"B": 2})
+    assert [e["ticket"] for e in journal.claim(10)] == [first, second]
+    assert journal.claim(10) == []  # still leased
+    journal.finish({first: ("placed", 7, None)})
+    journal.close()
+
+    # A restarted worker sees the finished ticket as done and, once the lease
+    # runs out, the one it never finished as claimable again.
+    journal = OrderJournal(path, lease=0)
+    assert journal.get(first)["status"] == "placed"
+    assert journal.get(first)["order_id"] == 7
+    assert [e["ticket"] for e in journal.claim(10)] == [second]
+    assert journal.stats()["processing"] == 1
+
+
+def test_a_ticket_that_keeps_failing_is_isolated_then_rejected(tmp_path):
+    journal = OrderJournal(str(tmp_path / "journal.sqlite3"), lease=-1, max_attempts=2)
+    tickets = [journal.append("buyer", "4111", {"A": 1}) for _ in range(3)]
+
+    # A database outage hands the attempt back, so the batch comes back whole.
+    journal.release([e["ticket"] for e in journal.claim(10)])
+    assert [e["ticket"] for e in journal.claim(10)] == tickets
+
+    # The worker died mid-batch: retry alone, so only the first ticket spends
+    # its attempts, then give up on it.
+    assert [e["ticket"] for e in journal.claim(10)] == tickets[:1]
+    assert journal.claim(10) == []
+    rejected = journal.get(tickets[0])
+    assert rejected["status"] == "rejected"
+    assert rejected["errors"]["errors"]["order"] == "Failed 2 times, please try again"
+    assert [e["ticket"] for e in journal.claim(10)] == tickets[1:2]
+    assert journal.stats()["rejected"] == 1
+
+
+def test_batch_is_one_commit_and_rejects_only_short_orders(db):
+    counted = CountingConnection(db)
+    results = apply_batch(counted, [
+        entry("t1", {A: 2}),
+        entry("t2", {A: 2, B: 1}),  # only 1 A left after t1
+        entry("t3", {B: 5}),
+        entry("t4", {"missing": 1}),
+    ])
+    assert (counted.commits, counted.locks) == (1, 1)
+    assert results["t1"][0] == "placed" and results["t3"][0] == "placed"
+    assert results["t2"][0] == "rejected" and A in results["t2"][2]["errors"]
+    assert results["t4"][2]["msg"] == "Unknown books in cart"
+    assert sorted(query("SELECT ticket, order_id FROM order_intake")) == \
+        [("t1", results["t1"][1]), ("t3", results["t3"][1])]
+    assert (stock(A), stock(B)) == (1, 5)
+    assert query("SELECT cost FROM customer_order WHERE order_id = %s", (results["t1"][1],))[0][0] == 20
+
+
+def test_replay_after_crash_places_each_ticket_once(db):
+    first = apply_batch(db, [entry("t1", {A: 1})])
+    # The worker died before recording the outcome; the ticket comes back.
+    again = apply_batch(db, [entry("t1", {A: 1}), entry("t2", {A: 1})])
+    assert again["t1"] == first["t1"]
+    assert query("SELECT COUNT(*) FROM customer_order")[0][0] == 2
+    assert stock(A) == 1
+
+
+def test_invalid_order_falls_back_to_row_by_row(db):
+    results = apply_entries(db, [entry("t1", {B: 1}), entry("t2", {B: 1}, card="bad"),
+                                 entry("t3", {B: 1})])
+    assert results["t1"][0] == results["t3"][0] == "placed"
+    assert results["t2"][0] == "rejected"
+    assert sorted(t for t, in query("SELECT ticket FROM order_intake")) == ["t1", "t3"]
+    assert stock(B) == 8
+
+
+@pytest.fixture
+def app(tmp_path):
+    class JournalConfig(TestConfig):
+        ORDER_INTAKE_MODE = "journal"
+        ORDER_JOURNAL_PATH = str(tmp_path / "journal.sqlite3")
+        ORDER_INTAKE_START_WORKER = False
+    app = create_app(JournalConfig)
+    app.config['TESTING'] = True
+    return app
+
+
+def test_journal_mode_answers_202_and_worker_drains(app):
+    with app.app_context():
+        seed()
+        token = generate_access_token("buyer", "Customer")
+        other = generate_access_token("someone", "Customer")
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    rv = client.post("/api/users/orders", headers=headers, json={
+        "credit_card_number": CARD,
+        "books": [{"ISBN_number": A, "quantity": 2}],
+    })
+    assert rv.status_code == HTTP_202_ACCEPTED
+    ticket = rv.get_json()["ticket"]
+    assert client.get(f"/api/users/orders/intake/{ticket}", headers=headers).get_json()["status"] == "queued"
+    assert client.get(f"/api/users/orders/intake/{ticket}",
+                      headers={"Authorization": f"Bearer {other}"}).status_code == HTTP_404_NOT_FOUND
+
+    rv = client.post("/api/users/orders", headers=headers, json={
+        "credit_card_number": CARD, "books": [{"ISBN_number": "x", "quantity": 0}]})
+    assert rv.status_code == HTTP_400_BAD_REQUEST
+
+    worker = app.extensions["order_intake"]
+    assert worker.drain_once() == 1
+    status = client.get(f"/api/users/orders/intake/{ticket}", headers=headers).get_json()
+    assert status["status"] == "placed"
+    with app.app_context():
+        assert query("SELECT order_id FROM customer_order WHERE username = 'buyer'") == [(status["order_id"],)]
+        assert stock(A) == 1
@@ -0,0 +1,275 @@
+import os
+import threading
+
+import pytest
+from app import create_app
+from config import TestConfig, BenchConfig
+from db.db_connection import get_db
+from books.models import faceted_book_search
+from books.search_index import get_search_index, refresh_stock
+from users.models import create_customer_order, InsufficientStockError, OrderError
+from config import *
+
+ISBN = "9780000000001"
+OTHER_ISBN = "9780000000002"
+CARD = "4111111111111111"
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def seed_db(app):
+    with app.app_context():
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("INSERT INTO publisher (publisher_id, name) VALUES (1, 'Pub')")
+        cursor.execute("""
+            INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                              threshold, selling_price, publisher_id, book_image)
+            VALUES (%s, 'Scarce', 2020, 5, 'Science', 0, 10.00, 1, 'a.png'),
+                   (%s, 'Plenty', 2020, 100, 'Art', 0, 2.50, 1, 'b.png')
+        """, (ISBN, OTHER_ISBN))
+        cursor.execute("INSERT INTO credit_card VALUES (%s, '2030-01-01')", (CARD,))
+        cursor.execute("""
+            INSERT INTO user (username, role, email, password_hash, first_name, last_name)
+            VALUES ('buyer', 'Customer', 'buyer@example.com', 'x', 'Buy', 'Er')
+        """)
+        db.commit()
+
+
+def stock_of(app, isbn):
+    with app.app_context():
+        cursor = get_db().cursor()
+        cursor.execute("SELECT quantity_stock FROM book WHERE ISBN_number = %s", (isbn,))
+        return cursor.fetchone()[0]
+
+
+def test_order_prices_lines_and_merges_duplicates(app):
+    with app.app_context():
+        order_id = create_customer_order("buyer", CARD, [
+            {"ISBN_number": ISBN, "quantity": 1},
+            {"ISBN_number": OTHER_ISBN, "quantity": 2},
+            {"ISBN_number": ISBN, "quantity": 1},
+        ])
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute("SELECT cost FROM customer_order WHERE order_id = %s", (order_id,))
+        assert float(cursor.fetchone()["cost"]) == 25.0
+        cursor.execute("SELECT COUNT(*) AS n FROM book_order WHERE order_id = %s", (order_id,))
+        assert cursor.fetchone()["n"] == 2
+    assert stock_of(app, ISBN) == 3
+
+
+def test_oversell_is_rejected_per_isbn_without_side_effects(app):
+    with app.app_context():
+        with pytest.raises(InsufficientStockError) as exc:
+            create_customer_order("buyer", CARD, [
+                {"ISBN_number": ISBN, "quantity": 6},
+                {"ISBN_number": OTHER_ISBN, "quantity": 1},
+            ])
+        assert list(exc.value.errors) == [ISBN]
+
+        with pytest.raises(OrderError) as exc:
+            create_customer_order("buyer", CARD, [{"ISBN_number": "missing", "quantity": 1}])
+        assert exc.value.errors == {"missing": "Book not found"}
+
+        cursor = get_db().cursor()
+        cursor.execute("SELECT COUNT(*) FROM customer_order")
+        assert cursor.fetchone()[0] == 0
+    assert stock_of(app, OTHER_ISBN) == 100
+
+
+@pytest.mark.parametrize("isbn", [["978"], {"a": 1}, 9780000000001])
+def test_cart_line_isbn_must_be_a_string(app, isbn):
+    from auth.tokens import generate_access_token
+    with app.app_context():
+        with pytest.raises(OrderError, match="ISBN_number must be a string"):
+            create_customer_order("buyer", CARD, [{"ISBN_number": isbn, "quantity": 1}])
+        token = generate_access_token("buyer", "Customer")
+    rv = app.test_client().post("/api/users/orders", headers={"Authorization": f"Bearer {token}"}, json={
+        "credit_card_number": CARD, "books": [{"ISBN_number": isbn, "quantity": 1}]})
+    assert rv.status_code == HTTP_400_BAD_REQUEST
+
+
+def test_a_sale_refreshes_the_search_index_stock(app):
+    with app.app_context():
+        db = get_db()
+        db.cursor().execute("INSERT INTO author VALUES (%s, 'Someone'), (%s, 'Someone')", (ISBN, OTHER_ISBN))
+        db.commit()
+        assert get_search_index().facet_search(author="someone", in_stock=True)[0] == [OTHER_ISBN, ISBN]
+
+        create_customer_order("buyer", CARD, [{"ISBN_number": ISBN, "quantity": 5}])
+        result = faceted_book_search(None, None, "someone", None, {"in_stock": True})
+        assert [b["ISBN_number"] for b in result["books"]] == [OTHER_ISBN]
+        assert result["total"] == sum(result["facets"]["category"].values()) == 1
+
+        db.cursor().execute("UPDATE book SET quantity_stock = 4 WHERE ISBN_number = %s", (ISBN,))
+        db.commit()
+        refresh_stock([ISBN])
+        assert get_search_index().facet_search(author="someone", in_stock=True)[0] == [OTHER_ISBN, ISBN]
+
+
+def race_checkouts(app, isbn, card, username, n=20):
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(n)
+
+    def checkout():
+        with app.app_context():
+            start.wait()
+            try:
+                create_customer_order(username, card, [{"ISBN_number": isbn, "quantity": 1}])
+                outcome = "ok"
+            except InsufficientStockError:
+                outcome = "sold_out"
+        with lock:
+            results.append(outcome)
+
+    threads = [threading.Thread(target=checkout) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_parallel_checkouts_keep_the_books(app):
+    # SQLite runs these one transaction at a time, so this only checks the
+    # stock bookkeeping; the locking itself is raced by the MySQL test below.
+    results = race_checkouts(app, ISBN, CARD, "buyer")
+    assert results.count("ok") == 5
+    assert results.count("sold_out") == 15
+    assert stock_of(app, ISBN) == 0
+
+
+RACE_ISBN = "9789990000001"
+RACE_CARD = "4000000000009999"
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_ORDERS_MYSQL"),
+                    reason="set TEST_ORDERS_MYSQL=1 to race checkouts on the bench DB")
+def test_parallel_checkouts_never_oversell_on_mysql():
+    mysql_app = create_app(BenchConfig)
+
+    def run(*statements):
+        with mysql_app.app_context():
+            db = get_db()
+            cursor = db.cursor()
+            for statement, params in statements:
+                cursor.execute(statement, params)
+            db.commit()
+
+    cleanup = (
+        ("DELETE BO FROM book_order AS BO JOIN customer_order AS CO ON (CO.order_id = BO.order_id) "
+         "WHERE CO.username = 'race_buyer'", ()),
+        ("DELETE FROM customer_order WHERE username = 'race_buyer'", ()),
+        ("DELETE FROM book WHERE ISBN_number = %s", (RACE_ISBN,)),
+        ("DELETE FROM publisher WHERE publisher_id = 9901", ()),
+        ("DELETE FROM credit_card WHERE credit_card_number = %s", (RACE_CARD,)),
+        ("DELETE FROM user WHERE username = 'race_buyer'", ()),
+    )
+    run(*cleanup)
+    run(("INSERT INTO publisher (publisher_id, name) VALUES (9901, 'Race Pub')", ()),
+        ("""INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                              threshold, selling_price, publisher_id, book_image)
+            VALUES (%s, 'Race', 2020, 5, 'Science', 0, 10.00, 9901, 'r.png')""", (RACE_ISBN,)),
+        ("INSERT INTO credit_card VALUES (%s, '2030-01-01')", (RACE_CARD,)),
+        ("""INSERT INTO user (username, role, email, password_hash, first_name, last_name)
+            VALUES ('race_buyer', 'Customer', 'race@example.com', 'x', 'Race', 'Buyer')""", ()))
+    try:
+        results = race_checkouts(mysql_app, RACE_ISBN, RACE_CARD, "race_buyer")
+        assert results.count("ok") == 5
+        assert results.count("sold_out") == 15
+        assert stock_of(mysql_app, RACE_ISBN) == 0
+    finally:
+        run(*cleanup)
+
+
+def test_order_route_reports_stock_conflicts(app):
+    from auth.tokens import generate_access_token
+    with app.app_context():
+        token = generate_access_token("buyer", "Customer")
+    client = app.test_client()
+    rv = client.post("/api/users/orders", headers={"Authorization": f"Bearer {token}"}, json={
+        "credit_card_number": CARD,
+        "books": [{"ISBN_number": ISBN, "quantity": 50}],
+    })
+    assert rv.status_code == HTTP_409_CONFLICT
+    assert ISBN in rv.get_json()["errors"]
+
+
+def place_orders(app, order_dates, lines=True):
+    with app.app_context():
+        db = get_db()
+        cursor = db.cursor()
+        order_ids = []
+        for order_date in order_dates:
+            cursor.execute("INSERT INTO customer_order (credit_card_number, username, order_date, cost) "
+                           "VALUES (%s, 'buyer', %s, 2.50)", (CARD, order_date))
+            order_ids.append(cursor.lastrowid)
+            if lines:
+                cursor.execute("INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) "
+                               "VALUES (%s, %s, 1, 2.50)", (order_ids[-1], OTHER_ISBN))
+        # Someone else's order never shows up.
+        cursor.execute("INSERT INTO customer_order (order_date, cost) VALUES ('2025-05-02 10:00:00', 1)")
+        db.commit()
+        return order_ids
+
+
+def orders_page(app, query=""):
+    from auth.tokens import generate_access_token
+    with app.app_context():
+        token = generate_access_token("buyer", "Customer")
+    return app.test_client().get(f"/api/users/orders{query}", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_order_history_pages_across_date_ties(app):
+    first, second, third, fourth, fifth = place_orders(app, [
+        "2025-05-01 09:00:00", "2025-05-02 10:00:00", "2025-05-02 10:00:00",
+        "2025-05-02 10:00:00", "2025-05-01 09:00:00",
+    ])
+    seen, query = [], "?limit=2"
+    while True:
+        rv = orders_page(app, query)
+        assert rv.status_code == 200
+        body = rv.get_json()
+        assert len(body["orders"]) <= 2
+        seen.extend(body["orders"])
+        if body["next_cursor"] is None:
+            break
+        query = f"?limit=2&cursor={body['next_cursor']}"
+
+    # Newest day first; order_id breaks the tie, so no order repeats or goes missing.
+    assert [o["order_id"] for o in seen] == [fourth, third, second, fifth, first]
+    item, = seen[0]["items"]
+    assert (item["ISBN_number"], item["title"], item["quantity"], float(item["unit_price"])) == \
+        (OTHER_ISBN, "Plenty", 1, 2.5)
+
+
+def test_order_history_summary_leaves_out_the_lines(app):
+    order_id, = place_orders(app, ["2025-05-01 09:00:00"])
+    body = orders_page(app, "?summary=1").get_json()
+    assert [o["order_id"] for o in body["orders"]] == [order_id]
+    assert "items" not in body["orders"][0]
+    assert body["next_cursor"] is None
+
+
+def test_order_history_clamps_the_page_size(app):
+    place_orders(app, [f"2025-05-01 09:{i // 60:02d}:{i % 60:02d}" for i in range(105)], lines=False)
+    body = orders_page(app, "?summary=1").get_json()
+    assert len(body["orders"]) == 20 and body["next_cursor"]
+    body = orders_page(app, "?summary=1&limit=1000").get_json()
+    assert len(body["orders"]) == 100 and body["next_cursor"]
+    assert len(orders_page(app, "?summary=1&limit=0").get_json()["orders"]) == 1
+    assert len(orders_page(app, "?summary=1&limit=-5").get_json()["orders"]) == 1
+
+
+@pytest.mark.parametrize("page_cursor", ["garbage", "WzFd", "IngiCg==", "%C3%A9"])
+def test_order_history_rejects_a_bad_cursor(app, page_cursor):
+    rv = orders_page(app, f"?cursor={page_cursor}")
+    assert rv.status_code == HTTP_400_BAD_REQUEST
+    assert rv.get_json()["msg"] == "Invalid cursor"
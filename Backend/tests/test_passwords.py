@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+from app import create_app
+from config import TestConfig
+from auth.passwords import PasswordHasher, HasherBusyError
+from config import *
+
+
+def test_hash_and_check_round_trip():
+    hasher = PasswordHasher(workers=1, rounds=4)
+    hashed = hasher.hash_password("secret")
+    assert hasher.check_password("secret", hashed)
+    assert not hasher.check_password("wrong", hashed)
+    stats = hasher.stats()
+    assert stats["hash_count"] == 1
+    assert stats["check_count"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_async_methods_share_the_pool_and_limits():
+    hasher = PasswordHasher(workers=2, max_queue=0, rounds=4)
+
+    async def run():
+        hashed = await hasher.hash_password_async("secret")
+        return await asyncio.gather(hasher.check_password_async("secret", hashed),
+                                    hasher.check_password_async("wrong", hashed))
+
+    assert asyncio.run(run()) == [True, False]
+    stats = hasher.stats()
+    assert stats["check_count"] == 2
+    assert stats["queue_depth"] == 0
+
+
+def test_saturated_hasher_rejects_instead_of_queueing():
+    hasher = PasswordHasher(workers=1, max_queue=0, rounds=10)
+    hashed = hasher.hash_password("secret")
+    rejected = []
+
+    def login():
+        try:
+            hasher.check_password("secret", hashed)
+        except HasherBusyError:
+            rejected.append(True)
+
+    threads = [threading.Thread(target=login) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert rejected
+    assert hasher.stats()["rejected"] == len(rejected)
+
+
+def test_busy_hasher_maps_to_503_with_retry_after(monkeypatch):
+    app = create_app(TestConfig)
+    hasher = app.extensions["password_hasher"]
+
+    def busy(*args):
+        raise HasherBusyError("full")
+
+    monkeypatch.setattr(hasher, "hash_password", busy)
+    rv = app.test_client().post("/api/users/register", json={
+        "username": "alice", "password": "1234", "email": "alice@example.com", "name": "Alice Smith",
+    })
+    assert rv.status_code == HTTP_503_UNAVAILABLE
+    assert rv.headers["Retry-After"] == "1"
@@ -0,0 +1,145 @@
+import marshal
+import pstats
+import time
+
+import pytest
+from flask import g, jsonify
+from app import create_app
+from config import *
+from auth.tokens import generate_access_token
+from db.db_connection import get_db
+from db.metrics import InstrumentedConnection
+
+
+def busy_python(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+@pytest.fixture
+def app():
+    class ProfilerConfig(TestConfig):
+        METRICS_ENABLED = False
+    app = create_app(ProfilerConfig)
+    app.config["TESTING"] = True
+
+    @app.route("/_work", endpoint="work")
+    def work():
+        busy_python(0.02)
+        g.sql_time = g.get("sql_time", 0.0) + 0.005  # what InstrumentedCursor adds per statement
+        g.sql_queries = g.get("sql_queries", 0) + 1
+        return jsonify([{"isbn": str(i), "title": "x" * 20} for i in range(2000)])
+
+    @app.route("/_query", endpoint="query")
+    def query():
+        cursor = get_db().cursor()
+        cursor.execute("SELECT COUNT(*) FROM book")
+        return {"books": cursor.fetchone()[0], "instrumented": isinstance(get_db(), InstrumentedConnection)}
+
+    @app.route("/_other", endpoint="other")
+    def other():
+        return {"ok": True}
+
+    return app
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return {"Authorization": f"Bearer {generate_access_token('root', 'Admin')}"}
+
+
+def test_only_admins_can_arm(app):
+    with app.app_context():
+        customer = {"Authorization": f"Bearer {generate_access_token('buyer', 'Customer')}"}
+    rv = app.test_client().post("/api/admin/profiler", json={"endpoint": "work"}, headers=customer)
+    assert rv.status_code == HTTP_403_ADMIN_REQ
+    assert not app.extensions["profiler"].armed
+
+
+def test_arm_rejects_unknown_endpoints(app, admin):
+    client = app.test_client()
+    assert client.post("/api/admin/profiler", json={"endpoint": "nope"}, headers=admin).status_code == 400
+    assert client.post("/api/admin/profiler", json={"endpoint": "work", "sample": 0},
+                       headers=admin).status_code == 400
+
+
+def test_profiles_the_next_n_requests_with_a_time_breakdown(app, admin):
+    client = app.test_client()
+    rv = client.post("/api/admin/profiler", json={"endpoint": "work", "requests": 2}, headers=admin)
+    assert rv.status_code == HTTP_201_CREATED
+    session_id = rv.get_json()["id"]
+
+    for _ in range(3):
+        assert client.get("/_work").status_code == 200
+    client.get("/_other")
+
+    summary = client.get(f"/api/admin/profiler/{session_id}", headers=admin).get_json()
+    assert summary["profiled"] == 2 and summary["active"] is False
+    assert not app.extensions["profiler"].armed  # disarmed itself, the third request ran unprofiled
+    average = summary["average"]
+    assert average["sql_ms"] == pytest.approx(5, abs=0.01)
+    assert average["python_ms"] >= 15  # the fake SQL time is carved out of the busy loop
+    assert average["serialization_ms"] > 0
+    assert average["total_ms"] == pytest.approx(
+        average["python_ms"] + average["sql_ms"] + average["serialization_ms"], abs=0.01)
+    assert any("busy_python" in f["function"] for f in summary["top_functions"])
+
+    rv = client.get(f"/api/admin/profiler/{session_id}/pstats", headers=admin)
+    assert rv.status_code == 200
+    stats = marshal.loads(rv.data)
+    assert any(name == "busy_python" for _, _, name in stats)
+
+    rv = client.get(f"/api/admin/profiler/{session_id}/collapsed", headers=admin)
+    lines = rv.get_data(as_text=True).splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("test_profiler:busy_python" in line for line in lines)
+
+    assert client.delete(f"/api/admin/profiler/{session_id}", headers=admin).status_code == 200
+    assert client.get(f"/api/admin/profiler/{session_id}", headers=admin).status_code == 404
+
+
+def test_sql_is_timed_with_metrics_off(app, admin):
+    client = app.test_client()
+    assert client.get("/_query").get_json()["instrumented"] is False  # unprofiled requests pay nothing
+    session_id = client.post("/api/admin/profiler", json={"endpoint": "query", "requests": 1},
+                             headers=admin).get_json()["id"]
+    assert client.get("/_query").get_json()["instrumented"] is True
+    summary = client.get(f"/api/admin/profiler/{session_id}", headers=admin).get_json()
+    assert summary["sql_queries"] == 1
+    assert summary["average"]["sql_ms"] > 0
+
+
+def test_pstats_download_opens_with_pstats(app, admin, tmp_path):
+    client = app.test_client()
+    session_id = client.post("/api/admin/profiler", json={"endpoint": "work", "requests": 1, "mode": "cprofile"},
+                             headers=admin).get_json()["id"]
+    client.get("/_work")
+    path = tmp_path / "work.prof"
+    path.write_bytes(client.get(f"/api/admin/profiler/{session_id}/pstats", headers=admin).data)
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert client.get(f"/api/admin/profiler/{session_id}/collapsed", headers=admin).data == b""
+
+
+def test_sampled_sessions_skip_requests(app, admin, monkeypatch):
+    import profiler.models as models
+    rolls = iter([0.9, 0.1, 0.9, 0.1])
+    monkeypatch.setattr(models.random, "random", lambda: next(rolls))
+    client = app.test_client()
+    session_id = client.post("/api/admin/profiler", json={"endpoint": "other", "requests": 5, "sample": 50},
+                             headers=admin).get_json()["id"]
+    for _ in range(4):
+        client.get("/_other")
+    assert client.get(f"/api/admin/profiler/{session_id}", headers=admin).get_json()["profiled"] == 2
+
+
+def test_idle_profiler_costs_nothing_measurable(app):
+    hook = app.before_request_funcs[None][[f.__name__ for f in app.before_request_funcs[None]].index("start_profile")]
+    with app.test_request_context("/_other"):
+        n = 20000
+        started = time.perf_counter()
+        for _ in range(n):
+            hook()
+        per_call = (time.perf_counter() - started) / n
+    assert per_call < 2e-6
@@ -0,0 +1,151 @@
+import datetime
+import os
+import random
+
+import pytest
+from app import create_app
+from config import TestConfig, BenchConfig
+from db.db_connection import get_db
+from db.plans import explain, full_scans
+import books.models as book_models
+import users.models as user_models
+import reports.models as report_models
+
+CATEGORIES = ("Science", "Art", "Religion", "History", "Geography")
+
+
+def isbn_for(i):
+    return f"978{i:010d}"
+
+
+def card_for(i):
+    return f"4{i:015d}"
+
+
+def seed(db, books=400, publishers=20, users=50, orders=600, seed=7):
+    rng = random.Random(seed)
+    cursor = db.cursor()
+    cursor.executemany("INSERT INTO publisher (publisher_id, name) VALUES (%s, %s)",
+                       [(i, f"Publisher {i}") for i in range(1, publishers + 1)])
+    cursor.executemany("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category, threshold,
+                          selling_price, publisher_id, book_image)
+        VALUES (%s, %s, %s, 1000, %s, 10, %s, %s, 'x.png')
+    """, [(isbn_for(i), f"Title {rng.randrange(10 ** 6)}", rng.randint(1950, 2025), rng.choice(CATEGORIES),
+           rng.randint(300, 9900) / 100, rng.randint(1, publishers)) for i in range(books)])
+    cursor.executemany("INSERT INTO author (ISBN_number, author_name) VALUES (%s, %s)",
+                       [(isbn_for(i), f"Author {i % 97}") for i in range(books)])
+    cursor.executemany("""
+        INSERT INTO user (username, role, email, password_hash, first_name, last_name)
+        VALUES (%s, 'Customer', %s, 'x', 'First', 'Last')
+    """, [(f"user{i}", f"user{i}@example.com") for i in range(users)])
+    cursor.executemany("INSERT INTO credit_card VALUES (%s, '2035-01-01')", [(card_for(i),) for i in range(users)])
+    now = datetime.datetime(2025, 6, 1)
+    cursor.executemany("""
+        INSERT INTO customer_order (order_id, order_date, cost, credit_card_number, username)
+        VALUES (%s, %s, 10, %s, %s)
+    """, [(order_id, now - datetime.timedelta(hours=rng.randint(0, 24 * 180)), card_for(user), f"user{user}")
+          for order_id, user in ((i, rng.randrange(users)) for i in range(1, orders + 1))])
+    cursor.executemany("INSERT INTO book_order (ISBN_number, order_id, item_quantity, unit_price) VALUES (%s, %s, 1, 10)",
+                       [(isbn_for(rng.randrange(books)), order_id) for order_id in range(1, orders + 1)])
+    db.commit()
+
+
+class RecordingCursor:
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, query, params=None):
+        self._statements.append((query, tuple(params or ())))
+        return self._cursor.execute(query, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class RecordingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self.statements = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self._conn.cursor(*args, **kwargs), self.statements)
+
+
+def run_hot_paths():
+    """Every read the API serves per request, plus checkout."""
+    for sort in book_models.SORT_COLUMNS:
+        _, cursor = book_models.get_books_page(limit=20, sort=sort)
+        book_models.get_books_page(limit=20, page_cursor=cursor, sort=sort, order="asc")
+    book_models.get_books_by_isbn([isbn_for(1), isbn_for(2)])
+    book_models.book_search_sql(None, None, "Art", None, None)
+    book_models.book_search_sql(isbn_for(3), None, None, None, None)
+    user_models.get_user_by_username("user1")
+    _, cursor = user_models.get_customer_orders_page("user1", limit=2)
+    user_models.get_customer_orders_page("user1", limit=2, page_cursor=cursor)
+    list(user_models.iter_customer_orders("user1"))
+    user_models.create_customer_order("user1", card_for(1), [{"ISBN_number": isbn_for(5), "quantity": 1}])
+
+
+def hot_statements(monkeypatch):
+    recorder = RecordingConnection(get_db())
+    for module in (book_models, user_models):
+        monkeypatch.setattr(module, "get_db", lambda readonly=False: recorder)
+    run_hot_paths()
+    since = datetime.date(2025, 5, 25)  # a week of orders, as `reports rebuild --since` reads them
+    statements = recorder.statements + [
+        (report_models.RAW_DAILY_SALES, (since,)),
+        (report_models.RAW_DAILY_CUSTOMER_SALES, (since,)),
+        (report_models.RAW_DAILY_BOOK_SALES, (since,)),
+    ]
+    return [(q, p) for q, p in statements if q.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))]
+
+
+def assert_no_full_scans(db, statements, dialect):
+    regressions = []
+    for query, params in statements:
+        plan = explain(db, query, params, dialect)
+        if full_scans(query, plan, dialect):
+            regressions.append(" ".join(query.split()) + "\n    " + "\n    ".join(plan))
+    assert not regressions, "Full scans in hot queries:\n" + "\n".join(regressions)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        seed(get_db())
+        yield app
+
+
+def test_hot_queries_use_indexes(app, monkeypatch):
+    statements = hot_statements(monkeypatch)
+    assert len(statements) >= 15
+    assert_no_full_scans(get_db(), statements, "sqlite")
+
+
+def test_harness_catches_non_sargable_predicates(app):
+    db = get_db()
+    day = datetime.date(2025, 5, 30)
+    wrapped = "SELECT SUM(cost) FROM customer_order WHERE DATE(order_date) = %s"
+    assert full_scans(wrapped, explain(db, wrapped, (day,), "sqlite"), "sqlite") == ["customer_order"]
+    ranged = "SELECT SUM(cost) FROM customer_order WHERE order_date >= %s AND order_date < %s"
+    plan = explain(db, ranged, (day, day + datetime.timedelta(days=1)), "sqlite")
+    assert full_scans(ranged, plan, "sqlite") == []
+    assert any("idx_customer_order_date" in step for step in plan)
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_EXPLAIN_MYSQL"),
+                    reason="set TEST_EXPLAIN_MYSQL=1 after `python -m benchmarks.seed` and `db migrate` on the bench DB")
+def test_hot_queries_use_indexes_on_mysql(app, monkeypatch):
+    statements = hot_statements(monkeypatch)
+    mysql_app = create_app(BenchConfig)
+    with mysql_app.app_context():
+        assert_no_full_scans(get_db(), statements, "mysql")
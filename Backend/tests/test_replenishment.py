@@ -0,0 +1,251 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+import pytest
+from app import create_app
+from config import TestConfig, BenchConfig
+from db.db_connection import get_db
+from books.search_index import get_search_index
+import replenishment.models as replenishment
+from replenishment.models import order_quantity, run_replenishment, confirm_batches, RUN_LOCK
+
+NOW = datetime.datetime(2025, 6, 1, 12, 0)
+BOOKS = (
+    # ISBN, publisher, stock, threshold
+    ("9780000000101", 901, 2, 10),
+    ("9780000000102", 901, 5, 10),
+    ("9780000000103", 902, 0, 5),
+    ("9780000000104", 902, 1, 5),
+    ("9780000000105", 902, 100, 5),
+)
+A, B, C, D, E = (isbn for isbn, *_ in BOOKS)
+
+
+def seed(db):
+    cursor = db.cursor()
+    cursor.executemany("INSERT INTO publisher (publisher_id, name) VALUES (%s, %s)",
+                       [(901, "Restock One"), (902, "Restock Two")])
+    cursor.executemany("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                          threshold, selling_price, publisher_id, book_image)
+        VALUES (%s, 'Restock', 2020, %s, 'Science', %s, 10.00, %s, 'r.png')
+    """, [(isbn, stock + (56 if isbn == A else 0), threshold, publisher) for isbn, publisher, stock, threshold in BOOKS])
+    # 56 of A sold in the last 28 days (the purchase trigger takes them off stock).
+    cursor.execute("INSERT INTO customer_order (order_date, cost) VALUES (%s, 560)", (NOW - datetime.timedelta(days=3),))
+    cursor.execute("INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) VALUES (%s, %s, 56, 10)",
+                   (cursor.lastrowid, A))
+    # D already has 50 on order outside any batch; publisher 902 has an open batch.
+    cursor.execute("INSERT INTO publisher_order (cost, status, quantity, ISBN_number) VALUES (500, 'Pending', 50, %s)",
+                   (D,))
+    cursor.execute("INSERT INTO publisher_order_batch (publisher_id, total_cost) VALUES (902, 0)")
+    db.commit()
+    return cursor.lastrowid
+
+
+def cleanup(db):
+    # Only needed on MySQL; the SQLite suite rolls every test back.
+    cursor = db.cursor()
+    isbns = [isbn for isbn, *_ in BOOKS]
+    placeholders = ", ".join(["%s"] * len(isbns))
+    cursor.execute(f"DELETE FROM publisher_order WHERE ISBN_number IN ({placeholders})", isbns)
+    cursor.execute("DELETE FROM publisher_order_batch WHERE publisher_id IN (901, 902)")
+    cursor.execute(f"DELETE FROM book_order WHERE ISBN_number IN ({placeholders})", isbns)
+    cursor.execute("DELETE FROM customer_order WHERE username IS NULL AND cost = 560")
+    cursor.execute(f"DELETE FROM book WHERE ISBN_number IN ({placeholders})", isbns)
+    cursor.execute("DELETE FROM publisher WHERE publisher_id IN (901, 902)")
+    db.commit()
+
+
+def query(sql, params=()):
+    cursor = get_db().cursor(dictionary=True)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    get_db().commit()
+    return rows
+
+
+def stock(isbn):
+    return query("SELECT quantity_stock FROM book WHERE ISBN_number = %s", (isbn,))[0]["quantity_stock"]
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        app.open_batch = seed(get_db())
+        yield app
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def any_app(request):
+    # The locking test on both backends: SQLite serializes whole transactions,
+    # MySQL relies on the row locks this test is about.
+    if request.param == "mysql":
+        if not os.environ.get("TEST_REPLENISHMENT_MYSQL"):
+            pytest.skip("set TEST_REPLENISHMENT_MYSQL=1 with Database/replenishment.sql applied to the bench DB")
+        app = create_app(BenchConfig)
+    else:
+        app = create_app(TestConfig)
+    with app.app_context():
+        app.open_batch = seed(get_db())
+    try:
+        yield app
+    finally:
+        if request.param == "mysql":
+            with app.app_context():
+                cleanup(get_db())
+
+
+def in_thread(app, fn, *args):
+    result = {}
+
+    def run():
+        with app.app_context():
+            try:
+                result["value"] = fn(*args)
+            except Exception as e:
+                result["error"] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def test_order_quantity_follows_velocity():
+    # 56 sold in 28 days is 2/day; 30 days of cover above a threshold of 10.
+    assert order_quantity(4, 10, 56, 0, 28, 30, 50, 1000) == 66
+    assert order_quantity(4, 10, 0, 0, 28, 30, 50, 1000) == 50  # slow seller still gets the minimum
+    assert order_quantity(4, 10, 56, 70, 28, 30, 50, 1000) == 0  # already on order
+    assert order_quantity(0, 10, 28000, 0, 28, 30, 50, 1000) == 1000
+
+
+def test_run_coalesces_orders_per_publisher(app):
+    result = run_replenishment(now=NOW)
+    batches = [(b["publisher_id"], b["orders"]) for b in result["batches"]]
+    assert batches == [(901, 2), (902, 1)]
+    assert result["batches"][1]["batch_id"] == app.open_batch  # joined the open batch
+
+    orders = query("""
+        SELECT PO.ISBN_number, PO.quantity, PB.publisher_id, PB.total_cost
+        FROM publisher_order AS PO JOIN publisher_order_batch AS PB ON (PB.batch_id = PO.batch_id)
+        ORDER BY PO.ISBN_number
+    """)
+    assert [(o["ISBN_number"], o["quantity"], o["publisher_id"]) for o in orders] == \
+        [(A, 68, 901), (B, 50, 901), (C, 50, 902)]
+    assert [int(o["total_cost"]) for o in orders] == [1180, 1180, 500]
+    # The run let go of its lock, so the next one isn't skipped.
+    assert run_replenishment(now=NOW)["batches"] == []
+
+
+def test_books_without_a_publisher_are_not_planned(app):
+    get_db().cursor().execute("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                          threshold, selling_price, publisher_id, book_image)
+        VALUES ('9780000000199', 'Orphan', 2020, 0, 'Science', 5, 10.00, NULL, 'r.png')
+    """)
+    get_db().commit()
+    plan = run_replenishment(dry_run=True, now=NOW)["plan"]
+    assert sorted(plan) == [901, 902]
+    json.dumps(plan, sort_keys=True, default=str)  # what jsonify does with it
+
+
+def test_run_skips_when_another_process_holds_the_lock(app):
+    held, done = threading.Event(), threading.Event()
+
+    def hold():
+        cursor = get_db().cursor()
+        cursor.execute("SELECT GET_LOCK(%s, 0)", (RUN_LOCK,))
+        assert cursor.fetchall() == [(1,)]
+        get_db().commit()
+        held.set()
+        done.wait(5)
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (RUN_LOCK,))
+        cursor.fetchall()
+        get_db().commit()
+
+    thread, _ = in_thread(app, hold)
+    held.wait(5)
+    try:
+        assert run_replenishment(now=NOW) is None
+    finally:
+        done.set()
+        thread.join(5)
+    assert query("SELECT COUNT(*) AS n FROM publisher_order WHERE batch_id IS NOT NULL")[0]["n"] == 0
+
+
+def test_confirm_applies_every_increment_in_one_update(app):
+    get_db().cursor().executemany("INSERT INTO author VALUES (%s, 'Restocker')", [(isbn,) for isbn, *_ in BOOKS])
+    get_db().commit()
+    in_stock = lambda: sorted(get_search_index().facet_search(author="restocker", in_stock=True)[0])
+    assert in_stock() == [A, B, D, E]
+    run_replenishment(now=NOW)
+    first, second = (row["batch_id"] for row in query(
+        "SELECT batch_id FROM publisher_order_batch WHERE status = 'Pending' ORDER BY publisher_id"))
+    result = confirm_batches([first, 4242])
+    assert result == {"confirmed": [first], "books": 2, "units": 118}
+    assert (stock(A), stock(B), stock(C)) == (70, 55, 0)
+    assert query("SELECT status FROM publisher_order_batch WHERE batch_id = %s", (first,))[0]["status"] == "Confirmed"
+
+    # An order outside a batch is still applied by the per-row trigger.
+    get_db().cursor().execute("UPDATE publisher_order SET status = 'Confirmed' WHERE batch_id IS NULL")
+    get_db().commit()
+    assert stock(D) == 51
+    assert confirm_batches()["confirmed"] == [second]
+    assert stock(C) == 50
+    assert in_stock() == [A, B, C, D, E]  # the confirm refreshed the search index
+
+
+def test_confirm_during_a_run_leaves_no_order_behind(any_app, monkeypatch):
+    app = any_app
+    read_batches, confirming = threading.Event(), threading.Event()
+
+    class PausingCursor:
+        # Holds the run between reading the open batches and filing orders into them.
+        def __init__(self, cursor):
+            self._cursor = cursor
+
+        def __getattr__(self, name):
+            return getattr(self._cursor, name)
+
+        def execute(self, query, params=None):
+            result = self._cursor.execute(query, params)
+            if "FROM publisher_order_batch WHERE status = 'Pending'" in query:
+                read_batches.set()
+                confirming.wait(5)
+                time.sleep(0.3)  # long enough for the confirm to commit, if nothing stops it
+            return result
+
+    class PausingConnection:
+        def __init__(self, conn):
+            self._conn = conn
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def cursor(self, *args, **kwargs):
+            return PausingCursor(self._conn.cursor(*args, **kwargs))
+
+    def confirm():
+        confirming.set()
+        return confirm_batches()
+
+    monkeypatch.setattr(replenishment, "get_db", lambda: PausingConnection(get_db()))
+    runner, ran = in_thread(app, run_replenishment, False, NOW)
+    read_batches.wait(5)
+    monkeypatch.undo()  # the run already holds its connection
+    confirmer, confirmed = in_thread(app, confirm)
+    runner.join(10)
+    confirmer.join(10)
+    assert "error" not in ran and "error" not in confirmed
+    assert app.open_batch in confirmed["value"]["confirmed"]
+
+    with app.app_context():
+        stranded = query("""
+            SELECT PO.order_id FROM publisher_order AS PO
+            JOIN publisher_order_batch AS PB ON (PB.batch_id = PO.batch_id)
+            WHERE PO.status = 'Pending' AND PB.status = 'Confirmed'
+        """)
+        assert stranded == []
+        assert stock(C) == 50
@@ -0,0 +1,137 @@
+import os
+import time
+
+import pytest
+from app import create_app
+from config import TestConfig
+from db.db_connection import get_db
+
+
+class FakeServer:
+    def __init__(self, name, lag=None):
+        self.name = name
+        self.lag = lag
+        self.down = False
+
+    def connect(self, **_):
+        if self.down:
+            raise ConnectionError(f"{self.name} is down")
+        return FakeConnection(self)
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+
+    def execute(self, query, params=None):
+        if "REPLICA STATUS" in query:
+            self.rows = [] if self.server.lag is None else [{"Seconds_Behind_Source": self.server.lag}]
+        else:
+            self.rows = [{"server": self.server.name}]
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def servers():
+    return {"primary": FakeServer("primary"), "replica": FakeServer("replica", lag=0)}
+
+
+@pytest.fixture
+def app(servers):
+    class ReplicaConfig(TestConfig):
+        DB_BACKEND = "mysql"
+        DB_REPLICAS = [{"host": "replica", "port": 3307, "name": "replica"}]
+        DB_STICKY_SECONDS = 0.2
+        DB_REPLICA_CHECK_INTERVAL = 0
+        METRICS_ENABLED = False
+    app = create_app(ReplicaConfig)
+    app.extensions["db_pool"]._connect = servers["primary"].connect
+    app.extensions["db_router"].replicas[0].pool._connect = servers["replica"].connect
+
+    def served_by(db):
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("SELECT @@hostname")
+        return cursor.fetchall()[0]["server"]
+
+    @app.route("/_read")
+    def read():
+        return {"server": served_by(get_db(readonly=True))}
+
+    @app.route("/_write")
+    def write():
+        db = get_db()
+        db.commit()
+        return {"server": served_by(db), "then_read": served_by(get_db(readonly=True))}
+
+    return app
+
+
+def test_reads_use_the_replica_until_the_client_writes(app):
+    client = app.test_client()
+    assert client.get("/_read").get_json()["server"] == "replica"
+    assert client.get("/_write").get_json() == {"server": "primary", "then_read": "primary"}
+    # The cookie from the write keeps this client on the primary for a while...
+    assert client.get("/_read").get_json()["server"] == "primary"
+    assert app.test_client().get("/_read").get_json()["server"] == "replica"  # ...but nobody else
+    time.sleep(0.25)
+    assert client.get("/_read").get_json()["server"] == "replica"
+
+
+def test_lagging_or_broken_replica_falls_back_to_primary(app, servers):
+    client = app.test_client()
+    servers["replica"].lag = 30
+    assert client.get("/_read").get_json()["server"] == "primary"
+    replica = app.extensions["db_router"].stats()["replicas"][0]
+    assert replica["healthy"] is False and replica["lag"] == 30
+
+    servers["replica"].lag = 1
+    assert client.get("/_read").get_json()["server"] == "replica"
+
+    servers["replica"].down = True
+    app.extensions["db_router"].replicas[0].pool.dispose()
+    assert client.get("/_read").get_json()["server"] == "primary"
+    assert "down" in client.get("/health/db").get_json()["replicas"]["replicas"][0]["error"]
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_DB_REPLICA_PORT"),
+                    reason="set TEST_DB_REPLICA_PORT to a second local MySQL instance")
+def test_two_local_instances():
+    port = int(os.environ["TEST_DB_REPLICA_PORT"])
+
+    class TwoInstanceConfig(TestConfig):
+        DB_BACKEND = "mysql"
+        DB_REPLICAS = [{"host": "127.0.0.1", "port": port}]
+
+    app = create_app(TwoInstanceConfig)
+    with app.test_request_context():
+        cursor = get_db(readonly=True).cursor(dictionary=True)
+        cursor.execute("SELECT @@port AS port")
+        assert cursor.fetchall()[0]["port"] == port
+        cursor = get_db().cursor(dictionary=True)
+        cursor.execute("SELECT @@port AS port")
+        assert cursor.fetchall()[0]["port"] == TwoInstanceConfig.DB_PORT
+    assert app.extensions["db_router"].stats()["replicas"][0]["healthy"]
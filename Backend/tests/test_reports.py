@@ -0,0 +1,171 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+import reports.models as report_models
+from reports.models import _months_before, sales_previous_month, top_customers, rebuild_rollups, check_rollups
+
+# The rollup tables and their triggers are MySQL-only (see db/sqlite.py), so
+# these tests answer the report queries from canned rows.
+D = datetime.date
+
+
+class RollupCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.db.queries.append((" ".join(query.split()), params))
+        if self.db.fail_on and self.db.fail_on in query:
+            raise RuntimeError("boom")
+        for marker, rows in self.db.results.items():
+            if marker in query:
+                self.rows = [dict(row) for row in rows]
+                return
+        self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class RollupDB:
+    def __init__(self, results=None, fail_on=None):
+        # results: query marker -> rows; the first marker found in a query wins.
+        self.results = results or {}
+        self.fail_on = fail_on
+        self.queries = []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return RollupCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = RollupDB()
+    monkeypatch.setattr(report_models, "get_db", lambda readonly=False: db)
+    return db
+
+
+@pytest.mark.parametrize("day, months, expected", [
+    (D(2025, 1, 15), 1, D(2024, 12, 15)),   # January rolls back into last year
+    (D(2025, 1, 31), 1, D(2024, 12, 31)),
+    (D(2025, 2, 28), 14, D(2023, 12, 28)),
+    (D(2025, 3, 31), 1, D(2025, 2, 28)),    # the 31st clamps to short months
+    (D(2024, 3, 31), 1, D(2024, 2, 29)),
+    (D(2025, 5, 31), 3, D(2025, 2, 28)),
+    (D(2025, 7, 31), 3, D(2025, 4, 30)),
+    (D(2025, 12, 31), 12, D(2024, 12, 31)),
+    (D(2025, 6, 10), 0, D(2025, 6, 10)),
+])
+def test_months_before(day, months, expected):
+    assert _months_before(day, months) == expected
+
+
+@pytest.mark.parametrize("today, start, end", [
+    (D(2025, 1, 1), D(2024, 12, 1), D(2025, 1, 1)),
+    (D(2025, 1, 31), D(2024, 12, 1), D(2025, 1, 1)),
+    (D(2025, 3, 31), D(2025, 2, 1), D(2025, 3, 1)),
+    (D(2024, 3, 1), D(2024, 2, 1), D(2024, 3, 1)),
+])
+def test_sales_previous_month_reads_the_whole_calendar_month(db, today, start, end):
+    db.results["FROM daily_sales"] = [{"Total_Sales": Decimal("12.50")}]
+    assert sales_previous_month(today) == {"Total_Sales": Decimal("12.50")}
+    assert db.queries[-1][1] == (start, end)
+
+
+def test_top_customers_looks_back_three_clamped_months(db):
+    top_customers(limit=3, today=D(2025, 5, 31))
+    assert db.queries[-1][1] == (D(2025, 2, 28), 3)
+
+
+def test_rebuild_replaces_each_rollup_from_the_raw_tables(db):
+    rebuild_rollups(D(2025, 5, 1))
+    statements = [(query.split(" (")[0], params) for query, params in db.queries]
+    assert statements == [
+        ("DELETE FROM daily_sales WHERE sales_date >= %s", (D(2025, 5, 1),)),
+        ("INSERT INTO daily_sales", (D(2025, 5, 1),)),
+        ("DELETE FROM daily_customer_sales WHERE sales_date >= %s", (D(2025, 5, 1),)),
+        ("INSERT INTO daily_customer_sales", (D(2025, 5, 1),)),
+        ("DELETE FROM daily_book_sales WHERE sales_date >= %s", (D(2025, 5, 1),)),
+        ("INSERT INTO daily_book_sales", (D(2025, 5, 1),)),
+    ]
+    assert (db.commits, db.rollbacks) == (1, 0)
+
+    rebuild_rollups()
+    assert db.queries[-1][1] == (report_models.EPOCH,)
+
+
+def test_rebuild_rolls_back_when_a_table_fails(monkeypatch):
+    db = RollupDB(fail_on="INSERT INTO daily_book_sales")
+    monkeypatch.setattr(report_models, "get_db", lambda readonly=False: db)
+    with pytest.raises(RuntimeError):
+        rebuild_rollups()
+    assert (db.commits, db.rollbacks) == (0, 1)
+
+
+def test_check_reports_nothing_when_rollups_match(db):
+    day = {"sales_date": D(2025, 5, 1), "orders_count": 2, "total_sales": Decimal("30.00")}
+    db.results = {
+        "FROM daily_sales WHERE": [day],
+        "FROM daily_customer_sales WHERE": [],
+        "FROM daily_book_sales WHERE": [],
+        report_models.RAW_DAILY_SALES: [day],
+    }
+    assert check_rollups() == {"ok": True, "mismatches": {}}
+
+
+def test_check_diffs_rollups_against_the_raw_tables(db):
+    may1, may2, may3 = D(2025, 5, 1), D(2025, 5, 2), D(2025, 5, 3)
+    db.results = {
+        # Rollup side: may1 drifted, may2 is missing, may3 is all zeros
+        # (its orders moved to another day), which is consistent.
+        "FROM daily_sales WHERE": [
+            {"sales_date": may1, "orders_count": 2, "total_sales": Decimal("25.00")},
+            {"sales_date": may3, "orders_count": 0, "total_sales": Decimal("0.00")},
+        ],
+        # A customer row with no orders behind it.
+        "FROM daily_customer_sales WHERE": [
+            {"sales_date": may1, "username": "ghost", "orders_count": 1, "total_amount": Decimal("5.00")},
+        ],
+        "FROM daily_book_sales WHERE": [
+            {"sales_date": may1, "ISBN_number": "1", "copies_sold": 3, "revenue": Decimal("30.00")},
+        ],
+        report_models.RAW_DAILY_SALES: [
+            {"sales_date": may1, "orders_count": 2, "total_sales": Decimal("30.00")},
+            {"sales_date": may2, "orders_count": 1, "total_sales": Decimal("7.50")},
+        ],
+        report_models.RAW_DAILY_CUSTOMER_SALES: [],
+        report_models.RAW_DAILY_BOOK_SALES: [
+            {"sales_date": may1, "ISBN_number": "1", "copies_sold": 3, "revenue": Decimal("30.00")},
+        ],
+    }
+
+    result = check_rollups(may1)
+    assert result["ok"] is False
+    assert result["mismatches"] == {
+        "daily_sales": [
+            {"key": {"sales_date": "2025-05-01"},
+             "expected": {"orders_count": "2", "total_sales": "30.00"},
+             "actual": {"orders_count": "2", "total_sales": "25.00"}},
+            {"key": {"sales_date": "2025-05-02"},
+             "expected": {"orders_count": "1", "total_sales": "7.50"},
+             "actual": None},
+        ],
+        "daily_customer_sales": [
+            {"key": {"sales_date": "2025-05-01", "username": "ghost"},
+             "expected": None,
+             "actual": {"orders_count": "1", "total_amount": "5.00"}},
+        ],
+    }
+    assert all(params == (may1,) for _, params in db.queries)
@@ -0,0 +1,173 @@
+import time
+from decimal import Decimal
+
+from books.catalog import bump_catalog_version, catalog_version
+from books.search_cache import SearchCache, search_key
+from books.search_index import BookSearchIndex
+
+
+def build_index():
+    index = BookSearchIndex()
+    books = [
+        {"ISBN_number": "1", "title": "A Brief History of Time", "category": "Science", "name": "Bantam"},
+        {"ISBN_number": "2", "title": "History", "category": "History", "name": "Penguin"},
+        {"ISBN_number": "3", "title": "The Art of War", "category": "History", "name": "Penguin"},
+        {"ISBN_number": "4", "title": "Élan Vital", "category": "Art", "name": "Pearson"},
+        {"ISBN_number": "5", "title": "No Authors", "category": "Art", "name": "Pearson"},
+        {"ISBN_number": "6", "title": "No Publisher", "category": "Art", "name": None},
+        {"ISBN_number": "7", "title": "100% Art_work", "category": "Art", "name": "Pearson"},
+    ]
+    authors = [
+        {"ISBN_number": "1", "author_name": "Stephen Hawking"},
+        {"ISBN_number": "2", "author_name": "Herodotus"},
+        {"ISBN_number": "3", "author_name": "Sun Tzu"},
+        {"ISBN_number": "4", "author_name": "Henri Bergson"},
+        {"ISBN_number": "6", "author_name": "Anon"},
+        {"ISBN_number": "7", "author_name": "Anon"},
+    ]
+    index.build(books, authors)
+    return index
+
+
+def test_substring_match_is_case_and_accent_insensitive():
+    index = build_index()
+    assert set(index.search(title="history")) == {"1", "2"}
+    assert index.search(title="elan") == ["4"]
+    assert index.search(author="HAWK") == ["1"]
+
+
+def test_filters_are_combined():
+    index = build_index()
+    assert index.search(title="history", category="history") == ["2"]
+    assert index.search(publisher="peng", author="tzu") == ["3"]
+    assert index.search(isbn="3", title="war") == ["3"]
+    assert index.search(isbn="3", title="history") == []
+
+
+def test_books_without_author_or_publisher_are_not_returned():
+    index = build_index()
+    assert index.search(title="No ") == []
+    assert set(index.search(category="Art")) == {"4", "7"}
+
+
+def test_like_wildcards_and_escapes():
+    index = build_index()
+    assert set(index.search(title="h_story")) == {"1", "2"}
+    assert index.search(title="brief%time") == ["1"]
+    assert index.search(title="100\\%") == ["7"]
+    assert index.search(title="t\\_w") == ["7"]
+    assert index.search(title="0\\_") == []
+
+
+def test_short_terms_scan_without_trigrams():
+    index = build_index()
+    assert set(index.search(title="ar")) == {"3", "7"}
+
+
+def test_exact_and_prefix_matches_rank_first():
+    index = build_index()
+    assert index.search(title="history") == ["2", "1"]
+
+
+def test_upsert_and_remove_update_postings():
+    index = build_index()
+    index.upsert("2", "Histories", "History", "Penguin", ["Herodotus"])
+    assert index.search(title="histories") == ["2"]
+    index.upsert("2", "The Histories", "History", "Penguin", ["Herodotus"])
+    assert index.search(title="the hist") == ["2"]
+    index.remove("2")
+    assert index.search(author="herodotus") == []
+
+
+def facet_index():
+    index = BookSearchIndex(price_buckets=(10, 25))
+    books = [
+        {"ISBN_number": "1", "title": "Cosmos", "category": "Science", "name": "Bantam",
+         "selling_price": Decimal("9.99"), "publication_year": 1980, "quantity_stock": 3},
+        {"ISBN_number": "2", "title": "Histories", "category": "History", "name": "Penguin",
+         "selling_price": Decimal("12.50"), "publication_year": 1996, "quantity_stock": 0},
+        {"ISBN_number": "3", "title": "Art of War", "category": "History", "name": "Penguin",
+         "selling_price": Decimal("30.00"), "publication_year": 2005, "quantity_stock": 8},
+        {"ISBN_number": "4", "title": "Ways of Seeing", "category": "Art", "name": "Pearson",
+         "selling_price": Decimal("18.00"), "publication_year": 1972, "quantity_stock": 1},
+    ]
+    authors = [{"ISBN_number": str(i), "author_name": f"Author {i}"} for i in range(1, 5)]
+    index.build(books, authors)
+    return index
+
+
+def test_facet_counts_follow_filters_in_one_pass():
+    index = facet_index()
+    isbns, facets = index.facet_search()
+    assert sorted(isbns) == ["1", "2", "3", "4"]
+    assert facets["category"] == {"Science": 1, "History": 2, "Art": 1}
+    assert facets["publisher"] == {"Bantam": 1, "Penguin": 2, "Pearson": 1}
+    assert facets["price"] == {"0-10": 1, "10-25": 2, "25+": 1}
+
+    isbns, facets = index.facet_search(categories=["history", "Art"], price_max=20)
+    assert sorted(isbns) == ["2", "4"]
+    # Other categories still show how many books the price filter lets through,
+    # and the price buckets show what the category filter lets through.
+    assert facets["category"] == {"Science": 1, "History": 1, "Art": 1}
+    assert facets["publisher"] == {"Penguin": 1, "Pearson": 1}
+    assert facets["price"] == {"0-10": 0, "10-25": 2, "25+": 1}
+
+    assert index.facet_search(in_stock=True, year_min=1975)[0] == ["3", "1"]  # still ranked by title
+    assert index.facet_search(title="war", year_max=2000)[0] == []
+
+
+def test_facet_columns_follow_upsert_and_remove():
+    index = facet_index()
+    index.upsert("2", "Histories", "History", "Penguin", ["Herodotus"], Decimal("40.00"), 1996, 5)
+    index.upsert("5", "New Book", "Science", "Bantam", ["Someone"], Decimal("5.00"), 2020, 2)
+    index.remove("4")
+    isbns, facets = index.facet_search(in_stock=True)
+    assert sorted(isbns) == ["1", "2", "3", "5"]
+    assert facets["category"] == {"Science": 2, "History": 2}
+    assert facets["price"] == {"0-10": 2, "10-25": 0, "25+": 2}
+
+
+def test_set_stock_moves_books_in_and_out_of_stock():
+    index = facet_index()
+    index.set_stock({"1": 0, "2": 4, "missing": 7})
+    isbns, facets = index.facet_search(in_stock=True)
+    assert sorted(isbns) == ["2", "3", "4"]
+    assert sum(facets["category"].values()) == len(isbns)
+
+
+def test_hit_after_put_and_key_normalization():
+    cache = SearchCache(maxsize=4, ttl=60)
+    cache.put(search_key(None, "History", "", None, None), ["a"], catalog_version())
+    assert cache.get(search_key(None, "history", None, None, None)) == ["a"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_catalog_version_bump_invalidates():
+    cache = SearchCache(maxsize=4, ttl=60)
+    key = search_key(None, "x", None, None, None)
+    cache.put(key, ["a"], catalog_version())
+    bump_catalog_version()
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["size"] == 0
+
+
+def test_lru_eviction():
+    cache = SearchCache(maxsize=2, ttl=60)
+    version = catalog_version()
+    cache.put("a", 1, version)
+    cache.put("b", 2, version)
+    cache.get("a")
+    cache.put("c", 3, version)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry():
+    cache = SearchCache(maxsize=2, ttl=0.01)
+    cache.put("a", 1, catalog_version())
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,124 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from mysql.connector import IntegrityError, OperationalError
+from db.migrations import discover
+from db.sqlite import SCHEMA_PATH, SQLiteBackend, translate, translate_schema
+
+
+@pytest.fixture
+def db():
+    backend = SQLiteBackend()  # a private database, not the suite's shared one
+    conn = backend.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO publisher (name) VALUES (%s)", ("Pub",))
+    cursor.execute("""
+        INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                          threshold, selling_price, publisher_id, book_image)
+        VALUES ('A', 'Alpha', 2020, 5, 'Science', 2, 12.50, %s, 'a.png')
+    """, (cursor.lastrowid,))
+    conn.commit()
+    return backend
+
+
+def test_schema_is_translated_from_database_sql():
+    ddl = translate_schema("""
+        CREATE DATABASE x;
+        USE x;
+        CREATE TABLE t (
+            id INT NOT NULL AUTO_INCREMENT,
+            kind ENUM('a', 'b') NOT NULL, -- comment
+            PRIMARY KEY (id)
+        );
+    """)
+    assert "INTEGER NOT NULL," in ddl
+    assert "kind TEXT CHECK (kind IN ('a', 'b')) NOT NULL" in ddl
+    assert "DATABASE" not in ddl and "comment" not in ddl
+
+
+def test_mysql_statements_are_rewritten():
+    assert translate("SELECT * FROM book WHERE ISBN_number IN (%s, %s) ORDER BY ISBN_number FOR UPDATE") == \
+        "SELECT * FROM book WHERE ISBN_number IN (?, ?) ORDER BY ISBN_number"
+    assert translate("INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE b = VALUES(b)") == \
+        "INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET b = excluded.b"
+    assert translate("SET @stock_holder = %s") == \
+        "INSERT OR REPLACE INTO session_variable (name, value) VALUES ('stock_holder', ?)"
+    assert translate("DELETE FROM t WHERE heartbeat < NOW() - INTERVAL %s SECOND") == \
+        "DELETE FROM t WHERE heartbeat < datetime('now', '-' || ? || ' seconds')"
+
+
+def test_rows_come_back_as_mysql_connector_types(db):
+    conn = db.connect()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("INSERT INTO credit_card VALUES (%s, %s)", ("4111", datetime.date(2030, 1, 1)))
+    cursor.execute("INSERT INTO customer_order (credit_card_number, cost) VALUES (%s, %s)", ("4111", Decimal("12.50")))
+    cursor.execute("SELECT order_id, order_date, cost FROM customer_order WHERE order_id = %s", (cursor.lastrowid,))
+    order = cursor.fetchone()
+    assert order["order_id"] == 1
+    assert isinstance(order["order_date"], datetime.datetime)
+    assert order["cost"] == Decimal("12.5")
+    conn.rollback()
+
+
+def test_triggers_are_ported(db):
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO customer_order (cost) VALUES (25)")
+    cursor.execute("INSERT INTO book_order (ISBN_number, order_id, item_quantity, unit_price) VALUES ('A', %s, 2, 12.50)",
+                   (cursor.lastrowid,))
+    cursor.execute("SELECT quantity_stock FROM book WHERE ISBN_number = 'A'")
+    assert cursor.fetchone() == (3,)
+
+    with pytest.raises(IntegrityError, match="cannot be negative"):
+        cursor.execute("UPDATE book SET quantity_stock = -1 WHERE ISBN_number = 'A'")
+
+    cursor.execute("INSERT INTO publisher_order (cost, status, quantity, ISBN_number) VALUES (100, 'Pending', 10, 'A')")
+    cursor.execute("UPDATE publisher_order SET status = 'Confirmed' WHERE order_id = %s", (cursor.lastrowid,))
+    cursor.execute("SELECT quantity_stock FROM book WHERE ISBN_number = 'A'")
+    assert cursor.fetchone() == (13,)
+    conn.commit()
+
+
+def test_rollback_after_undoes_commits(db):
+    with db.rollback_after():
+        conn = db.connect()
+        conn.cursor().execute("DELETE FROM book")
+        conn.commit()
+        conn.cursor().execute("SELECT COUNT(*) FROM book")
+        conn.close()
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM book")
+    assert cursor.fetchone() == (1,)
+    conn.close()
+
+
+def test_a_thread_cannot_nest_transactions(db):
+    outer, inner = db.connect(), db.connect()
+    outer.cursor().execute("UPDATE book SET quantity_stock = 4 WHERE ISBN_number = 'A'")
+    with pytest.raises(OperationalError, match="already has a transaction open"):
+        inner.cursor().execute("SELECT quantity_stock FROM book")
+    assert not inner.in_transaction
+    outer.commit()
+
+    cursor = inner.cursor()
+    cursor.execute("SELECT quantity_stock FROM book")
+    assert cursor.fetchall() == [(4,)]
+    inner.rollback()
+
+
+def test_secondary_indexes_come_from_versioned_migrations(db):
+    # database.sql creates none, so an existing database gets every index
+    # through `db migrate`.
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        assert "CREATE INDEX" not in f.read().upper()
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT version FROM schema_migrations ORDER BY version")
+    assert [v for v, in cursor.fetchall()] == [v for v, _, _ in discover()]
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    names = {name for name, in cursor.fetchall()}
+    conn.rollback()
+    assert {"idx_book_price_isbn", "idx_book_year_isbn", "idx_book_title_isbn",
+            "idx_customer_order_user_date", "idx_book_order_order", "idx_customer_order_date"} <= names
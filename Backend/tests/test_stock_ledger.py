@@ -0,0 +1,194 @@
+import pytest
+from mysql.connector import IntegrityError
+from app import create_app
+from config import TestConfig
+from db.db_connection import get_db
+from books.ledger import StockLedger, flush_holder, check_ledger, reclaim_stale_holders
+from books.models import update_existing_book
+from users.models import create_customer_order, InsufficientStockError
+from users.intake import apply_batch
+from auth.tokens import generate_access_token
+from config import *
+
+HOT = "9780000000001"
+COLD = "9780000000002"
+SCARCE = "9780000000003"
+CARD = "4111111111111111"
+
+
+class LedgerConfig(TestConfig):
+    STOCK_LEDGER_ENABLED = True
+    STOCK_LEDGER_SKUS = [HOT]
+    STOCK_LEDGER_BLOCK = 10
+    STOCK_LEDGER_START_FLUSHER = False
+
+
+@pytest.fixture
+def app():
+    app = create_app(LedgerConfig)
+    app.config['TESTING'] = True
+    with app.app_context():
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute("INSERT INTO publisher (publisher_id, name) VALUES (1, 'Pub')")
+        cursor.execute("""
+            INSERT INTO book (ISBN_number, title, publication_year, quantity_stock, category,
+                              threshold, selling_price, publisher_id, book_image)
+            VALUES (%s, 'Hot', 2020, 120, 'Science', 0, 10.00, 1, 'a.png'),
+                   (%s, 'Cold', 2020, 100, 'Art', 0, 2.50, 1, 'b.png'),
+                   (%s, 'Scarce', 2020, 5, 'Art', 0, 4.00, 1, 'c.png')
+        """, (HOT, COLD, SCARCE))
+        cursor.execute("INSERT INTO credit_card VALUES (%s, '2030-01-01')", (CARD,))
+        cursor.execute("""
+            INSERT INTO user (username, role, email, password_hash, first_name, last_name)
+            VALUES ('buyer', 'Customer', 'buyer@example.com', 'x', 'Buy', 'Er')
+        """)
+        db.commit()
+        yield app
+
+
+def stock(isbn):
+    cursor = get_db().cursor()
+    cursor.execute("SELECT quantity_stock FROM book WHERE ISBN_number = %s", (isbn,))
+    return cursor.fetchone()[0]
+
+
+def reservations():
+    cursor = get_db().cursor()
+    cursor.execute("SELECT holder, ISBN_number, units FROM stock_reservation")
+    return {(holder, isbn): units for holder, isbn, units in cursor.fetchall()}
+
+
+def pending():
+    cursor = get_db().cursor()
+    cursor.execute("SELECT holder, ISBN_number, quantity FROM stock_pending ORDER BY id")
+    return cursor.fetchall()
+
+
+def sell(ledger, isbn, qty):
+    # A checkout of one hot book, as create_customer_order writes it.
+    assert ledger.take(get_db(), {isbn: qty}) == {}
+    cursor = get_db().cursor()
+    cursor.execute("INSERT INTO customer_order (credit_card_number, username, cost) VALUES (%s, 'buyer', 0)", (CARD,))
+    order_id = cursor.lastrowid
+    cursor.execute("SET @stock_holder = %s", (ledger.holder,))
+    cursor.execute("INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) VALUES (%s, %s, %s, 0)",
+                   (order_id, isbn, qty))
+    cursor.execute("SET @stock_holder = NULL")
+    get_db().commit()
+
+
+def test_take_claims_blocks_and_never_oversells(app):
+    db = get_db()
+    first = StockLedger("one", [HOT], block=50)
+    second = StockLedger("two", [HOT], block=50)
+
+    for _ in range(5):
+        assert first.take(db, {HOT: 10}) == {}
+    assert first.claims == 1  # five sales, one trip to the book row
+    assert second.take(db, {HOT: 60}) == {}
+    # 50 + 60 reserved, so only 10 units are left for anyone to claim.
+    assert first.take(db, {HOT: 30}) == {HOT: 10}
+    assert first.remaining() == {HOT: 10}
+    assert reservations() == {("one", HOT): 60, ("two", HOT): 60}
+    assert stock(HOT) == 120
+
+
+def test_shortage_on_one_book_takes_nothing(app):
+    ledger = StockLedger("one", [HOT, SCARCE, "missing"], block=10)
+    assert ledger.take(get_db(), {HOT: 5, SCARCE: 6, "missing": 1}) == {SCARCE: 5, "missing": None}
+    assert ledger.remaining() == {HOT: 10, SCARCE: 5, "missing": 0}
+    assert ledger.sold == 0
+
+
+def test_hot_checkout_is_pending_until_flushed(app):
+    ledger = app.extensions["stock_ledger"]
+    create_customer_order("buyer", CARD, [{"ISBN_number": HOT, "quantity": 3},
+                                          {"ISBN_number": COLD, "quantity": 4}])
+    create_customer_order("buyer", CARD, [{"ISBN_number": HOT, "quantity": 2}])
+
+    # The trigger diverted the hot lines and @stock_holder was cleared again.
+    assert pending() == [(ledger.holder, HOT, 3), (ledger.holder, HOT, 2)]
+    assert stock(HOT) == 120 and stock(COLD) == 96
+    cursor = get_db().cursor()
+    cursor.execute("SELECT value FROM session_variable WHERE name = 'stock_holder'")
+    assert cursor.fetchone() == (None,)
+    assert check_ledger(get_db(), ledger)["ok"]
+
+    applied, errors = ledger.flush(get_db())
+    assert applied == {HOT: 5} and errors == {}
+    assert stock(HOT) == 115
+    assert pending() == []
+    assert reservations() == {(ledger.holder, HOT): 5}
+    assert check_ledger(get_db(), ledger)["ok"]
+
+    ledger.release(get_db())
+    assert reservations() == {}
+    assert stock(HOT) == 115
+
+
+def test_flush_leaves_a_refused_book_pending(app):
+    ledger = StockLedger("one", [HOT, SCARCE], block=5)
+    sell(ledger, HOT, 5)
+    sell(ledger, SCARCE, 5)
+    # A holder whose row claims more than is left (written by hand).
+    cursor = get_db().cursor()
+    cursor.execute("INSERT INTO stock_reservation (holder, ISBN_number, units) VALUES ('rogue', %s, 3)", (SCARCE,))
+    get_db().commit()
+
+    applied, errors = flush_holder(get_db(), "one")
+    assert applied == {HOT: 5}
+    assert "reserved" in errors[SCARCE]
+    assert stock(HOT) == 115 and stock(SCARCE) == 5
+    assert [isbn for _, isbn, _ in pending()] == [SCARCE]
+    assert check_ledger(get_db())["problems"][0]["problem"] == "overcommitted"
+
+
+def test_drift_and_stale_holders_are_reported_and_reclaimed(app):
+    ledger = StockLedger("one", [HOT], block=10)
+    crashed = StockLedger("gone", [HOT], block=10)
+    sell(ledger, HOT, 1)
+    sell(crashed, HOT, 4)
+
+    ledger.give_back({HOT: 2})  # local count no longer matches the tables
+    assert [p["problem"] for p in check_ledger(get_db(), ledger)["problems"]] == ["drift"]
+    ledger.give_back({HOT: -2})
+
+    assert reclaim_stale_holders(get_db(), 60, exclude="one") == []
+    cursor = get_db().cursor()
+    cursor.execute("UPDATE stock_reservation SET heartbeat = '2000-01-01 00:00:00' WHERE holder = 'gone'")
+    get_db().commit()
+    assert reclaim_stale_holders(get_db(), 60, exclude="one") == ["gone"]
+    assert stock(HOT) == 116
+    assert reservations() == {("one", HOT): 10}
+    assert check_ledger(get_db(), ledger)["ok"]
+
+
+def test_other_sellers_leave_reserved_units_alone(app):
+    other = StockLedger("other", [SCARCE], block=10)
+    assert other.take(get_db(), {SCARCE: 1}) == {}  # reserves all 5
+
+    # SCARCE isn't hot for this process, so it goes through the row locks.
+    with pytest.raises(InsufficientStockError) as e:
+        create_customer_order("buyer", CARD, [{"ISBN_number": SCARCE, "quantity": 1}])
+    assert e.value.errors == {SCARCE: "Requested 1, only 0 in stock"}
+
+    # Neither does the journal worker.
+    results = apply_batch(get_db(), [{"ticket": "t1", "username": "buyer", "credit_card_number": CARD,
+                                      "lines": {SCARCE: 1}}], ledger_enabled=True)
+    assert results["t1"][2]["errors"] == {SCARCE: "Requested 1, only 0 in stock"}
+
+    with pytest.raises(IntegrityError, match="reserved"):
+        update_existing_book({"ISBN_number": SCARCE, "quantity_stock": 2})
+    get_db().rollback()
+    update_existing_book({"ISBN_number": SCARCE, "quantity_stock": 8})
+    assert stock(SCARCE) == 8
+
+
+def test_admin_cannot_edit_stock_below_reservations(app):
+    StockLedger("other", [SCARCE], block=10).take(get_db(), {SCARCE: 1})
+    token = generate_access_token("admin", "Admin")
+    rv = app.test_client().put("/api/books/", headers={"Authorization": f"Bearer {token}"},
+                               json={"ISBN_number": SCARCE, "quantity_stock": 0})
+    assert rv.status_code == HTTP_409_CONFLICT
+    assert "reserved" in rv.get_json()["message"]
@@ -1,8 +1,11 @@
 import pytest
 from app import create_app
 from config import TestConfig
-from db.db_connection import get_db
 from config import *
+import users.models as user_models
+from users.cache import get_user_cache
+from db.db_connection import get_db
+from auth.tokens import generate_access_token
 
 @pytest.fixture
 def client():
@@ -11,17 +14,6 @@ def client():
     with app.test_client() as client:
         yield client
 
-@pytest.fixture(autouse=True)
-def clean_db():
-    app = create_app(TestConfig)
-    with app.app_context():
-        db = get_db()
-        cursor = db.cursor()
-        cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
-        cursor.execute("TRUNCATE TABLE user")  # Updated table name
-        cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
-        db.commit()
-
 def test_register_and_login(client):
     # --- Positive tests ---
     # Register
@@ -29,14 +21,12 @@ def test_register_and_login(client):
         "username": "alice",
         "password": "1234",
         "email": "alice@example.com",
-        "first_name": "Alice",
-        "last_name": "Smith",
+        "name": "Alice Smith",
         "role": "Customer",
         "shipping_address": "123 Main St",
         "phone_number": "0123456789"
     })
     assert rv.status_code == HTTP_201_CREATED
-    user_id = rv.get_json()["user_id"]
 
     # Login
     rv = client.post("/api/users/login", json={
@@ -64,8 +54,7 @@ def test_register_and_login(client):
         "username": "alice",
         "password": "1234",
         "email": "alice@example.com",
-        "first_name": "Alice",
-        "last_name": "Smith"
+        "name": "Alice Smith"
     })
     assert rv.status_code == HTTP_409_CONFLICT
 
@@ -99,8 +88,7 @@ def test_update_profile(client):
         "username": "alice",
         "password": "password123",
         "email": "alice@example.com",
-        "first_name": "Alice",
-        "last_name": "Smith",
+        "name": "Alice Smith",
         "role": "Customer",
         "shipping_address": "Old Address",
         "phone_number": "1111111111"
@@ -114,7 +102,7 @@ def test_update_profile(client):
     headers = {"Authorization": f"Bearer {token}"}
 
     # --- Positive Test: Update Address & Phone ---
-    rv = client.put("/api/users/profile", headers=headers, json={
+    rv = client.put("/api/users/me", headers=headers, json={
         "shipping_address": "New Address 123",
         "phone_number": "9999999999"
     })
@@ -134,12 +122,11 @@ def test_update_profile(client):
         "username": "bob",
         "password": "password123",
         "email": "bob@example.com",
-        "first_name": "Bob",
-        "last_name": "Jones"
+        "name": "Bob Jones"
     })
 
     # 2. Try to update Alice's email to Bob's email
-    rv = client.put("/api/users/profile", headers=headers, json={
+    rv = client.put("/api/users/me", headers=headers, json={
         "email": "bob@example.com"
     })
     assert rv.status_code == HTTP_409_CONFLICT
@@ -147,8 +134,9 @@ def test_update_profile(client):
 
     # --- Negative Test: Update Password ---
     # Update password
-    rv = client.put("/api/users/profile", headers=headers, json={
-        "password": "newpassword456"
+    rv = client.put("/api/users/me", headers=headers, json={
+        "old_password": "password123",
+        "new_password": "newpassword456"
     })
     assert rv.status_code == HTTP_200_OK
 
@@ -167,5 +155,100 @@ def test_update_profile(client):
     assert rv.status_code == HTTP_200_OK
 
     # --- Negative Test: No Token ---
-    rv = client.put("/api/users/profile", json={"shipping_address": "Hacker St"})
+    rv = client.put("/api/users/me", json={"shipping_address": "Hacker St"})
     assert rv.status_code == HTTP_401_UNAUTHORIZED
+
+
+class UserQueries:
+    # The real connection, counting the user-row lookups that reach it.
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, readonly=False):
+        conn = get_db(readonly)
+        counter = self
+
+        class Cursor:
+            def __init__(self, cursor):
+                self._cursor = cursor
+
+            def __getattr__(self, name):
+                return getattr(self._cursor, name)
+
+            def execute(self, query, params=None):
+                counter.count += "SELECT * FROM user" in query
+                return self._cursor.execute(query, params)
+
+        class Connection:
+            def __getattr__(self, name):
+                return getattr(conn, name)
+
+            def cursor(self, *args, **kwargs):
+                return Cursor(conn.cursor(*args, **kwargs))
+
+        return Connection()
+
+
+@pytest.fixture
+def cached_app(monkeypatch):
+    app = create_app(TestConfig)
+    app.config['TESTING'] = True
+    queries = UserQueries()
+    monkeypatch.setattr(user_models, "get_db", queries)
+    app.user_queries = queries
+    with app.app_context():
+        user_models.create_user("alice", "hash", email="alice@example.com", first_name="Alice", last_name="Smith")
+        yield app
+
+
+def test_repeated_me_is_served_from_the_cache(cached_app):
+    token = generate_access_token("alice", "Customer")
+    client = cached_app.test_client()
+    for _ in range(3):
+        rv = client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"})
+        assert rv.get_json()["first_name"] == "Alice"
+        assert "password_hash" not in rv.get_json()
+    assert cached_app.user_queries.count == 1
+    assert get_user_cache().stats()["hits"] == 2
+
+
+def test_update_invalidates_the_entry(cached_app):
+    user_models.get_user_by_username("alice")
+    assert user_models.update_user_by_username("alice", {"first_name": "Al"})
+    assert user_models.get_user_by_username("alice")["first_name"] == "Al"
+    assert cached_app.user_queries.count == 2
+
+
+def test_rename_invalidates_the_old_and_new_names(cached_app):
+    user_models.get_user_by_username("alice")
+    # "carol" was cached while it belonged to an account deleted since.
+    get_user_cache().put("carol", {"username": "carol", "first_name": "Someone Else"})
+    assert user_models.update_user_by_username("alice", {"username": "carol"})
+    assert user_models.get_user_by_username("alice") is None
+    assert user_models.get_user_by_username("carol")["first_name"] == "Alice"
+
+
+def test_create_invalidates_a_stale_entry(cached_app):
+    get_user_cache().put("bob", {"username": "bob", "first_name": "Old Bob"})
+    user_models.create_user("bob", "hash", email="bob@example.com", first_name="Bob", last_name="Jones")
+    assert user_models.get_user_by_username("bob")["first_name"] == "Bob"
+
+
+def test_password_hash_stays_out_of_the_cache(cached_app):
+    cache = get_user_cache()
+    assert cache.store_password_hash is False
+    user_models.get_user_by_username("alice")
+    assert "password_hash" not in cache.get("alice")
+
+    # Password checks still read the hash from the database every time.
+    for _ in range(2):
+        assert user_models.get_user_by_username("alice", include_password=True)["password_hash"] == "hash"
+    assert cached_app.user_queries.count == 3
+    assert "password_hash" not in cache.get("alice")
+    assert "password_hash" not in user_models.get_user_by_username("alice")
+
+    cache.store_password_hash = True
+    cache.clear()
+    user_models.get_user_by_username("alice", include_password=True)
+    assert user_models.get_user_by_username("alice", include_password=True)["password_hash"] == "hash"
+    assert cached_app.user_queries.count == 4
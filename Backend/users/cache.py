@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class UserCache:
+    # Bounded LRU of user rows keyed by username (the JWT identity). Writers
+    # invalidate explicitly; the TTL only bounds how long another worker's
+    # write can go unnoticed.
+    def __init__(self, maxsize=1024, ttl=30, store_password_hash=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.store_password_hash = store_password_hash
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, username):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[username]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, username, user):
+        if self.maxsize <= 0:
+            return
+        user = dict(user)
+        if not self.store_password_hash:
+            user.pop("password_hash", None)
+        with self._lock:
+            self._entries[username] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *usernames):
+        with self._lock:
+            for username in usernames:
+                if self._entries.pop(username, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def init_user_cache(app):
+    cache = UserCache(
+        maxsize=app.config.get("USER_CACHE_SIZE", 1024),
+        ttl=app.config.get("USER_CACHE_TTL", 30),
+        store_password_hash=app.config.get("USER_CACHE_PASSWORD_HASH", False),
+    )
+    app.extensions["user_cache"] = cache
+    return cache
+
+
+def get_user_cache():
+    cache = current_app.extensions.get("user_cache")
+    if cache is None:
+        cache = init_user_cache(current_app)
+    return cache
@@ -0,0 +1,361 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import current_app
+from mysql.connector import Error as MySQLError, IntegrityError, DataError
+from db.db_connection import get_db
+from books.catalog import bump_catalog_version
+from books.ledger import sellable_stock
+from books.search_index import refresh_stock
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+PLACED = "placed"
+REJECTED = "rejected"
+
+
+class OrderJournal:
+    # Append-only intake log in a local SQLite file. An order is acknowledged
+    # only after its row is fsynced (WAL + synchronous=FULL), and it keeps its
+    # ticket until the worker records the outcome. Every process on the host
+    # can share one file; claims are leases, so a crashed worker's batch is
+    # picked up again once the lease runs out. Entries that already failed are
+    # retried one at a time, and one that fails max_attempts times is rejected
+    # instead of wedging the queue.
+    def __init__(self, path, lease=60, max_attempts=5):
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS intake (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticket TEXT NOT NULL UNIQUE,
+                username TEXT NOT NULL,
+                credit_card_number TEXT NOT NULL,
+                lines TEXT NOT NULL,
+                status TEXT NOT NULL,
+                order_id INTEGER,
+                errors TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_intake_status ON intake (status, seq)")
+
+    def append(self, username, credit_card, lines):
+        ticket = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO intake (ticket, username, credit_card_number, lines, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (ticket, username, credit_card, json.dumps(lines), QUEUED, now, now))
+        return ticket
+
+    def claim(self, limit):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("""
+                    SELECT ticket, username, credit_card_number, lines, attempts FROM intake
+                    WHERE status = ? OR (status = ? AND claimed_at < ?)
+                    ORDER BY seq LIMIT ?
+                """, (QUEUED, PROCESSING, now - self.lease, limit)).fetchall()
+                retried = [row for row in rows if row["attempts"]]
+                if retried:
+                    # Isolate whichever entry broke the last batch.
+                    rows = retried[:1]
+                    if rows[0]["attempts"] >= self.max_attempts:
+                        self._give_up(rows[0]["ticket"], now)
+                        rows = []
+                self._conn.executemany(
+                    "UPDATE intake SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE ticket = ?",
+                    [(PROCESSING, now, row["ticket"]) for row in rows])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [{
+            "ticket": row["ticket"],
+            "username": row["username"],
+            "credit_card_number": row["credit_card_number"],
+            "lines": json.loads(row["lines"]),
+        } for row in rows]
+
+    def _give_up(self, ticket, now):
+        logger.error("Order intake ticket %s failed %d times; rejecting it", ticket, self.max_attempts)
+        errors = {"msg": "Order could not be processed",
+                  "errors": {"order": f"Failed {self.max_attempts} times, please try again"}}
+        self._conn.execute("UPDATE intake SET status = ?, errors = ?, updated_at = ? WHERE ticket = ?",
+                           (REJECTED, json.dumps(errors), now, ticket))
+
+    def release(self, tickets):
+        # Not the entries' fault (the database was down): hand back the attempt.
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE intake SET status = ?, claimed_at = NULL, attempts = attempts - 1 WHERE ticket = ? AND status = ?",
+                [(QUEUED, ticket, PROCESSING) for ticket in tickets])
+
+    def finish(self, results):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "UPDATE intake SET status = ?, order_id = ?, errors = ?, updated_at = ? WHERE ticket = ?",
+                [(status, order_id, json.dumps(errors) if errors else None, now, ticket)
+                 for ticket, (status, order_id, errors) in results.items()])
+            self._conn.execute("COMMIT")
+
+    def get(self, ticket):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ticket, username, status, order_id, errors, created_at, updated_at FROM intake WHERE ticket = ?",
+                (ticket,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["errors"] = json.loads(entry["errors"]) if entry["errors"] else None
+        return entry
+
+    def prune(self, older_than):
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM intake WHERE status IN (?, ?) AND updated_at < ?",
+                                     (PLACED, REJECTED, time.time() - older_than))
+            return cur.rowcount
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM intake GROUP BY status").fetchall())
+            oldest = self._conn.execute("SELECT MIN(created_at) FROM intake WHERE status IN (?, ?)",
+                                        (QUEUED, PROCESSING)).fetchone()[0]
+        stats = {status: counts.get(status, 0) for status in (QUEUED, PROCESSING, PLACED, REJECTED)}
+        stats["oldest_pending_s"] = time.time() - oldest if oldest else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _already_applied(cursor, tickets):
+    placeholders = ", ".join(["%s"] * len(tickets))
+    cursor.execute(f"SELECT ticket, order_id FROM order_intake WHERE ticket IN ({placeholders})", list(tickets))
+    return {row["ticket"]: row["order_id"] for row in cursor.fetchall()}
+
+
+def apply_batch(db, entries, ledger_enabled=False):
+    """Write a batch of journaled orders in one MySQL transaction.
+
+    Tickets are recorded in order_intake inside the same transaction, so a
+    batch that committed before a crash is recognised on replay instead of
+    being placed twice. With `ledger_enabled`, stock reserved by the stock
+    ledger's holders is not sold. Returns {ticket: (status, order_id, errors)}.
+    """
+    cursor = db.cursor(dictionary=True)
+    results = {}
+    try:
+        for ticket, order_id in _already_applied(cursor, [e["ticket"] for e in entries]).items():
+            results[ticket] = (PLACED, order_id, None)
+        pending = [e for e in entries if e["ticket"] not in results]
+        if not pending:
+            db.rollback()
+            return results
+
+        # One lock pass over every book in the batch, in index order.
+        isbns = sorted({isbn for e in pending for isbn in e["lines"]})
+        placeholders = ", ".join(["%s"] * len(isbns))
+        cursor.execute(f"""
+            SELECT B.ISBN_number, B.selling_price, {sellable_stock(ledger_enabled)} AS quantity_stock
+            FROM book AS B
+            WHERE B.ISBN_number IN ({placeholders})
+            ORDER BY B.ISBN_number
+            FOR UPDATE
+        """, isbns)
+        stock = {row["ISBN_number"]: row for row in cursor.fetchall()}
+        available = {isbn: row["quantity_stock"] for isbn, row in stock.items()}
+
+        book_lines = []
+        tickets = []
+        for entry in pending:
+            lines = entry["lines"]
+            missing = {isbn: "Book not found" for isbn in lines if isbn not in stock}
+            if missing:
+                results[entry["ticket"]] = (REJECTED, None, {"msg": "Unknown books in cart", "errors": missing})
+                continue
+            short = {
+                isbn: f"Requested {qty}, only {available[isbn]} in stock"
+                for isbn, qty in lines.items() if available[isbn] < qty
+            }
+            if short:
+                results[entry["ticket"]] = (REJECTED, None, {"msg": "Insufficient stock", "errors": short})
+                continue
+            for isbn, qty in lines.items():
+                available[isbn] -= qty
+            cost = sum(stock[isbn]["selling_price"] * qty for isbn, qty in lines.items())
+            cursor.execute(
+                "INSERT INTO customer_order (credit_card_number, username, cost) VALUES (%s, %s, %s)",
+                (entry["credit_card_number"], entry["username"], cost)
+            )
+            order_id = cursor.lastrowid
+            book_lines.extend((order_id, isbn, qty, stock[isbn]["selling_price"])
+                              for isbn, qty in sorted(lines.items()))
+            tickets.append((entry["ticket"], order_id))
+            results[entry["ticket"]] = (PLACED, order_id, None)
+
+        if book_lines:
+            # The after_customer_purchase trigger still decrements stock per row.
+            cursor.executemany(
+                "INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) VALUES (%s, %s, %s, %s)",
+                book_lines)
+            cursor.executemany("INSERT INTO order_intake (ticket, order_id) VALUES (%s, %s)", tickets)
+        db.commit()  # the group commit: one durable write for the whole batch
+    except Exception:
+        db.rollback()
+        raise
+    return results
+
+
+def apply_entries(db, entries, ledger_enabled=False):
+    try:
+        return apply_batch(db, entries, ledger_enabled)
+    except (IntegrityError, DataError):
+        pass
+
+    # Some order in the batch is invalid (unknown card, bad data...). Replay
+    # one by one so only that ticket is rejected.
+    results = {}
+    for entry in entries:
+        try:
+            results.update(apply_batch(db, [entry], ledger_enabled))
+        except (IntegrityError, DataError) as e:
+            # Another worker may have applied this ticket after our lease expired.
+            applied = _already_applied(db.cursor(dictionary=True), [entry["ticket"]])
+            if applied:
+                results[entry["ticket"]] = (PLACED, applied[entry["ticket"]], None)
+            else:
+                results[entry["ticket"]] = (REJECTED, None, {"msg": "Invalid Input", "errors": {"order": e.msg}})
+    return results
+
+
+class IntakeWorker:
+    def __init__(self, app, journal, batch_size=100, linger=0.005, poll_interval=1.0,
+                 retention=86400, retry_delay=1.0):
+        self.app = app
+        self.journal = journal
+        self.batch_size = batch_size
+        self.linger = linger
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.retry_delay = retry_delay
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_prune = 0.0
+        self.batches = 0
+        self.placed = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="order-intake", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self):
+        self._wake.set()
+
+    def drain_once(self):
+        entries = self.journal.claim(self.batch_size)
+        if not entries:
+            return 0
+        try:
+            with self.app.app_context():
+                results = apply_entries(get_db(), entries, self.app.config.get("STOCK_LEDGER_ENABLED", False))
+                sold = {isbn for e in entries if results[e["ticket"]][0] == PLACED for isbn in e["lines"]}
+                if sold:
+                    bump_catalog_version()  # the purchase trigger changed stock
+                    refresh_stock(sold)
+        except MySQLError:
+            # Database unavailable: put the batch back and try again later.
+            self.journal.release([e["ticket"] for e in entries])
+            self.failures += 1
+            raise
+        self.journal.finish(results)
+        self.batches += 1
+        placed = sum(1 for status, _, _ in results.values() if status == PLACED)
+        self.placed += placed
+        self.rejected += len(results) - placed
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.drain_once():
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+                    # Give concurrent requests a moment to land in the same batch.
+                    if self.linger:
+                        time.sleep(self.linger)
+                if time.monotonic() - self._last_prune > 3600:
+                    self._last_prune = time.monotonic()
+                    self.journal.prune(self.retention)
+            except Exception:
+                logger.exception("Order intake batch failed")
+                self._stop.wait(self.retry_delay)
+
+    def stats(self):
+        stats = self.journal.stats()
+        stats.update({
+            "batches": self.batches,
+            "placed_total": self.placed,
+            "rejected_total": self.rejected,
+            "failures": self.failures,
+            "running": self._thread is not None and self._thread.is_alive(),
+        })
+        return stats
+
+
+def init_order_intake(app):
+    if app.config.get("ORDER_INTAKE_MODE", "sync") != "journal":
+        return None
+    path = app.config.get("ORDER_JOURNAL_PATH") or os.path.join(app.instance_path, "order_journal.sqlite3")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    journal = OrderJournal(path, lease=app.config.get("ORDER_INTAKE_LEASE", 60),
+                           max_attempts=app.config.get("ORDER_INTAKE_MAX_ATTEMPTS", 5))
+    worker = IntakeWorker(
+        app,
+        journal,
+        batch_size=app.config.get("ORDER_INTAKE_BATCH_SIZE", 100),
+        linger=app.config.get("ORDER_INTAKE_LINGER", 0.005),
+        retention=app.config.get("ORDER_JOURNAL_RETENTION", 86400),
+    )
+    app.extensions["order_intake"] = worker
+    if app.config.get("ORDER_INTAKE_START_WORKER", True):
+        worker.start()  # also replays whatever a previous run left queued
+    return worker
+
+
+def get_order_intake():
+    return current_app.extensions.get("order_intake")
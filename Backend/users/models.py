@@ -1,13 +1,12 @@
-from db.db_connection import get_db
+import base64
+import json
 
-def get_user_by_username(username):
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT username, password_hash, role FROM user WHERE username=%s",
-        (username,)
-    )
-    return cursor.fetchone()
+from db.db_connection import get_db
+from db.streaming import iter_rows
+from books.catalog import bump_catalog_version
+from books.ledger import get_stock_ledger, sellable_stock
+from books.search_index import refresh_stock
+from users.cache import get_user_cache
 
 def create_user(username, password_hash, role="Customer", shipping_address=None,
                 phone_number=None, email=None, first_name=None, last_name=None):
@@ -19,16 +18,32 @@ def create_user(username, password_hash, role="Customer", shipping_address=None,
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """, (username, role, shipping_address, phone_number, email, password_hash, first_name, last_name))
     db.commit()
+    get_user_cache().invalidate(username)
     return cursor.lastrowid
 
-def get_user_by_username(username):
+def get_user_by_username(username, include_password=False):
+    cache = get_user_cache()
+    # Callers that verify a password need the hash, which the shared entry
+    # may deliberately leave out.
+    if not include_password or cache.store_password_hash:
+        user = cache.get(username)
+        if user is not None:
+            if not include_password:
+                user.pop("password_hash", None)
+            return user
+
     db = get_db()
     cursor = db.cursor(dictionary=True)
     cursor.execute(
         "SELECT * FROM user WHERE username=%s",
         (username,)
     )
-    return cursor.fetchone()
+    user = cursor.fetchone()
+    if user is not None:
+        cache.put(username, user)
+        if not include_password:
+            user.pop("password_hash", None)
+    return user
 
 def update_user_by_username(username, update_data):
     if not update_data:
@@ -45,58 +60,218 @@ def update_user_by_username(username, update_data):
     
     cursor.execute(query, values)
     db.commit()
+    # A rename leaves the old identity pointing at nothing and may reuse a
+    # name that was cached as someone else's.
+    get_user_cache().invalidate(username, update_data.get("username"))
     
     return cursor.rowcount > 0
 
+class OrderError(Exception):
+    def __init__(self, msg, errors=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.errors = errors or {}
+
+class InsufficientStockError(OrderError):
+    pass
+
+def merge_cart_lines(books):
+    lines = {}
+    errors = {}
+    for book in books:
+        isbn = book.get("ISBN_number") if isinstance(book, dict) else None
+        quantity = book.get("quantity") if isinstance(book, dict) else None
+        if not isbn:
+            raise OrderError("Every cart line needs an ISBN_number")
+        if not isinstance(isbn, str):
+            raise OrderError("ISBN_number must be a string")
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            errors[isbn] = "Quantity must be a positive integer"
+            continue
+        lines[isbn] = lines.get(isbn, 0) + quantity
+    if errors:
+        raise OrderError("Invalid cart", errors)
+    return lines
+
+def _ledger_shortage(lines, short):
+    missing = {isbn: "Book not found" for isbn, available in short.items() if available is None}
+    if missing:
+        return OrderError("Unknown books in cart", missing)
+    return InsufficientStockError("Insufficient stock", {
+        isbn: f"Requested {lines[isbn]}, only {available} in stock" for isbn, available in short.items()
+    })
+
 def create_customer_order(username, credit_card, books):
+    lines = merge_cart_lines(books)
+    isbns = sorted(lines)
+    # Hot books are sold from this process's stock ledger and never locked
+    # here; the rest of the cart goes through the row locks as before.
+    ledger = get_stock_ledger()
+    hot = {isbn: lines[isbn] for isbn in isbns if ledger is not None and ledger.is_hot(isbn)}
+    cold = [isbn for isbn in isbns if isbn not in hot]
+
     db = get_db()
-    cursor = db.cursor()
+    if hot:
+        short = ledger.take(db, hot)
+        if short:
+            raise _ledger_shortage(lines, short)
+    cursor = db.cursor(dictionary=True)
+    try:
+        stock = {}
+        if cold:
+            # Lock every book in the cart (in index order, so concurrent carts
+            # can't deadlock) and read price and stock in the same round trip.
+            # With the ledger on, units any holder reserved aren't for sale here.
+            placeholders = ", ".join(["%s"] * len(cold))
+            cursor.execute(f"""
+                SELECT B.ISBN_number, B.selling_price, {sellable_stock(ledger is not None)} AS quantity_stock
+                FROM book AS B
+                WHERE B.ISBN_number IN ({placeholders})
+                ORDER BY B.ISBN_number
+                FOR UPDATE
+            """, cold)
+            stock.update((row["ISBN_number"], row) for row in cursor.fetchall())
+        if hot:
+            placeholders = ", ".join(["%s"] * len(hot))
+            cursor.execute(f"SELECT ISBN_number, selling_price FROM book WHERE ISBN_number IN ({placeholders})",
+                           sorted(hot))
+            stock.update((row["ISBN_number"], row) for row in cursor.fetchall())
 
-    cursor.execute("INSERT INTO customer_order (credit_card_number, username) VALUES (%s, %s)", (credit_card, username))
-    order_id = cursor.lastrowid
-    for book in books:
-        isbn = book.get("ISBN_number")
-        quantity = book.get("quantity")
-        cursor.execute("SELECT selling_price FROM book WHERE ISBN_number = %s", (isbn,))
-        unit_price = cursor.fetchone()
-        cursor.execute("INSERT INTO book_order (order_id, ISBN_number, quantity, unit_price) VALUES (%s, %s, %s)", (order_id, isbn, quantity, unit_price['selling_price']))
+        missing = {isbn: "Book not found" for isbn in isbns if isbn not in stock}
+        if missing:
+            raise OrderError("Unknown books in cart", missing)
+        short = {
+            isbn: f"Requested {lines[isbn]}, only {stock[isbn]['quantity_stock']} in stock"
+            for isbn in cold if stock[isbn]["quantity_stock"] < lines[isbn]
+        }
+        if short:
+            raise InsufficientStockError("Insufficient stock", short)
 
-    cursor.execute("UPDATE customer_order SET cost = (SELECT SUM(quantity * unit_price) FROM book_order WHERE order_id = %s) WHERE order_id = %s", (order_id, order_id))
-    db.commit()
+        cost = sum(stock[isbn]["selling_price"] * lines[isbn] for isbn in isbns)
+        cursor.execute(
+            "INSERT INTO customer_order (credit_card_number, username, cost) VALUES (%s, %s, %s)",
+            (credit_card, username, cost)
+        )
+        order_id = cursor.lastrowid
+        insert_line = "INSERT INTO book_order (order_id, ISBN_number, item_quantity, unit_price) VALUES (%s, %s, %s, %s)"
+        if cold:
+            # The after_customer_purchase trigger still decrements stock per row.
+            cursor.executemany(insert_line, [(order_id, isbn, lines[isbn], stock[isbn]["selling_price"])
+                                             for isbn in cold])
+        if hot:
+            # With @stock_holder set the trigger records the sale in
+            # stock_pending for the ledger to flush. Session variables outlive
+            # the request on a pooled connection, so always clear it.
+            cursor.execute("SET @stock_holder = %s", (ledger.holder,))
+            try:
+                cursor.executemany(insert_line, [(order_id, isbn, lines[isbn], stock[isbn]["selling_price"])
+                                                 for isbn in sorted(hot)])
+            finally:
+                cursor.execute("SET @stock_holder = NULL")
+        db.commit()
+    except Exception:
+        db.rollback()
+        if hot:
+            ledger.give_back(hot)
+        raise
+
+    if cold:
+        bump_catalog_version()  # the purchase trigger changed stock
+        refresh_stock(cold)
     return order_id
 
+ORDERS_PAGE_SIZE = 20
+MAX_ORDERS_PAGE_SIZE = 100
+
+def encode_order_cursor(order):
+    raw = json.dumps([str(order["order_date"]), order["order_id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_order_cursor(page_cursor):
+    try:
+        order_date, order_id = json.loads(base64.urlsafe_b64decode(page_cursor.encode("ascii")))
+        return order_date, int(order_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
 def get_customer_orders(username):
-    db = get_db()
+    return list(iter_customer_orders(username))
+
+def get_customer_orders_page(username, limit=ORDERS_PAGE_SIZE, page_cursor=None, summary=False):
+    limit = max(1, min(int(limit), MAX_ORDERS_PAGE_SIZE))
+    db = get_db(readonly=True)
     cursor = db.cursor(dictionary=True)
 
+    # Served entirely from idx_customer_order_user_date: an index range read
+    # in (order_date, order_id) order with no filesort.
+    query = """
+        SELECT order_id, order_date, cost
+        FROM customer_order
+        WHERE username = %s
+    """
+    params = [username]
+    if page_cursor:
+        query += " AND (order_date, order_id) < (%s, %s)"
+        params.extend(decode_order_cursor(page_cursor))
+    query += " ORDER BY order_date DESC, order_id DESC LIMIT %s"
+    params.append(limit + 1)
+    cursor.execute(query, params)
+    orders = cursor.fetchall()
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_order_cursor(orders[-1])
+
+    if not summary and orders:
+        order_ids = [order["order_id"] for order in orders]
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        cursor.execute(f"""
+            SELECT BO.order_id, BO.ISBN_number, B.title, BO.item_quantity AS quantity, BO.unit_price
+            FROM book_order AS BO
+            JOIN book AS B ON BO.ISBN_number = B.ISBN_number
+            WHERE BO.order_id IN ({placeholders})
+            ORDER BY BO.order_id, BO.ISBN_number
+        """, order_ids)
+        items = {}
+        for row in cursor.fetchall():
+            items.setdefault(row.pop("order_id"), []).append(row)
+        for order in orders:
+            order["items"] = items.get(order["order_id"], [])
+    return orders, next_cursor
+
+def iter_customer_orders(username, batch_size=500):
+    db = get_db(readonly=True)
+    cursor = db.cursor(dictionary=True)
+
+    # order_id breaks date ties so every order's lines arrive back to back
+    # and can be grouped while streaming.
     cursor.execute("""
-        SELECT CO.order_id, CO.order_date, CO.cost, BO.ISBN_number, BO.quantity, BO.unit_price,
+        SELECT CO.order_id, CO.order_date, CO.cost, BO.ISBN_number, BO.item_quantity AS quantity, BO.unit_price,
         B.title           
         FROM customer_order AS CO
         JOIN book_order AS BO ON CO.order_id = BO.order_id
         JOIN book AS B ON BO.ISBN_number = B.ISBN_number           
         WHERE CO.username = %s
-        ORDER BY CO.order_date DESC
+        ORDER BY CO.order_date DESC, CO.order_id DESC
     """, (username,))
 
-    orders_data = cursor.fetchall()
-    orders = {}
-    for row in orders_data:
-        order_id = row['order_id']
-        if order_id not in orders:
-            orders[order_id] = {
-                "order_id": order_id,
+    order = None
+    for row in iter_rows(cursor, batch_size):
+        if order is None or order["order_id"] != row['order_id']:
+            if order is not None:
+                yield order
+            order = {
+                "order_id": row['order_id'],
                 "order_date": row['order_date'],
                 "cost": row['cost'],
                 "items": []
             }
-        orders[order_id]["items"].append({
+        order["items"].append({
             "ISBN_number": row['ISBN_number'],
             "title": row['title'],
             "quantity": row['quantity'],
             "unit_price": row['unit_price']
         })
-
-    return list(orders.values())
-
-
+    if order is not None:
+        yield order
@@ -1,21 +1,29 @@
 from . import users_bp
 from config import *
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from users.models import *
 from auth.tokens import generate_access_token
 from auth.decorators import admin_required
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from mysql.connector import IntegrityError
-import bcrypt
+from auth.passwords import get_password_hasher, HasherBusyError
+from db.streaming import json_array_stream
+from users.intake import get_order_intake
 
 
+@users_bp.errorhandler(HasherBusyError)
+def hasher_busy(e):
+    response = jsonify({"msg": "Server is busy, please retry shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, HTTP_503_UNAVAILABLE
+
 @users_bp.route("/login", methods=["POST"])
 def login():
     data = request.get_json()
-    user = get_user_by_username(data["username"])
+    user = get_user_by_username(data["username"], include_password=True)
     password = data.get("password")
 
-    if not user or not bcrypt.checkpw(password.encode('utf-8'), user["password_hash"].encode('utf-8')):
+    if not user or not get_password_hasher().check_password(password, user["password_hash"]):
         return jsonify({"msg": "Invalid credentials"}), HTTP_401_UNAUTHORIZED
 
     token = generate_access_token(user["username"], user["role"])
@@ -43,7 +51,7 @@ def register():
         return {"msg": "Missing required fields"}, HTTP_400_BAD_REQUEST
 
 
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = get_password_hasher().hash_password(password)
 
     try:
         user_id = create_user(username, hashed_password, role, shipping_address, phone_number, email, first_name, last_name)
@@ -62,7 +70,7 @@ def me():
     return user
 
 @users_bp.route("/me", methods=["PUT"])
-@jwt_required
+@jwt_required()
 def update_profile():
     username = get_jwt_identity()
     data = request.get_json()
@@ -76,15 +84,16 @@ def update_profile():
     }
     updates = {}
 
-    for api_field, db_field in allowed_fields:
+    for api_field, db_field in allowed_fields.items():
         if api_field in data:
             updates[db_field] = data[api_field]
 
     if "old_password" in data and "new_password" in data:
-        user = get_user_by_username(data["username"])
-        if not user or not bcrypt.checkpw(data["old_password"].encode('utf-8'), user["password_hash"].encode('utf-8')):
+        hasher = get_password_hasher()
+        user = get_user_by_username(username, include_password=True)
+        if not user or not hasher.check_password(data["old_password"], user["password_hash"]):
             return jsonify({"msg": "Incorrect Password"}), HTTP_401_UNAUTHORIZED
-        updates["password_hash"] = bcrypt.hashpw(data["new_password"].encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        updates["password_hash"] = hasher.hash_password(data["new_password"])
 
     if not updates:
         return jsonify({"msg": "No valid fields provided for update"}), HTTP_400_BAD_REQUEST 
@@ -106,7 +115,7 @@ def update_profile():
             return jsonify({"msg": "email already taken"}), HTTP_409_CONFLICT
 
     except Exception as e:
-        print(f"Error: {e}")
+        current_app.logger.exception("Profile update failed")
         return jsonify({"msg": "Internal Server Error"}), 500
     
 @users_bp.route("/orders", methods=["POST"])
@@ -122,8 +131,24 @@ def order_books():
     if not books or not isinstance(books, list) or not credit_card:
         return jsonify({"msg": "Missing Arguments"}), HTTP_400_BAD_REQUEST
 
+    intake = get_order_intake()
+    if intake is not None:
+        # Journal the validated cart and answer right away; stock is checked
+        # when the worker applies it. Poll the ticket for the outcome.
+        try:
+            lines = merge_cart_lines(books)
+        except OrderError as e:
+            return jsonify({"msg": e.msg, "errors": e.errors}), HTTP_400_BAD_REQUEST
+        ticket = intake.journal.append(username, credit_card, lines)
+        intake.notify()
+        return jsonify({"msg": "Order accepted", "ticket": ticket, "status": "queued"}), HTTP_202_ACCEPTED
+
     try:
         order_id = create_customer_order(username, credit_card, books)
+    except InsufficientStockError as e:
+        return jsonify({"msg": e.msg, "errors": e.errors}), HTTP_409_CONFLICT
+    except OrderError as e:
+        return jsonify({"msg": e.msg, "errors": e.errors}), HTTP_400_BAD_REQUEST
     except IntegrityError:
         return jsonify({"msg": "Invalid Input"}), HTTP_400_BAD_REQUEST
 
@@ -134,5 +159,26 @@ def order_books():
 @jwt_required()
 def get_orders():
     username = get_jwt_identity()
-    orders = get_customer_orders(username)
-    return jsonify(orders)
+    if request.args.get("stream", type=int):
+        orders = iter_customer_orders(username, batch_size=current_app.config.get("STREAM_BATCH_SIZE", 500))
+        return Response(stream_with_context(json_array_stream(orders)), mimetype="application/json")
+    try:
+        orders, next_cursor = get_customer_orders_page(
+            username,
+            limit=request.args.get("limit", ORDERS_PAGE_SIZE, type=int),
+            page_cursor=request.args.get("cursor"),
+            summary=bool(request.args.get("summary", type=int)),
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), HTTP_400_BAD_REQUEST
+    return jsonify({"orders": orders, "next_cursor": next_cursor})
+
+@users_bp.route("/orders/intake/<ticket>", methods=["GET"])
+@jwt_required()
+def order_intake_status(ticket):
+    intake = get_order_intake()
+    entry = intake.journal.get(ticket) if intake is not None else None
+    # Someone else's ticket looks exactly like an unknown one.
+    if entry is None or entry.pop("username") != get_jwt_identity():
+        return jsonify({"msg": "Ticket not found"}), HTTP_404_NOT_FOUND
+    return jsonify(entry)
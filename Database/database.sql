@@ -91,4 +91,4 @@ CREATE TABLE book_order (
     PRIMARY KEY (ISBN_number, order_id),
     FOREIGN KEY (ISBN_number) REFERENCES book(ISBN_number) ON DELETE RESTRICT ON UPDATE CASCADE,
     FOREIGN KEY (order_id) REFERENCES customer_order(order_id) ON DELETE RESTRICT ON UPDATE CASCADE
-);
\ No newline at end of file
+);
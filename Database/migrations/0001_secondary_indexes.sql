@@ -0,0 +1,20 @@
+-- ==========================================================
+-- 0001: SECONDARY AND COVERING INDEXES
+-- database.sql only creates the primary and foreign keys. These cover
+-- the filters the app and reports run; 0003 adds the keyset listing and
+-- order history indexes.
+-- Apply with: flask --app app db migrate
+-- ==========================================================
+
+-- Sales reports and rollup rebuilds: an order_date range that reads
+-- username and cost from the index alone.
+CREATE INDEX idx_customer_order_date ON customer_order (order_date, username, cost);
+
+-- Books by author and publishers by name.
+CREATE INDEX idx_author_name ON author (author_name, ISBN_number);
+CREATE INDEX idx_publisher_name ON publisher (name);
+
+-- Category search and per-publisher lookups. InnoDB drops the implicit
+-- foreign key index on book.publisher_id once this one exists.
+CREATE INDEX idx_book_category ON book (category, ISBN_number);
+CREATE INDEX idx_book_publisher ON book (publisher_id, ISBN_number);
@@ -0,0 +1,21 @@
+-- ==========================================================
+-- 0002: SARGABLE SALES-BY-DATE REPORT
+-- DATE(order_date) = target_date wraps the column in a function, so no
+-- index on order_date can serve it and every order is read. The same day
+-- as a half-open range is an index range read on idx_customer_order_date.
+-- Apply with: flask --app app db migrate
+-- ==========================================================
+
+DROP PROCEDURE IF EXISTS Report_Sales_By_Date;
+
+DELIMITER //
+
+CREATE PROCEDURE Report_Sales_By_Date(IN target_date DATE)
+BEGIN
+    SELECT SUM(cost) AS Total_Sales
+    FROM customer_order
+    WHERE order_date >= target_date AND order_date < target_date + INTERVAL 1 DAY;
+END;
+//
+
+DELIMITER ;
@@ -0,0 +1,19 @@
+-- ==========================================================
+-- 0003: KEYSET LISTING AND ORDER HISTORY INDEXES
+-- The catalog listing (GET /api/books/) pages on (sort column,
+-- ISBN_number) and the order history (GET /api/users/orders) on
+-- (order_date, order_id) per user; each page is an index range read with
+-- no filesort.
+-- Apply with: flask --app app db migrate
+-- ==========================================================
+
+-- Keyset pagination for each catalog sort.
+CREATE INDEX idx_book_price_isbn ON book (selling_price, ISBN_number);
+CREATE INDEX idx_book_year_isbn ON book (publication_year, ISBN_number);
+CREATE INDEX idx_book_title_isbn ON book (title, ISBN_number);
+
+-- Order history: covering index for the per-user keyset (username also
+-- serves the customer_order.username foreign key), and order_id-first
+-- access to order lines.
+CREATE INDEX idx_customer_order_user_date ON customer_order (username, order_date, order_id, cost);
+CREATE INDEX idx_book_order_order ON book_order (order_id, ISBN_number, item_quantity, unit_price);
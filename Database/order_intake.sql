@@ -0,0 +1,16 @@
+USE Book_Order_Processing_System;
+
+-- ==========================================================
+-- JOURNALED ORDER INTAKE (ORDER_INTAKE_MODE = "journal")
+-- One row per journal ticket, written in the same transaction as the order
+-- it produced. Replaying the local journal after a crash checks this table
+-- first, so no ticket is ever placed twice.
+-- ==========================================================
+
+CREATE TABLE order_intake (
+    ticket CHAR(32) NOT NULL,
+    order_id INT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticket),
+    FOREIGN KEY (order_id) REFERENCES customer_order(order_id) ON DELETE CASCADE
+);
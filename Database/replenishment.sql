@@ -0,0 +1,52 @@
+USE Book_Order_Processing_System;
+
+-- ==========================================================
+-- COALESCED REPLENISHMENT
+-- The app's replenishment engine scans below-threshold books in one query,
+-- sizes each order from recent sales in book_order and files the orders
+-- under one pending batch per publisher. Confirming batches applies every
+-- stock increment in a single UPDATE.
+-- Run by hand with: flask --app app replenishment run
+-- ==========================================================
+
+CREATE TABLE publisher_order_batch (
+    batch_id INT NOT NULL AUTO_INCREMENT,
+    publisher_id INT,
+    status ENUM('Pending', 'Confirmed') NOT NULL DEFAULT 'Pending',
+    total_cost DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    confirmed_at TIMESTAMP NULL,
+    PRIMARY KEY (batch_id),
+    KEY idx_publisher_order_batch_status (status, publisher_id),
+    FOREIGN KEY (publisher_id) REFERENCES publisher(publisher_id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+
+ALTER TABLE publisher_order
+    ADD COLUMN batch_id INT NULL,
+    ADD KEY idx_publisher_order_batch (batch_id, status, ISBN_number, quantity),
+    ADD KEY idx_publisher_order_pending (status, ISBN_number, quantity),
+    ADD FOREIGN KEY (batch_id) REFERENCES publisher_order_batch(batch_id) ON DELETE CASCADE;
+
+-- The engine places restock orders now; a fixed 50 units per threshold
+-- crossing is no longer wanted.
+DROP TRIGGER IF EXISTS after_book_update_restock;
+
+-- Batched orders get their stock from the bulk confirm; only orders placed
+-- outside a batch are still applied row by row.
+DROP TRIGGER IF EXISTS after_publisher_order_confirm;
+
+DELIMITER //
+
+CREATE TRIGGER after_publisher_order_confirm
+AFTER UPDATE ON publisher_order
+FOR EACH ROW
+BEGIN
+    IF OLD.status != 'Confirmed' AND NEW.status = 'Confirmed' AND NEW.batch_id IS NULL THEN
+        UPDATE book
+        SET quantity_stock = quantity_stock + NEW.quantity
+        WHERE ISBN_number = NEW.ISBN_number;
+    END IF;
+END;
+//
+
+DELIMITER ;
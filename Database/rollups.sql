@@ -0,0 +1,112 @@
+USE Book_Order_Processing_System;
+
+-- ==========================================================
+-- DAILY SALES ROLLUPS
+-- Maintained by the triggers below as orders are written, and read by the
+-- /api/reports endpoints instead of rescanning customer_order/book_order.
+-- Backfill or repair with: flask --app app reports rebuild
+-- ==========================================================
+
+CREATE TABLE daily_sales (
+    sales_date DATE NOT NULL,
+    orders_count INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date)
+);
+
+CREATE TABLE daily_customer_sales (
+    sales_date DATE NOT NULL,
+    username VARCHAR(225) NOT NULL,
+    orders_count INT NOT NULL DEFAULT 0,
+    total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, username),
+    -- Renames cascade here too (cascaded updates don't fire triggers).
+    FOREIGN KEY (username) REFERENCES user(username) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE daily_book_sales (
+    sales_date DATE NOT NULL,
+    ISBN_number VARCHAR(20) NOT NULL,
+    copies_sold INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (sales_date, ISBN_number),
+    FOREIGN KEY (ISBN_number) REFERENCES book(ISBN_number) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+DELIMITER //
+
+CREATE TRIGGER after_customer_order_rollup
+AFTER INSERT ON customer_order
+FOR EACH ROW
+BEGIN
+    INSERT INTO daily_sales (sales_date, orders_count, total_sales)
+    VALUES (DATE(NEW.order_date), 1, COALESCE(NEW.cost, 0))
+    ON DUPLICATE KEY UPDATE
+        orders_count = orders_count + 1,
+        total_sales = total_sales + COALESCE(NEW.cost, 0);
+
+    IF NEW.username IS NOT NULL THEN
+        INSERT INTO daily_customer_sales (sales_date, username, orders_count, total_amount)
+        VALUES (DATE(NEW.order_date), NEW.username, 1, COALESCE(NEW.cost, 0))
+        ON DUPLICATE KEY UPDATE
+            orders_count = orders_count + 1,
+            total_amount = total_amount + COALESCE(NEW.cost, 0);
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+DELIMITER //
+
+CREATE TRIGGER after_customer_order_rollup_update
+AFTER UPDATE ON customer_order
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.cost <=> NEW.cost) OR OLD.order_date <> NEW.order_date OR NOT (OLD.username <=> NEW.username) THEN
+        UPDATE daily_sales
+        SET orders_count = orders_count - 1, total_sales = total_sales - COALESCE(OLD.cost, 0)
+        WHERE sales_date = DATE(OLD.order_date);
+
+        INSERT INTO daily_sales (sales_date, orders_count, total_sales)
+        VALUES (DATE(NEW.order_date), 1, COALESCE(NEW.cost, 0))
+        ON DUPLICATE KEY UPDATE
+            orders_count = orders_count + 1,
+            total_sales = total_sales + COALESCE(NEW.cost, 0);
+
+        IF OLD.username IS NOT NULL THEN
+            UPDATE daily_customer_sales
+            SET orders_count = orders_count - 1, total_amount = total_amount - COALESCE(OLD.cost, 0)
+            WHERE sales_date = DATE(OLD.order_date) AND username = OLD.username;
+        END IF;
+
+        IF NEW.username IS NOT NULL THEN
+            INSERT INTO daily_customer_sales (sales_date, username, orders_count, total_amount)
+            VALUES (DATE(NEW.order_date), NEW.username, 1, COALESCE(NEW.cost, 0))
+            ON DUPLICATE KEY UPDATE
+                orders_count = orders_count + 1,
+                total_amount = total_amount + COALESCE(NEW.cost, 0);
+        END IF;
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+DELIMITER //
+
+CREATE TRIGGER after_book_order_rollup
+AFTER INSERT ON book_order
+FOR EACH ROW
+BEGIN
+    INSERT INTO daily_book_sales (sales_date, ISBN_number, copies_sold, revenue)
+    SELECT DATE(order_date), NEW.ISBN_number, NEW.item_quantity, NEW.item_quantity * NEW.unit_price
+    FROM customer_order
+    WHERE order_id = NEW.order_id
+    ON DUPLICATE KEY UPDATE
+        copies_sold = copies_sold + NEW.item_quantity,
+        revenue = revenue + NEW.item_quantity * NEW.unit_price;
+END;
+//
+
+DELIMITER ;
@@ -0,0 +1,75 @@
+USE Book_Order_Processing_System;
+
+-- ==========================================================
+-- HOT-SKU STOCK LEDGER (STOCK_LEDGER_ENABLED = True)
+-- Each app process ("holder") claims blocks of a hot book's stock into
+-- stock_reservation and sells from them in memory, so checkouts don't queue
+-- on the book row. Sales made that way land in stock_pending instead of
+-- touching book, and the holder folds them into book.quantity_stock in
+-- batched updates (the negative-stock and restock triggers still fire).
+--
+-- Claimable stock for a book is quantity_stock - SUM(stock_reservation.units).
+-- Checkouts that don't go through a ledger sell only from that remainder,
+-- and nothing may lower quantity_stock below the reserved units.
+-- Check or repair with: flask --app app books ledger-check / ledger-reconcile
+-- ==========================================================
+
+CREATE TABLE stock_reservation (
+    holder VARCHAR(64) NOT NULL,
+    ISBN_number VARCHAR(20) NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    heartbeat TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (holder, ISBN_number),
+    KEY idx_stock_reservation_isbn (ISBN_number, units),
+    FOREIGN KEY (ISBN_number) REFERENCES book(ISBN_number) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE stock_pending (
+    id BIGINT NOT NULL AUTO_INCREMENT,
+    holder VARCHAR(64) NOT NULL,
+    ISBN_number VARCHAR(20) NOT NULL,
+    quantity INT NOT NULL,
+    PRIMARY KEY (id),
+    KEY idx_stock_pending_holder (holder, id)
+);
+
+-- Replaces the trigger from triggers.sql: sales made while the session names
+-- a ledger holder are recorded as pending instead of locking the book row.
+DROP TRIGGER IF EXISTS after_customer_purchase;
+
+DELIMITER //
+
+CREATE TRIGGER after_customer_purchase
+AFTER INSERT ON book_order
+FOR EACH ROW
+BEGIN
+    IF @stock_holder IS NULL THEN
+        UPDATE book
+        SET quantity_stock = quantity_stock - NEW.item_quantity
+        WHERE ISBN_number = NEW.ISBN_number;
+    ELSE
+        INSERT INTO stock_pending (holder, ISBN_number, quantity)
+        VALUES (@stock_holder, NEW.ISBN_number, NEW.item_quantity);
+    END IF;
+END;
+//
+
+DELIMITER ;
+
+-- Admin edits and imports set quantity_stock directly; refuse to take away
+-- units a holder has already reserved. Flushes lower the reservation first.
+DELIMITER //
+
+CREATE TRIGGER before_book_update_reserved_stock
+BEFORE UPDATE ON book
+FOR EACH ROW
+BEGIN
+    IF NEW.quantity_stock BETWEEN 0 AND OLD.quantity_stock - 1 AND NEW.quantity_stock <
+       (SELECT COALESCE(SUM(units), 0) FROM stock_reservation WHERE ISBN_number = NEW.ISBN_number FOR SHARE) THEN
+        SIGNAL SQLSTATE '23000'
+        SET MESSAGE_TEXT = 'Integrity Error: Stock quantity cannot drop below the units reserved by the stock ledger.';
+    END IF;
+END;
+//
+
+DELIMITER ;